@@ -0,0 +1,315 @@
+"""
+variante asgi de l'api: /api/health et /api/generate-report
+l'appel à groq est asynchrone (groq.AsyncGroq): une requête qui attend groq
+n'occupe pas de thread, un seul processus porte des centaines d'appels en
+cours. le rendu du pdf (calcul bloquant) part dans un thread, puis dans le
+pool de processus de rendu s'il est activé (voir utils.render_pool)
+
+application asgi 3 sans framework, servie par exemple par:
+    cd api && uvicorn asgi:app
+mêmes réponses, en-têtes et codes d'erreur que l'application flask (index.py)
+"""
+import asyncio
+import json
+import os
+import sys
+
+# configuration du chemin pour les imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from utils.logger import get_logger, new_request_id
+from utils.responses import (
+    PDF_CACHE_CONTROL, content_disposition, etag_matches, report_headers, summary_headers
+)
+from utils.warmup import start_preload
+
+logger = get_logger('asgi')
+
+# reportlab et groq sont chargés hors du chemin de la première requête
+start_preload()
+
+# taille maximale du corps d'une requête (octets)
+MAX_BODY = int(os.environ.get('SYNTHESIA_ASGI_MAX_BODY', str(10 * 1024 * 1024)))
+# taille des morceaux du pdf envoyés au serveur
+CHUNK_SIZE = 64 * 1024
+
+# cors: mêmes règles que l'application flask
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    # métadonnées de la génération lisibles par le frontend
+    'Access-Control-Expose-Headers': ', '.join([
+        'X-Summary-Cache', 'X-Summary-Similarity', 'X-Tokens-Original', 'X-Tokens-Sent', 'X-Tokens-Saved',
+        'Server-Timing', 'X-Request-ID', 'ETag', 'X-Report-ID'
+    ]),
+}
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, If-None-Match',
+}
+
+logger.info("demarrage de l'api asgi", python=sys.version.split()[0],
+            groq_configured=bool(os.environ.get('GROQ_API_KEY')))
+
+
+class Request:
+    """
+    requête http reçue: méthode, chemin, en-têtes (noms en minuscules) et corps
+    """
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+        self.body = body
+
+    def json(self):
+        """
+        return: corps décodé, None s'il est vide ou n'est pas du json
+        """
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+
+def json_response(payload, status=200, headers=None):
+    """
+    return: réponse (statut, en-têtes, corps) au format json
+    """
+    return status, {'Content-Type': 'application/json', **(headers or {})}, json.dumps(payload).encode('utf-8')
+
+
+def unavailable_response(error, message):
+    """
+    réponse 503 quand un service ne peut pas répondre, avec retry-after
+    si le délai est connu
+    param error: exception avec un attribut retry_after
+    param message: message d'erreur renvoyé au client
+    return: réponse (statut, en-têtes, corps)
+    """
+    logger.warning("service indisponible", error=str(error), type=type(error).__name__,
+                   retry_after=error.retry_after)
+    headers = {}
+    if error.retry_after:
+        headers['Retry-After'] = str(max(1, round(error.retry_after)))
+    return json_response({
+        "error": message,
+        "details": str(error),
+        "type": type(error).__name__
+    }, 503, headers)
+
+
+async def read_body(receive):
+    """
+    lit le corps de la requête
+    return: corps (bytes), None s'il dépasse MAX_BODY
+    """
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def send_response(send, status, headers, body):
+    """
+    envoie la réponse, par morceaux pour les pdf
+    param body: bytes ou memoryview
+    """
+    view = memoryview(body)
+    raw_headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+    if status not in (204, 304):
+        raw_headers.append((b'content-length', str(view.nbytes).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+
+    if view.nbytes <= CHUNK_SIZE:
+        await send({'type': 'http.response.body', 'body': view.tobytes()})
+        return
+    for start in range(0, view.nbytes, CHUNK_SIZE):
+        await send({
+            'type': 'http.response.body',
+            'body': view[start:start + CHUNK_SIZE].tobytes(),
+            'more_body': start + CHUNK_SIZE < view.nbytes
+        })
+
+
+async def health(request):
+    """
+    route de vérification de santé
+    retourne le statut de l'api et la configuration
+    """
+    return json_response({
+        "status": "online",
+        "message": "SyntheSIA API is running",
+        "groq_configured": bool(os.environ.get('GROQ_API_KEY')),
+        "environment": "production" if os.environ.get('VERCEL') else "development",
+        "server": "asgi"
+    })
+
+
+async def generate_report(request):
+    """
+    route principale pour générer un rapport pdf
+    mesure les étapes et les renvoie dans l'en-tête server-timing
+    """
+    from utils.metrics import RequestTimings
+
+    timings = RequestTimings('generate-report')
+    try:
+        status, headers, body = await build_report(request, timings)
+    except Exception as e:
+        logger.exception("erreur dans generate-report", error=type(e).__name__)
+        status, headers, body = json_response({
+            "error": "Internal server error",
+            "details": str(e),
+            "type": type(e).__name__
+        }, 500)
+
+    headers['Server-Timing'] = timings.header()
+    timings.finish(status)
+    return status, headers, body
+
+
+async def build_report(request, timings):
+    """
+    résumé groq (asynchrone) puis rendu du pdf (thread)
+    return: réponse (statut, en-têtes, corps)
+    """
+    with timings.stage('parse'):
+        data = request.json()
+
+    if not data:
+        logger.info("aucune donnee recue")
+        return json_response({"error": "No data provided"}, 400)
+
+    if not data.get('raw_data'):
+        logger.info("raw_data manquant")
+        return json_response({"error": "Missing raw_data field"}, 400)
+
+    title = data.get('title', 'Rapport')
+    raw_data = data.get('raw_data', '')
+    author = data.get('author', 'Anonyme')
+    role = data.get('role', 'Technicien')
+    theme = data.get('theme')
+
+    logger.debug("demande de rapport", title=title, raw_chars=len(raw_data), theme=theme)
+
+    from utils.ai_handler import generate_summary_details_async
+    from utils.call_policy import GroqUnavailableError
+    from utils.pdf_generator import render_report, pdf_cache_key, parse_generated_at
+    from utils.pdf_styles import is_theme
+    from utils.render_pool import RenderUnavailableError
+    from utils.report_store import save_report
+
+    if theme is not None and not is_theme(theme):
+        return json_response({"error": f"Unknown theme: {theme}"}, 400)
+
+    try:
+        generated_at = parse_generated_at(data.get('generated_at'))
+    except ValueError:
+        return json_response({"error": "Invalid generated_at (ISO 8601 expected)"}, 400)
+
+    # étape 1: résumé groq, sans bloquer la boucle d'événements
+    try:
+        with timings.stage('groq'):
+            summary, meta = await generate_summary_details_async(raw_data)
+    except GroqUnavailableError as e:
+        return unavailable_response(e, "AI service unavailable")
+
+    # le client possède déjà ce pdf: pas de rendu
+    etag = pdf_cache_key(title, summary, author, role, theme, generated_at)
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        logger.info("rapport inchange", cached=meta.get('cached'))
+        return 304, {'ETag': f'"{etag}"', 'Cache-Control': PDF_CACHE_CONTROL, **summary_headers(meta)}, b''
+
+    # étape 2: rendu du pdf hors de la boucle d'événements
+    try:
+        pdf, etag = await asyncio.to_thread(render_report, title, summary, author, role, theme=theme,
+                                            generated_at=generated_at, timings=timings)
+    except RenderUnavailableError as e:
+        return unavailable_response(e, "PDF renderer unavailable")
+
+    # rapport conservé pour en régénérer une section (X-Report-ID)
+    report_id = save_report(title, summary, author, role, pdf, etag, theme=theme)
+
+    headers = {
+        'Content-Type': 'application/pdf',
+        'Content-Disposition': content_disposition(f'rapport_{title.replace(" ", "_")}.pdf'),
+        'ETag': f'"{etag}"',
+        'Cache-Control': PDF_CACHE_CONTROL,
+        **summary_headers(meta),
+        **report_headers(report_id)
+    }
+    logger.info("rapport genere", summary_chars=len(summary), pdf_bytes=pdf.nbytes,
+                cached=meta.get('cached'), model=meta.get('model'))
+    return 200, headers, pdf
+
+
+# chemin -> (méthodes acceptées, route)
+ROUTES = {
+    '/api/health': (('GET',), health),
+    '/api/generate-report': (('POST',), generate_report),
+}
+
+
+async def lifespan(receive, send):
+    """
+    démarrage et arrêt du serveur: le client groq asynchrone est fermé à l'arrêt
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            from utils.groq_client import close_async_client
+
+            await close_async_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """
+    point d'entrée asgi
+    """
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    headers = dict(scope.get('headers', []))
+    request_id = new_request_id(headers.get(b'x-request-id', b'').decode('latin-1'))
+
+    route = ROUTES.get(scope['path'])
+    method = scope['method']
+    if route is None:
+        status, response_headers, body = json_response({"error": "Not found"}, 404)
+    elif method == 'OPTIONS':
+        # cors preflight
+        status, response_headers, body = 204, dict(PREFLIGHT_HEADERS), b''
+    elif method not in route[0]:
+        status, response_headers, body = json_response({"error": "Method not allowed"}, 405,
+                                                       {'Allow': ', '.join(route[0] + ('OPTIONS',))})
+    else:
+        body = await read_body(receive)
+        if body is None:
+            status, response_headers, body = json_response({"error": "Request body too large"}, 413)
+        else:
+            status, response_headers, body = await route[1](Request(scope, body))
+
+    response_headers.update(CORS_HEADERS)
+    response_headers['X-Request-ID'] = request_id
+    await send_response(send, status, response_headers, body)
@@ -7,24 +7,60 @@ import sys
 import os
 import base64
 
-# logs au chargement
-print("=" * 60)
-print("chargement api/generate-report.py")
-print("=" * 60)
-print(f"python: {sys.version}")
-print(f"cwd: {os.getcwd()}")
-print(f"groq_key: {bool(os.environ.get('GROQ_API_KEY'))}")
-print("=" * 60)
+# chemin pour les imports des utilitaires
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from utils.logger import get_logger, new_request_id
+from utils.responses import PDF_CACHE_CONTROL, etag_matches, report_headers
+from utils.metrics import RequestTimings
+from utils.warmup import start_preload
+
+logger = get_logger('generate_report')
+
+# reportlab et groq chargés en fond pendant l'attente de la première requête
+start_preload()
+
+# une ligne au chargement (silencieuse au niveau par défaut en production)
+logger.info("chargement api/generate-report.py", python=sys.version.split()[0],
+            groq_configured=bool(os.environ.get('GROQ_API_KEY')))
+
+def _request_header(request, name):
+    """
+    en-tête de la requête vercel (objet ou dictionnaire), None si absent
+    """
+    headers = getattr(request, 'headers', None)
+    if headers is None and isinstance(request, dict):
+        headers = request.get('headers')
+    if not headers:
+        return None
+    try:
+        return headers.get(name) or headers.get(name.lower())
+    except AttributeError:
+        return None
 
 # handler vercel - format le plus simple
 def handler(request):
     """
     handler vercel pour /api/generate-report
+    mesure les étapes et les renvoie dans l'en-tête server-timing
+    """
+    request_id = new_request_id(_request_header(request, 'X-Request-ID'))
+    timings = RequestTimings('generate-report')
+    response = handle_request(request, timings)
+    response['headers']['Server-Timing'] = timings.header()
+    response['headers']['X-Request-ID'] = request_id
+    timings.finish(response['statusCode'])
+    return response
+
+def handle_request(request, timings):
+    """
+    traitement de /api/generate-report
     format simple et robuste
+    param timings: RequestTimings de la requête
     """
     try:
-        print("handler generate-report appelé")
-        
         # récupérer méthode http
         try:
             method = request.method
@@ -34,7 +70,7 @@ def handler(request):
             except:
                 method = 'POST'
         
-        print(f"   method: {method}")
+        logger.debug("handler generate-report appele", method=method)
         
         # gestion options (cors)
         if method == 'OPTIONS':
@@ -43,7 +79,7 @@ def handler(request):
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
                     'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                    'Access-Control-Allow-Headers': 'Content-Type'
+                    'Access-Control-Allow-Headers': 'Content-Type, If-None-Match'
                 },
                 'body': ''
             }
@@ -57,28 +93,28 @@ def handler(request):
             }
         
         # parser body
-        try:
-            if hasattr(request, 'body'):
-                body_str = request.body
-            elif isinstance(request, dict):
-                body_str = request.get('body', '{}')
-            else:
-                body_str = getattr(request, 'body', '{}')
+        with timings.stage('parse'):
+            try:
+                if hasattr(request, 'body'):
+                    body_str = request.body
+                elif isinstance(request, dict):
+                    body_str = request.get('body', '{}')
+                else:
+                    body_str = getattr(request, 'body', '{}')
             
-            # convertir bytes en string si nécessaire
-            if isinstance(body_str, bytes):
-                body_str = body_str.decode('utf-8')
+                # convertir bytes en string si nécessaire
+                if isinstance(body_str, bytes):
+                    body_str = body_str.decode('utf-8')
             
-            # parser json
-            data = json.loads(body_str) if body_str else {}
-            print(f"   données reçues: {list(data.keys()) if isinstance(data, dict) else 'pas un dict'}")
-        except Exception as e:
-            print(f"erreur parsing: {str(e)}")
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": f"Invalid JSON: {str(e)}"}, ensure_ascii=False)
-            }
+                # parser json
+                data = json.loads(body_str) if body_str else {}
+            except Exception as e:
+                logger.info("json invalide", error=str(e))
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({"error": f"Invalid JSON: {str(e)}"}, ensure_ascii=False)
+                }
         
         # validation
         if not data or not data.get('raw_data'):
@@ -94,42 +130,63 @@ def handler(request):
         author = data.get('author', 'Anonyme')
         role = data.get('role', 'Technicien')
         
-        print(f"   titre: {title}, auteur: {author}, données: {len(raw_data)} chars")
-        
-        # ajouter chemin pour imports
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        if current_dir not in sys.path:
-            sys.path.insert(0, current_dir)
+        logger.debug("demande de rapport", title=title, raw_chars=len(raw_data))
         
         # importer utilitaires
-        print("   import utilitaires...")
         from utils.ai_handler import generate_summary
-        from utils.pdf_generator import create_pdf
-        print("   utilitaires ok")
+        from utils.call_policy import GroqUnavailableError
+        from utils.pdf_generator import render_report, pdf_cache_key, parse_generated_at
+        from utils.report_store import save_report
         
-        # générer résumé ia
-        print("   génération ia...")
-        summary = generate_summary(raw_data)
-        print(f"   résumé ok ({len(summary)} chars)")
+        # date du rapport: fournie par le client pour un pdf reproductible
+        try:
+            generated_at = parse_generated_at(data.get('generated_at'))
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({"error": "Invalid generated_at (ISO 8601 expected)"}, ensure_ascii=False)
+            }
+        
+        # générer résumé ia (503 si groq ne répond pas)
+        try:
+            with timings.stage('groq'):
+                summary = generate_summary(raw_data)
+        except GroqUnavailableError as e:
+            logger.warning("groq indisponible", error=str(e), retry_after=e.retry_after)
+            headers = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+            if e.retry_after:
+                headers['Retry-After'] = str(max(1, round(e.retry_after)))
+            return {
+                'statusCode': 503,
+                'headers': headers,
+                'body': json.dumps({"error": "AI service unavailable", "details": str(e)}, ensure_ascii=False)
+            }
         
-        # générer pdf
-        print("   génération pdf...")
-        pdf_path = create_pdf(title, summary, author, role)
-        print(f"   pdf ok: {pdf_path}")
+        # le client possède déjà ce pdf: 304 sans rendu
+        etag = pdf_cache_key(title, summary, author, role, generated_at=generated_at)
+        if etag_matches(_request_header(request, 'If-None-Match'), etag):
+            logger.info("rapport inchange")
+            return {
+                'statusCode': 304,
+                'headers': {
+                    'ETag': f'"{etag}"',
+                    'Cache-Control': PDF_CACHE_CONTROL,
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': ''
+            }
         
-        # lire pdf
-        with open(pdf_path, 'rb') as f:
-            pdf_bytes = f.read()
+        # générer pdf en mémoire (pas de fichier temporaire à relire puis supprimer)
+        pdf, etag = render_report(title, summary, author, role, generated_at=generated_at, timings=timings)
         
-        # nettoyer
-        try:
-            os.remove(pdf_path)
-        except:
-            pass
+        # rapport conservé pour en régénérer une section (X-Report-ID)
+        report_id = save_report(title, summary, author, role, pdf, etag)
         
-        # encoder base64
-        pdf_b64 = base64.b64encode(pdf_bytes).decode('utf-8')
-        print(f"   pdf encodé ({len(pdf_b64)} chars)")
+        # encoder base64 directement depuis le tampon
+        with timings.stage('encode'):
+            pdf_b64 = base64.b64encode(pdf).decode('ascii')
+        logger.info("rapport genere", summary_chars=len(summary), pdf_bytes=pdf.nbytes)
         
         # retourner
         return {
@@ -137,16 +194,18 @@ def handler(request):
             'headers': {
                 'Content-Type': 'application/pdf',
                 'Content-Disposition': 'attachment; filename="rapport.pdf"',
-                'Access-Control-Allow-Origin': '*'
+                'ETag': f'"{etag}"',
+                'Cache-Control': PDF_CACHE_CONTROL,
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Expose-Headers': 'ETag, X-Report-ID',
+                **report_headers(report_id)
             },
             'body': pdf_b64,
             'isBase64Encoded': True
         }
         
     except Exception as e:
-        print(f"ERREUR: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception("erreur dans generate-report", error=type(e).__name__)
         
         return {
             'statusCode': 500,
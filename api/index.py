@@ -2,17 +2,27 @@
 point d'entrée principal pour vercel
 application flask complète et optimisée
 """
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import os
 import sys
-import traceback
+import json
 
 # configuration du chemin pour les imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
+from utils.logger import get_logger, new_request_id
+from utils.responses import PDF_CACHE_CONTROL, attachment_names, report_headers, summary_headers
+from utils.warmup import start_preload
+
+logger = get_logger('index')
+
+# reportlab et groq sont chargés hors du chemin de la première requête
+# (thread de fond par défaut, voir utils.warmup)
+start_preload()
+
 # créer l'application flask
 app = Flask(__name__)
 
@@ -21,19 +31,102 @@ CORS(app, resources={
     r"/api/*": {
         "origins": "*",
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "If-None-Match"],
+        # métadonnées de la génération lisibles par le frontend
+        "expose_headers": ["X-Summary-Cache", "X-Summary-Similarity", "X-Tokens-Original", "X-Tokens-Sent",
+                           "X-Tokens-Saved", "Server-Timing", "X-Request-ID", "ETag", "X-Report-ID"]
     }
 })
 
-# logs au démarrage
-print("=" * 60)
-print("SYNTHESIA API - DEMARRAGE")
-print("=" * 60)
-print(f"python version: {sys.version}")
-print(f"working directory: {os.getcwd()}")
-print(f"api directory: {current_dir}")
-print(f"groq_api_key configured: {bool(os.environ.get('GROQ_API_KEY'))}")
-print("=" * 60)
+# une ligne au démarrage (silencieuse au niveau par défaut en production)
+logger.info("demarrage de l'api", python=sys.version.split()[0], cwd=os.getcwd(),
+            groq_configured=bool(os.environ.get('GROQ_API_KEY')))
+
+def iter_chunks(data, chunk_size=64 * 1024):
+    """
+    découpe un tampon binaire en morceaux pour l'envoyer en streaming
+    param data: bytes ou memoryview
+    param chunk_size: taille des morceaux en octets
+    return: générateur de bytes
+    """
+    view = memoryview(data)
+    for start in range(0, view.nbytes, chunk_size):
+        yield view[start:start + chunk_size].tobytes()
+
+def pdf_response(pdf, filename, etag=None):
+    """
+    réponse http de téléchargement d'un pdf rendu en mémoire
+    le tampon est envoyé tel quel avec le bon content-length
+    param pdf: contenu du pdf (bytes ou memoryview)
+    param filename: nom du fichier proposé au téléchargement
+    param etag: empreinte du pdf (pdf_cache_key) ou None
+    return: réponse flask
+    """
+    response = Response(
+        iter_chunks(pdf),
+        mimetype='application/pdf',
+        headers={'Content-Length': str(memoryview(pdf).nbytes)},
+        direct_passthrough=True
+    )
+    response.headers.set('Content-Disposition', 'attachment', **attachment_names(filename))
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = PDF_CACHE_CONTROL
+    return response
+
+def not_modified(etag):
+    """
+    réponse 304 quand le client possède déjà ce pdf (If-None-Match)
+    param etag: empreinte du pdf
+    return: réponse flask, ou None si le client n'a pas cette version
+    """
+    if not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = PDF_CACHE_CONTROL
+    return response
+
+@app.before_request
+def assign_request_id():
+    """
+    identifiant de la requête (repris de X-Request-ID s'il est fourni),
+    ajouté à toutes les lignes de journal de la requête
+    """
+    g.request_id = new_request_id(request.headers.get('X-Request-ID'))
+
+@app.after_request
+def add_server_timing(response):
+    """
+    ajoute l'en-tête server-timing aux requêtes mesurées
+    et enregistre leur durée totale
+    """
+    timings = g.pop('timings', None)
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.header()
+        timings.finish(response.status_code)
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    métriques du processus au format texte prometheus
+    """
+    from utils.metrics import render, CONTENT_TYPE
+    
+    return Response(render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/warmup', methods=['GET', 'POST'])
+def warmup():
+    """
+    préchauffe l'instance (modules, thèmes, polices, logo, client groq)
+    à appeler après un déploiement ou par un ping planifié
+    """
+    from utils.warmup import warm_up
+    
+    return jsonify({"status": "warm", **warm_up()})
 
 @app.route('/api/health', methods=['GET', 'OPTIONS'])
 def health():
@@ -42,7 +135,7 @@ def health():
     retourne le statut de l'api et la configuration
     """
     try:
-        print("route /api/health appelee")
+        logger.debug("route /api/health appelee")
         
         # vérifier la configuration
         groq_configured = bool(os.environ.get('GROQ_API_KEY'))
@@ -55,12 +148,10 @@ def health():
             "environment": "production" if os.environ.get('VERCEL') else "development"
         }
         
-        print(f"reponse health: {response}")
         return jsonify(response)
         
     except Exception as e:
-        print(f"erreur dans health: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("erreur dans health")
         return jsonify({
             "error": "Internal server error",
             "details": str(e)
@@ -73,23 +164,27 @@ def generate_report():
     accepte les données du formulaire et retourne un pdf
     """
     try:
-        print("route /api/generate-report appelee")
+        logger.debug("route /api/generate-report appelee")
         
         # gestion des requêtes options (cors preflight)
         if request.method == 'OPTIONS':
-            print("requete options (cors)")
             return '', 204
         
+        # durées des étapes (en-tête server-timing et /api/metrics)
+        from utils.metrics import RequestTimings
+        g.timings = timings = RequestTimings('generate-report')
+        
         # parser les données json de la requête
-        data = request.get_json()
+        with timings.stage('parse'):
+            data = request.get_json()
         
         if not data:
-            print("aucune donnee recue")
+            logger.info("aucune donnee recue")
             return jsonify({"error": "No data provided"}), 400
         
         # validation des données requises
         if not data.get('raw_data'):
-            print("raw_data manquant")
+            logger.info("raw_data manquant")
             return jsonify({"error": "Missing raw_data field"}), 400
         
         # extraire les données du formulaire
@@ -97,46 +192,279 @@ def generate_report():
         raw_data = data.get('raw_data', '')
         author = data.get('author', 'Anonyme')
         role = data.get('role', 'Technicien')
+        theme = data.get('theme')
         
-        print(f"titre: {title}")
-        print(f"auteur: {author}")
-        print(f"role: {role}")
-        print(f"donnees brutes: {len(raw_data)} caracteres")
+        logger.debug("demande de rapport", title=title, raw_chars=len(raw_data), theme=theme)
         
         # importer les utilitaires (imports locaux pour éviter les erreurs)
-        print("import des utilitaires...")
-        from utils.ai_handler import generate_summary
-        from utils.pdf_generator import create_pdf
-        print("utilitaires importes")
+        from utils.ai_handler import generate_summary_details
+        from utils.call_policy import GroqUnavailableError
+        from utils.pdf_generator import render_report, pdf_cache_key, parse_generated_at
+        from utils.pdf_styles import is_theme
+        from utils.render_pool import RenderUnavailableError
+        from utils.report_store import save_report
+        
+        # le thème est choisi dans le registre précompilé
+        if theme is not None and not is_theme(theme):
+            return jsonify({"error": f"Unknown theme: {theme}"}), 400
+        
+        # date du rapport: fournie par le client pour un pdf reproductible
+        try:
+            generated_at = parse_generated_at(data.get('generated_at'))
+        except ValueError:
+            return jsonify({"error": "Invalid generated_at (ISO 8601 expected)"}), 400
         
         # étape 1: générer le résumé avec l'ia groq
-        print("etape 1: generation du resume ia...")
-        summary = generate_summary(raw_data)
-        print(f"resume genere ({len(summary)} caracteres)")
-        
-        # étape 2: générer le pdf avec le résumé
-        print("etape 2: generation du pdf...")
-        pdf_path = create_pdf(title, summary, author, role)
-        print(f"pdf cree: {pdf_path}")
-        
-        # étape 3: retourner le pdf au client
-        print("etape 3: envoi du pdf...")
-        
-        # utiliser send_file de flask pour envoyer le pdf
-        response = send_file(
-            pdf_path,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'rapport_{title.replace(" ", "_")}.pdf'
-        )
-        
-        print("pdf envoye avec succes")
+        try:
+            with timings.stage('groq'):
+                summary, meta = generate_summary_details(raw_data)
+        except GroqUnavailableError as e:
+            return groq_unavailable_response(e)
+        
+        # le client possède déjà ce pdf: pas de rendu
+        response = not_modified(pdf_cache_key(title, summary, author, role, theme, generated_at))
+        if response is not None:
+            response.headers.update(summary_headers(meta))
+            logger.info("rapport inchange", cached=meta.get('cached'))
+            return response
+        
+        # étape 2: générer le pdf en mémoire avec le résumé (ou le reprendre du cache)
+        try:
+            pdf, etag = render_report(title, summary, author, role, theme=theme,
+                                      generated_at=generated_at, timings=timings)
+        except RenderUnavailableError as e:
+            return unavailable_response(e, "PDF renderer unavailable")
+        
+        # rapport conservé pour en régénérer une section (X-Report-ID)
+        report_id = save_report(title, summary, author, role, pdf, etag, theme=theme)
+        
+        # étape 3: retourner le pdf au client directement depuis la mémoire
+        with timings.stage('encode'):
+            response = pdf_response(pdf, f'rapport_{title.replace(" ", "_")}.pdf', etag)
+            response.headers.update(summary_headers(meta))
+            response.headers.update(report_headers(report_id))
+        
+        logger.info("rapport genere", summary_chars=len(summary), pdf_bytes=pdf.nbytes,
+                    cached=meta.get('cached'), model=meta.get('model'))
         return response
         
     except Exception as e:
         # gestion complète des erreurs avec logs détaillés
-        print(f"erreur dans generate-report: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("erreur dans generate-report", error=type(e).__name__)
+        
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e),
+            "type": type(e).__name__
+        }), 500
+
+def unavailable_response(error, message):
+    """
+    réponse 503 quand un service ne peut pas répondre, avec retry-after
+    si le délai est connu
+    param error: exception avec un attribut retry_after
+    param message: message d'erreur renvoyé au client
+    return: réponse flask
+    """
+    logger.warning("service indisponible", error=str(error), type=type(error).__name__,
+                   retry_after=error.retry_after)
+    response = jsonify({
+        "error": message,
+        "details": str(error),
+        "type": type(error).__name__
+    })
+    response.status_code = 503
+    if error.retry_after:
+        response.headers['Retry-After'] = str(max(1, round(error.retry_after)))
+    return response
+
+def groq_unavailable_response(error):
+    """
+    réponse 503 quand groq ne répond pas (tentatives épuisées ou
+    disjoncteur ouvert)
+    param error: GroqUnavailableError
+    return: réponse flask
+    """
+    return unavailable_response(error, "AI service unavailable")
+
+def sse_event(event, payload):
+    """
+    formate un événement server-sent events
+    param event: nom de l'événement
+    param payload: données sérialisées en json
+    return: bloc texte de l'événement
+    """
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.route('/api/generate-summary/stream', methods=['POST', 'OPTIONS'])
+def generate_summary_stream():
+    """
+    génère le résumé en streaming (server-sent events)
+    événements envoyés:
+    - token: morceau de texte du résumé
+    - done: identifiant et url de téléchargement du pdf, métadonnées
+      de la génération (cache, tokens économisés par le compactage)
+    - error: message d'erreur
+    """
+    logger.debug("route /api/generate-summary/stream appelee")
+    
+    # gestion des requêtes options (cors preflight)
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    data = request.get_json(silent=True)
+    
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    
+    if not data.get('raw_data'):
+        return jsonify({"error": "Missing raw_data field"}), 400
+    
+    title = data.get('title', 'Rapport')
+    raw_data = data.get('raw_data', '')
+    author = data.get('author', 'Anonyme')
+    role = data.get('role', 'Technicien')
+    theme = data.get('theme')
+    
+    from utils.ai_handler import stream_summary
+    from utils.pdf_generator import render_report
+    from utils.pdf_styles import is_theme
+    from utils.report_store import save_report
+    
+    if theme is not None and not is_theme(theme):
+        return jsonify({"error": f"Unknown theme: {theme}"}), 400
+    
+    def events():
+        try:
+            # étape 1: transmettre les tokens dès qu'ils arrivent
+            parts = []
+            meta = {}
+            for text in stream_summary(raw_data, meta):
+                parts.append(text)
+                yield sse_event('token', {"text": text})
+            summary = ''.join(parts)
+            
+            # étape 2: générer le pdf et le garder pour le téléchargement
+            pdf, etag = render_report(title, summary, author, role, theme=theme)
+            report_id = save_report(title, summary, author, role, pdf, etag, theme=theme)
+            
+            yield sse_event('done', {
+                "report_id": report_id,
+                "pdf_url": f"/api/reports/{report_id}/pdf",
+                "cached": meta.get('cached', False),
+                "compaction": meta.get('compaction'),
+                "near_duplicate": meta.get('near_duplicate')
+            })
+            logger.info("resume streame", report_id=report_id)
+            
+        except Exception as e:
+            logger.exception("erreur dans generate-summary/stream", error=type(e).__name__)
+            yield sse_event('error', {
+                "error": str(e),
+                "type": type(e).__name__
+            })
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={
+            # pas de mise en tampon par les proxys pour un premier octet immédiat
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@app.route('/api/reports/<report_id>/pdf', methods=['GET'])
+def download_report(report_id):
+    """
+    télécharge le pdf d'un rapport généré précédemment
+    (identifiant renvoyé par l'événement done du streaming)
+    """
+    from utils.report_store import get_report, NOT_FOUND_MESSAGE
+    
+    report = get_report(report_id)
+    if report is None:
+        return jsonify({"error": NOT_FOUND_MESSAGE}), 404
+    
+    etag = report.get('etag')
+    if etag:
+        response = not_modified(etag)
+        if response is not None:
+            return response
+    
+    return pdf_response(report['pdf'], f'rapport_{report["title"].replace(" ", "_")}.pdf', etag)
+
+@app.route('/api/reports/<report_id>/sections', methods=['POST', 'OPTIONS'])
+def regenerate_report_section(report_id):
+    """
+    régénère une seule section d'un rapport généré précédemment
+    accepte {"section": "recommandations", "instructions": "...", "generated_at": ...}
+    seule la section demandée est réécrite par l'ia, les autres sont reprises
+    du rapport enregistré, puis le pdf est rendu à nouveau
+    retourne le nouveau pdf, enregistré sous un nouvel identifiant (X-Report-ID)
+    """
+    try:
+        logger.debug("route /api/reports/sections appelee", report_id=report_id)
+        
+        # gestion des requêtes options (cors preflight)
+        if request.method == 'OPTIONS':
+            return '', 204
+        
+        from utils.metrics import RequestTimings
+        g.timings = timings = RequestTimings('regenerate-section')
+        
+        from utils.ai_handler import regenerate_section
+        from utils.call_policy import GroqUnavailableError
+        from utils.pdf_generator import render_report, parse_generated_at
+        from utils.render_pool import RenderUnavailableError
+        from utils.report_store import get_report, save_report, NOT_FOUND_MESSAGE
+        from utils.sections import split_sections
+        
+        report = get_report(report_id)
+        if report is None:
+            return jsonify({"error": NOT_FOUND_MESSAGE}), 404
+        
+        data = request.get_json(silent=True) or {}
+        section = data.get('section')
+        instructions = data.get('instructions')
+        if not section or not instructions:
+            return jsonify({"error": "Missing section or instructions field"}), 400
+        
+        try:
+            generated_at = parse_generated_at(data.get('generated_at'))
+        except ValueError:
+            return jsonify({"error": "Invalid generated_at (ISO 8601 expected)"}), 400
+        
+        # étape 1: réécrire la section demandée (les autres en contexte)
+        try:
+            with timings.stage('groq'):
+                summary, meta = regenerate_section(report['summary'], section, instructions)
+        except LookupError:
+            sections = [item.title for item in split_sections(report['summary']) if item.title]
+            return jsonify({"error": f"Unknown section: {section}", "sections": sections}), 400
+        except GroqUnavailableError as e:
+            return groq_unavailable_response(e)
+        
+        # étape 2: rendre le pdf avec les sections conservées et la nouvelle
+        try:
+            pdf, etag = render_report(report['title'], summary, report['author'], report['role'],
+                                      theme=report.get('theme'), generated_at=generated_at, timings=timings)
+        except RenderUnavailableError as e:
+            return unavailable_response(e, "PDF renderer unavailable")
+        
+        new_report_id = save_report(report['title'], summary, report['author'], report['role'],
+                                    pdf, etag, theme=report.get('theme'))
+        
+        with timings.stage('encode'):
+            response = pdf_response(pdf, f'rapport_{report["title"].replace(" ", "_")}.pdf', etag)
+            response.headers.update(report_headers(new_report_id))
+        
+        logger.info("section regeneree", report_id=report_id, new_report_id=new_report_id,
+                    section=meta['section'], pdf_bytes=pdf.nbytes)
+        return response
+        
+    except Exception as e:
+        logger.exception("erreur dans reports/sections", error=type(e).__name__)
         
         return jsonify({
             "error": "Internal server error",
@@ -144,6 +472,158 @@ def generate_report():
             "type": type(e).__name__
         }), 500
 
+@app.route('/api/generate-reports', methods=['POST', 'OPTIONS'])
+def generate_reports():
+    """
+    génère un lot de rapports et les renvoie dans une archive zip
+    accepte {"reports": [...], "concurrency": n} ou directement une liste
+    les résumés ia tournent en parallèle (concurrence bornée) et chaque
+    pdf est rendu et ajouté à l'archive dès que son résumé est prêt
+    """
+    logger.debug("route /api/generate-reports appelee")
+    
+    # gestion des requêtes options (cors preflight)
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    from utils.ai_handler import generate_summary
+    from utils.pdf_generator import render_report
+    from utils.pdf_styles import THEMES
+    from utils.batch import (
+        MAX_REPORTS, clamp_concurrency, is_valid_report, summarize_concurrently, stream_zip,
+        report_filename
+    )
+    
+    data = request.get_json(silent=True)
+    reports = data.get('reports') if isinstance(data, dict) else data
+    
+    if not isinstance(reports, list) or not reports:
+        return jsonify({"error": "No reports provided"}), 400
+    
+    if len(reports) > MAX_REPORTS:
+        return jsonify({"error": f"Too many reports (max {MAX_REPORTS})"}), 400
+    
+    # validation de chaque rapport avant de lancer quoi que ce soit
+    invalid = [index for index, report in enumerate(reports) if not is_valid_report(report, THEMES)]
+    if invalid:
+        return jsonify({
+            "error": "Invalid reports (missing raw_data, non-string title/author/role or unknown theme)",
+            "indexes": invalid
+        }), 400
+    
+    try:
+        concurrency = clamp_concurrency(data.get('concurrency') if isinstance(data, dict) else None)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid concurrency"}), 400
+    
+    logger.info("lot de rapports", reports=len(reports), concurrency=concurrency)
+    
+    def entries():
+        raw_texts = [report['raw_data'] for report in reports]
+        for index, summary in summarize_concurrently(raw_texts, generate_summary, concurrency):
+            report = reports[index]
+            title = report.get('title') or 'Rapport'
+            try:
+                if isinstance(summary, Exception):
+                    raise summary
+                pdf, _ = render_report(
+                    title,
+                    summary,
+                    report.get('author') or 'Anonyme',
+                    report.get('role') or 'Technicien',
+                    theme=report.get('theme')
+                )
+                yield report_filename(index, title), pdf
+            except Exception as e:
+                # un rapport en échec n'interrompt pas le lot
+                logger.warning("erreur sur un rapport du lot", index=index, error=str(e))
+                yield f"{index + 1:03d}_erreur.txt", f"{type(e).__name__}: {str(e)}".encode('utf-8')
+    
+    response = Response(stream_with_context(stream_zip(entries())), mimetype='application/zip')
+    response.headers.set('Content-Disposition', 'attachment', filename='rapports.zip')
+    return response
+
+@app.route('/api/jobs', methods=['POST', 'OPTIONS'])
+def create_job():
+    """
+    crée un job de génération de rapport et rend la main immédiatement
+    le client suit l'avancement via /api/jobs/<id> puis télécharge le pdf
+    champ optionnel callback_url: appelé en post à la fin du job
+    """
+    logger.debug("route /api/jobs appelee")
+    
+    # gestion des requêtes options (cors preflight)
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    from utils.jobs import submit_job, validate_callback_url
+    from utils.pdf_styles import is_theme
+    
+    data = request.get_json(silent=True)
+    
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    
+    if not data.get('raw_data'):
+        return jsonify({"error": "Missing raw_data field"}), 400
+    
+    if data.get('theme') is not None and not is_theme(data.get('theme')):
+        return jsonify({"error": f"Unknown theme: {data.get('theme')}"}), 400
+    
+    callback_url = data.get('callback_url')
+    if callback_url:
+        try:
+            validate_callback_url(callback_url)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    
+    payload = {
+        'title': data.get('title', 'Rapport'),
+        'raw_data': data['raw_data'],
+        'author': data.get('author', 'Anonyme'),
+        'role': data.get('role', 'Technicien'),
+        'theme': data.get('theme'),
+    }
+    job_id = submit_job(payload, callback_url=callback_url)
+    
+    return jsonify({
+        "id": job_id,
+        "status": "queued",
+        "status_url": f"/api/jobs/{job_id}",
+        "pdf_url": f"/api/jobs/{job_id}/pdf"
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    statut et avancement par étape d'un job
+    (queued, summarizing, rendering, done ou error)
+    """
+    from utils.jobs import get_job
+    
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/pdf', methods=['GET'])
+def job_pdf(job_id):
+    """
+    télécharge le pdf d'un job terminé
+    """
+    from utils.jobs import get_job_pdf
+    
+    result = get_job_pdf(job_id)
+    if result is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    status, title, pdf = result
+    if pdf is None:
+        return jsonify({"error": "Report not ready", "status": status}), 409
+    
+    return pdf_response(pdf, f'rapport_{title.replace(" ", "_")}.pdf')
+
 # export pour vercel
 # vercel cherche automatiquement 'app' ou 'application'
 # on exporte les deux pour être sûr
@@ -151,5 +631,5 @@ application = app
 
 # pour le développement local (optionnel)
 if __name__ == '__main__':
-    print("demarrage en mode developpement local")
+    logger.info("demarrage en mode developpement local")
     app.run(debug=True, port=5000)
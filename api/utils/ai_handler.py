@@ -1,68 +1,528 @@
 """
 générateur de résumé avec groq ai
 """
+import difflib
 import os
+import unicodedata
+
+from utils.cache import LRUCache, DiskCache, TieredCache, make_key, DEFAULT_DISK_DIR
+from utils.groq_client import get_client
+from utils.chunking import estimate_tokens, split_notes
+from utils.compaction import compact_notes, fit_budget
+from utils.call_policy import create_completion, GroqUnavailableError
+from utils.metrics import record_cache
+from utils.similarity import SimHashIndex, simhash, similarity, max_distance_for
+from utils.logger import get_logger
+
+# paramètres du modèle (font partie de la clé de cache)
+MODEL = "llama-3.3-70b-versatile"
+MAX_TOKENS = 800
+TEMPERATURE = 0.7
+
+# version du prompt système: à incrémenter à chaque modification du prompt
+# pour invalider les résumés déjà en cache
+PROMPT_VERSION = 1
+
+logger = get_logger('ai_handler')
+
+# prompt système pour guider l'ia
+SYSTEM_PROMPT = """Tu es un assistant expert qui transforme des notes techniques 
+        en rapports professionnels de qualité. Tu dois structurer le contenu en sections claires :
+        
+        - CONTEXTE DE L'INTERVENTION
+        - PROBLEMATIQUE IDENTIFIEE  
+        - ACTIONS TECHNIQUES REALISEES
+        - RESULTATS OBTENUS
+        - RECOMMANDATIONS
+        
+        Utilise un ton professionnel et précis. Ne mets PAS d'emojis."""
+
+# mode découpé (map-reduce) pour les notes trop longues pour un seul appel:
+# chaque morceau est condensé en parallèle puis un dernier appel rédige le rapport
+CHUNK_THRESHOLD_TOKENS = int(os.environ.get('SYNTHESIA_CHUNK_THRESHOLD_TOKENS', '6000'))
+CHUNK_TOKENS = int(os.environ.get('SYNTHESIA_CHUNK_TOKENS', '3000'))
+CHUNK_CONCURRENCY = int(os.environ.get('SYNTHESIA_CHUNK_CONCURRENCY', '4'))
+CHUNK_MAX_TOKENS = 400
+# tours de découpage au plus quand les synthèses restent trop longues
+CHUNK_ROUNDS = 3
+
+# prompt des appels "map": condenser un extrait sans rédiger le rapport
+CHUNK_PROMPT = """Tu condenses un extrait de notes techniques d'intervention.
+        Conserve tous les faits utiles : dates et heures, équipements, erreurs,
+        actions réalisées, résultats et points en suspens, dans l'ordre chronologique.
+        Réponds par une liste concise de faits, sans titres ni introduction. Ne mets PAS d'emojis."""
+
+# prompt d'adaptation d'un rapport existant à des notes presque identiques
+EDIT_PROMPT = """Tu mets à jour un rapport d'intervention existant pour qu'il corresponde
+        à de nouvelles notes techniques, presque identiques aux notes d'origine.
+        Conserve la structure, les sections et le ton du rapport. Modifie uniquement
+        ce qui diffère (lieux, personnes, heures, équipements, actions, résultats).
+        Réponds uniquement par le rapport complet mis à jour. Ne mets PAS d'emojis."""
+
+# réécriture d'une seule section d'un rapport, les autres servant de contexte
+SECTION_MAX_TOKENS = 300
+SECTION_PROMPT = """Tu réécris une seule section d'un rapport d'intervention professionnel
+        en suivant les consignes données. Les autres sections du rapport te sont
+        fournies pour contexte : reste cohérent avec elles sans les répéter.
+        Réponds uniquement par le nouveau contenu de la section, sans son titre.
+        Utilise un ton professionnel et précis. Ne mets PAS d'emojis."""
+
+# notes presque identiques à des notes déjà résumées (voir utils.similarity):
+# le rapport précédent est adapté par un prompt court (rapport + lignes
+# modifiées). la réutilisation telle quelle, sans appel groq, est à activer
+# explicitement (seuil <= 1): deux notes qui diffèrent d'un mot (nom,
+# étage) ont souvent exactement la même empreinte, le rapport repris serait
+# faux. des notes identiques sont déjà servies par le cache exact
+NEAR_DUPLICATES_ENABLED = os.environ.get('SYNTHESIA_NEAR_DUPLICATES', '1') == '1'
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('SYNTHESIA_NEAR_DUPLICATE_THRESHOLD', '0.88'))
+NEAR_DUPLICATE_REUSE_THRESHOLD = float(os.environ.get('SYNTHESIA_NEAR_DUPLICATE_REUSE_THRESHOLD', '2.0'))
+
+# compactage des notes (logs répétés, blocs de données) avant le prompt
+COMPACTION_ENABLED = os.environ.get('SYNTHESIA_COMPACTION', '1') == '1'
+
+# cache des résumés: mémoire (lru + ttl) et disque optionnel sous /tmp
+# pour que les instances serverless chaudes le conservent entre invocations
+summary_cache = TieredCache(
+    LRUCache(
+        max_size=int(os.environ.get('SYNTHESIA_SUMMARY_CACHE_SIZE', '256')),
+        ttl=int(os.environ.get('SYNTHESIA_SUMMARY_CACHE_TTL', '86400'))
+    ),
+    DiskCache(
+        directory=os.environ.get('SYNTHESIA_SUMMARY_CACHE_DIR', os.path.join(DEFAULT_DISK_DIR, 'summaries')),
+        ttl=int(os.environ.get('SYNTHESIA_SUMMARY_CACHE_TTL', '86400'))
+    ) if os.environ.get('SYNTHESIA_SUMMARY_CACHE_DISK', '1') == '1' else None
+)
+
+# empreintes des notes résumées -> clé du résumé en cache
+near_duplicate_index = SimHashIndex(
+    max_size=int(os.environ.get('SYNTHESIA_NEAR_DUPLICATE_SIZE', '100000')),
+    max_distance=max_distance_for(NEAR_DUPLICATE_THRESHOLD)
+)
+# notes des derniers résumés: le prompt d'adaptation n'envoie que les lignes modifiées
+recent_notes = LRUCache(
+    max_size=int(os.environ.get('SYNTHESIA_NEAR_DUPLICATE_NOTES', '1024')),
+    ttl=int(os.environ.get('SYNTHESIA_SUMMARY_CACHE_TTL', '86400'))
+)
+
+def normalize_raw_text(raw_text):
+    """
+    normalise les notes brutes pour que des variations sans importance
+    (fins de ligne, espaces en fin de ligne, lignes vides en bordure)
+    donnent la même clé de cache
+    param raw_text: notes brutes
+    return: texte normalisé
+    """
+    text = unicodedata.normalize('NFC', raw_text)
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = [line.rstrip() for line in text.split('\n')]
+    return '\n'.join(lines).strip()
+
+def summary_cache_key(raw_text):
+    """
+    clé de cache d'un résumé: modèle, version du prompt, paramètres
+    de génération et notes normalisées
+    param raw_text: notes brutes
+    return: empreinte sha256
+    """
+    return make_key(MODEL, PROMPT_VERSION, TEMPERATURE, MAX_TOKENS, normalize_raw_text(raw_text))
+
+def build_messages(raw_text):
+    """
+    construit les messages envoyés à groq (prompt système + notes)
+    param raw_text: notes brutes
+    return: liste de messages au format chat
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Transforme ces notes techniques en rapport professionnel structuré :\n\n{raw_text}"}
+    ]
+
+def prepare_notes(raw_text):
+    """
+    notes envoyées au modèle: normalisées puis compactées
+    param raw_text: notes brutes
+    return: tuple (notes, statistiques du compactage ou None si désactivé)
+    """
+    notes = normalize_raw_text(raw_text)
+    if not COMPACTION_ENABLED:
+        return notes, None
+
+    notes, stats = compact_notes(notes)
+    if stats['tokens_saved']:
+        logger.info("notes compactees", tokens_saved=stats['tokens_saved'],
+                    original_tokens=stats['original_tokens'], compacted_tokens=stats['compacted_tokens'])
+    return notes, stats
+
+def find_near_duplicate(text):
+    """
+    résumé déjà généré pour des notes presque identiques
+    param text: notes normalisées
+    return: tuple (empreinte des notes, voisin ou None)
+            voisin: dictionnaire summary, notes (None si oubliées) et similarity
+    """
+    if not NEAR_DUPLICATES_ENABLED:
+        return None, None
+
+    fingerprint = simhash(text)
+    match = near_duplicate_index.nearest(fingerprint)
+    if match is None:
+        record_cache('near_duplicate', False)
+        return fingerprint, None
+
+    neighbour, cache_key, _ = match
+    summary = summary_cache.get(cache_key)
+    record_cache('near_duplicate', summary is not None)
+    if summary is None:
+        # résumé sorti du cache: l'empreinte ne sert plus
+        near_duplicate_index.discard(neighbour)
+        return fingerprint, None
+
+    score = similarity(fingerprint, neighbour)
+    logger.info("notes presque identiques", similarity=round(score, 3))
+    return fingerprint, {'summary': summary, 'notes': recent_notes.get(cache_key), 'similarity': score}
+
+def remember_summary(fingerprint, cache_key, text):
+    """
+    ajoute des notes résumées à l'index des notes presque identiques
+    param fingerprint: empreinte des notes (None si l'index est désactivé)
+    param cache_key: clé du résumé en cache
+    param text: notes normalisées
+    """
+    if fingerprint is None:
+        return
+    near_duplicate_index.add(fingerprint, cache_key)
+    recent_notes.set(cache_key, text)
+
+def reuses_near_duplicate(similar):
+    """
+    vrai si le rapport du voisin est repris tel quel, sans appel groq
+    (seulement au-delà du seuil de réutilisation, désactivé par défaut)
+    param similar: voisin renvoyé par find_near_duplicate ou None
+    """
+    return similar is not None and similar['similarity'] >= NEAR_DUPLICATE_REUSE_THRESHOLD
+
+def build_edit_messages(similar, text, notes):
+    """
+    messages de l'appel qui adapte le rapport de notes presque identiques
+    seules les lignes modifiées sont envoyées quand les notes précédentes
+    sont connues et que la différence est plus courte que les notes
+    param similar: voisin renvoyé par find_near_duplicate
+    param text: notes normalisées
+    param notes: notes préparées (compactées)
+    return: liste de messages, None si les notes sont trop longues pour
+            un seul appel (mode découpé habituel)
+    """
+    changes = None
+    if similar['notes'] is not None:
+        changes = '\n'.join(
+            line for line in difflib.unified_diff(similar['notes'].split('\n'), text.split('\n'), lineterm='', n=0)
+            if line[:1] in '+-' and not line.startswith(('+++', '---'))
+        )
+
+    if changes is not None and len(changes) < len(notes):
+        request = ("Modifications des notes (lignes retirées : -, lignes ajoutées : +) :\n\n"
+                   f"{changes or '(aucune ligne modifiée)'}")
+    elif estimate_tokens(notes) <= CHUNK_THRESHOLD_TOKENS:
+        request = f"Nouvelles notes :\n\n{notes}"
+    else:
+        return None
+
+    return [
+        {"role": "system", "content": EDIT_PROMPT},
+        {"role": "user", "content": f"Rapport existant :\n\n{similar['summary']}\n\n{request}"}
+    ]
+
+def build_chunk_messages(chunk, index, total):
+    """
+    messages d'un appel "map" sur un extrait des notes
+    param chunk: extrait des notes
+    param index: position de l'extrait (à partir de 0)
+    param total: nombre d'extraits
+    return: liste de messages au format chat
+    """
+    return [
+        {"role": "system", "content": CHUNK_PROMPT},
+        {"role": "user", "content": f"Extrait {index + 1}/{total} des notes :\n\n{chunk}"}
+    ]
+
+def build_reduce_messages(partials):
+    """
+    messages de l'appel "reduce": le rapport habituel à partir des
+    synthèses partielles, dans l'ordre des notes
+    param partials: synthèses des extraits
+    return: liste de messages au format chat
+    """
+    notes = '\n\n'.join(
+        f"Partie {index + 1} :\n{partial}" for index, partial in enumerate(partials)
+    )
+    # dernier recours: synthèses encore trop longues après les tours de découpage
+    notes, dropped = fit_budget(notes)
+    if dropped:
+        logger.warning("syntheses tronquees au budget", dropped_lines=dropped)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": (
+            "Ces notes techniques ont été condensées partie par partie, dans l'ordre chronologique. "
+            f"Transforme-les en un seul rapport professionnel structuré :\n\n{notes}"
+        )}
+    ]
+
+def summarize_chunks(client, chunks):
+    """
+    condense les extraits en parallèle (au plus CHUNK_CONCURRENCY appels)
+    param client: client groq
+    param chunks: extraits des notes
+    return: synthèses partielles dans l'ordre des extraits
+    lève la première erreur rencontrée
+    """
+    # import local: le mode découpé est rare, le pool n'est chargé qu'au besoin
+    from utils.batch import summarize_concurrently
+
+    total = len(chunks)
+    messages = {chunk_index: build_chunk_messages(chunk, chunk_index, total)
+                for chunk_index, chunk in enumerate(chunks)}
+
+    def summarize_chunk(chunk_index):
+        response = create_completion(
+            client,
+            MODEL,
+            messages=messages[chunk_index],
+            max_tokens=CHUNK_MAX_TOKENS,
+            temperature=TEMPERATURE
+        )
+        return response.choices[0].message.content or ''
+
+    partials = [None] * total
+    for chunk_index, result in summarize_concurrently(range(total), summarize_chunk, CHUNK_CONCURRENCY):
+        if isinstance(result, Exception):
+            raise result
+        partials[chunk_index] = result
+    return partials
+
+def build_summary_messages(client, raw_text):
+    """
+    messages de l'appel qui rédige le rapport
+    au-delà de CHUNK_THRESHOLD_TOKENS, les notes sont découpées et condensées
+    en parallèle (map), le rapport est rédigé à partir des synthèses (reduce);
+    les synthèses trop longues sont redécoupées, au plus CHUNK_ROUNDS tours
+    param client: client groq
+    param raw_text: notes brutes
+    return: liste de messages au format chat
+    """
+    if estimate_tokens(raw_text) <= CHUNK_THRESHOLD_TOKENS:
+        return build_messages(raw_text)
+
+    text = raw_text
+    # synthèses encore trop longues (notes énormes): nouveau tour de découpage
+    for _ in range(CHUNK_ROUNDS):
+        chunks = split_notes(text, CHUNK_TOKENS)
+        logger.info("notes longues decoupees", tokens=estimate_tokens(text), chunks=len(chunks))
+        partials = summarize_chunks(client, chunks)
+        text = '\n\n'.join(partials)
+        if estimate_tokens(text) <= CHUNK_THRESHOLD_TOKENS:
+            break
+
+    return build_reduce_messages(partials)
 
 def generate_summary(raw_text):
     """
     génère un résumé avec groq ai
+    les résumés réussis sont mis en cache: un rapport re-soumis avec
+    les mêmes notes (titre ou auteur modifiés) ne rappelle pas groq
     param raw_text: texte brut à transformer en rapport
     return: texte du rapport généré par l'ia
+    lève GroqUnavailableError si groq ne répond pas (voir call_policy)
+    """
+    return generate_summary_details(raw_text)[0]
+
+def generate_summary_details(raw_text):
+    """
+    comme generate_summary, avec les métadonnées de la génération
+    param raw_text: texte brut à transformer en rapport
+    return: tuple (texte du rapport, métadonnées)
+            métadonnées: cached (résumé servi depuis le cache), model
+            (modèle qui a répondu), compaction (statistiques du
+            compactage des notes, ou None) et near_duplicate (similarité
+            des notes presque identiques dont le rapport a été repris, ou None)
+    lève GroqUnavailableError si groq ne répond pas (voir call_policy)
     """
+    meta = {'cached': False, 'model': None, 'compaction': None, 'near_duplicate': None}
+
+    cache_key = summary_cache_key(raw_text)
+    cached = summary_cache.get(cache_key)
+    record_cache('summary', cached is not None)
+    if cached is not None:
+        logger.debug("resume ia servi depuis le cache", chars=len(cached))
+        meta['cached'] = True
+        return cached, meta
+
     try:
-        # import groq ici (pas au niveau module pour éviter les erreurs au chargement)
-        from groq import Groq
-        
         # récupérer la clé api depuis les variables d'environnement
         api_key = os.environ.get('GROQ_API_KEY')
         
         # vérifier que la clé est configurée
         if not api_key:
-            return "ERREUR: Clé API Groq non configurée dans les variables d'environnement Vercel"
-        
-        # initialiser le client groq ici (pas au niveau module)
-        client = Groq(api_key=api_key)
+            return "ERREUR: Clé API Groq non configurée dans les variables d'environnement Vercel", meta
         
-        # prompt système pour guider l'ia
-        system_prompt = """Tu es un assistant expert qui transforme des notes techniques 
-        en rapports professionnels de qualité. Tu dois structurer le contenu en sections claires :
-        
-        - CONTEXTE DE L'INTERVENTION
-        - PROBLEMATIQUE IDENTIFIEE  
-        - ACTIONS TECHNIQUES REALISEES
-        - RESULTATS OBTENUS
-        - RECOMMANDATIONS
+        # client groq partagé par le processus (pool de connexions réutilisé)
+        client = get_client(api_key)
         
-        Utilise un ton professionnel et précis. Ne mets PAS d'emojis."""
+        # notes presque identiques à des notes déjà résumées
+        text = normalize_raw_text(raw_text)
+        fingerprint, similar = find_near_duplicate(text)
+        if reuses_near_duplicate(similar):
+            meta.update(cached=True, near_duplicate=similar['similarity'])
+            summary_cache.set(cache_key, similar['summary'])
+            return similar['summary'], meta
         
-        # appel à l'api groq pour générer le résumé
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Transforme ces notes techniques en rapport professionnel structuré :\n\n{raw_text}"}
-            ],
-            max_tokens=800,
-            temperature=0.7
-        )
+        # notes compactées avant de construire le prompt
+        notes, meta['compaction'] = prepare_notes(raw_text)
         
-        # extraire le résumé de la réponse
-        summary = response.choices[0].message.content
+        # rapport précédent adapté aux nouvelles notes, sinon rapport complet
+        messages = build_edit_messages(similar, text, notes) if similar is not None else None
+        return complete_summary(client, cache_key, meta, notes, messages, text, fingerprint, similar)
         
-        print(f"résumé ia généré avec succès ({len(summary)} caractères)")
-        return summary
+    except GroqUnavailableError:
+        # groq indisponible: l'appelant répond 503 au lieu d'un pdf d'erreur
+        raise
         
     except Exception as e:
         # en cas d'erreur, logger et retourner un message d'erreur
-        error_msg = f"Erreur lors de la génération IA : {str(e)}"
-        print(f"erreur: {error_msg}")
+        logger.exception("erreur de generation ia", error=type(e).__name__)
         
         # retourner un message d'erreur détaillé pour l'utilisateur
-        return f"""ERREUR DE GENERATION IA
+        return generation_error_text(raw_text, e), meta
+
+def complete_summary(client, cache_key, meta, notes, messages, text, fingerprint, similar):
+    """
+    appel groq synchrone de generate_summary_details, une fois le cache et
+    les notes presque identiques consultés (aussi utilisé par la version
+    asynchrone pour les notes longues, sans refaire ces recherches)
+    param client: client groq synchrone
+    param cache_key: clé du résumé en cache
+    param meta: métadonnées de la génération, complétées ici
+    param notes: notes compactées
+    param messages: messages d'adaptation du rapport voisin, ou None pour
+                    un rapport complet (après condensation des extraits si
+                    les notes sont trop longues)
+    param text, fingerprint, similar: notes normalisées et résultat de
+                                      find_near_duplicate
+    return: tuple (texte du rapport, métadonnées)
+    lève les erreurs de l'appel (traitées par l'appelant)
+    """
+    if messages is not None:
+        meta['near_duplicate'] = similar['similarity']
+    else:
+        messages = build_summary_messages(client, notes)
+    
+    # appel à l'api groq pour générer le résumé
+    # (délais, nouvelles tentatives et repli: voir call_policy)
+    response = create_completion(
+        client,
+        MODEL,
+        messages=messages,
+        max_tokens=MAX_TOKENS,
+        temperature=TEMPERATURE
+    )
+    
+    # extraire le résumé de la réponse
+    summary = response.choices[0].message.content
+    meta['model'] = getattr(response, 'model', None) or MODEL
+    
+    # seuls les résumés réussis du modèle principal sont mis en cache
+    # (jamais les messages d'erreur ni les réponses du modèle de repli)
+    if summary and meta['model'] == MODEL:
+        summary_cache.set(cache_key, summary)
+        remember_summary(fingerprint, cache_key, text)
+    
+    logger.debug("resume ia genere", chars=len(summary), model=meta['model'])
+    return summary, meta
+
+async def generate_summary_details_async(raw_text):
+    """
+    generate_summary_details pour un serveur asynchrone (api/asgi.py):
+    l'appel à groq n'occupe pas de thread pendant l'attente
+    les notes longues (découpage en extraits) passent par l'appel synchrone
+    (complete_summary), dans un thread
+    param raw_text: texte brut à transformer en rapport
+    return: tuple (texte du rapport, métadonnées), voir generate_summary_details
+    lève GroqUnavailableError si groq ne répond pas (voir call_policy)
+    """
+    import asyncio
+    from utils.call_policy import create_completion_async
+    from utils.groq_client import get_async_client
+
+    meta = {'cached': False, 'model': None, 'compaction': None, 'near_duplicate': None}
+
+    cache_key = summary_cache_key(raw_text)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        record_cache('summary', True)
+        logger.debug("resume ia servi depuis le cache", chars=len(cached))
+        meta['cached'] = True
+        return cached, meta
+
+    record_cache('summary', False)
+    api_key = os.environ.get('GROQ_API_KEY')
+    if not api_key:
+        return "ERREUR: Clé API Groq non configurée dans les variables d'environnement Vercel", meta
+
+    try:
+        text = normalize_raw_text(raw_text)
+        fingerprint, similar = find_near_duplicate(text)
+        if reuses_near_duplicate(similar):
+            meta.update(cached=True, near_duplicate=similar['similarity'])
+            summary_cache.set(cache_key, similar['summary'])
+            return similar['summary'], meta
+
+        notes, meta['compaction'] = prepare_notes(raw_text)
+        messages = build_edit_messages(similar, text, notes) if similar is not None else None
+        if messages is None and estimate_tokens(notes) > CHUNK_THRESHOLD_TOKENS:
+            # mode découpé: appels parallèles du pool de threads existant,
+            # avec les recherches déjà faites ici
+            return await asyncio.to_thread(complete_summary, get_client(api_key), cache_key, meta,
+                                           notes, None, text, fingerprint, similar)
+        if messages is not None:
+            meta['near_duplicate'] = similar['similarity']
+
+        response = await create_completion_async(
+            get_async_client(api_key),
+            MODEL,
+            messages=messages or build_messages(notes),
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE
+        )
+
+        summary = response.choices[0].message.content
+        meta['model'] = getattr(response, 'model', None) or MODEL
+
+        if summary and meta['model'] == MODEL:
+            summary_cache.set(cache_key, summary)
+            remember_summary(fingerprint, cache_key, text)
+
+        logger.debug("resume ia genere", chars=len(summary), model=meta['model'])
+        return summary, meta
+
+    except GroqUnavailableError:
+        raise
+
+    except Exception as e:
+        logger.exception("erreur de generation ia", error=type(e).__name__)
+        return generation_error_text(raw_text, e), meta
+
+def generation_error_text(raw_text, error):
+    """
+    texte du rapport quand la génération échoue: détails de l'erreur
+    et notes brutes
+    param raw_text: notes brutes
+    param error: exception levée
+    return: texte du rapport d'erreur
+    """
+    return f"""ERREUR DE GENERATION IA
 
 Le système n'a pas pu générer le résumé automatique.
 
-Détails techniques : {str(e)}
+Détails techniques : {str(error)}
 
 Veuillez vérifier :
 1. La configuration de la clé API Groq dans Vercel
@@ -73,3 +533,130 @@ Les notes brutes sont ci-dessous :
 
 {raw_text}
 """
+
+def stream_summary(raw_text, meta=None):
+    """
+    génère le résumé en streaming: les morceaux de texte sont produits
+    au fur et à mesure que groq les renvoie
+    un résumé déjà en cache est produit en un seul morceau
+    param raw_text: texte brut à transformer en rapport
+    param meta: dictionnaire complété avec les métadonnées de la génération
+                (voir generate_summary_details), avant le premier morceau
+    return: générateur de morceaux de texte
+    lève une exception si la clé api manque ou si groq échoue
+    (GroqUnavailableError si groq ne répond pas)
+    """
+    if meta is None:
+        meta = {}
+    meta.update(cached=False, model=None, compaction=None, near_duplicate=None)
+
+    cache_key = summary_cache_key(raw_text)
+    cached = summary_cache.get(cache_key)
+    record_cache('summary', cached is not None)
+    if cached is not None:
+        logger.debug("resume ia servi depuis le cache", chars=len(cached))
+        meta['cached'] = True
+        yield cached
+        return
+
+    api_key = os.environ.get('GROQ_API_KEY')
+    if not api_key:
+        raise RuntimeError("Clé API Groq non configurée dans les variables d'environnement Vercel")
+
+    client = get_client(api_key)
+    text = normalize_raw_text(raw_text)
+    fingerprint, similar = find_near_duplicate(text)
+    if reuses_near_duplicate(similar):
+        meta.update(cached=True, near_duplicate=similar['similarity'])
+        summary_cache.set(cache_key, similar['summary'])
+        yield similar['summary']
+        return
+
+    # notes longues: la condensation des extraits précède le flux du rapport
+    notes, meta['compaction'] = prepare_notes(raw_text)
+    messages = build_edit_messages(similar, text, notes) if similar is not None else None
+    if messages is not None:
+        meta['near_duplicate'] = similar['similarity']
+    stream = create_completion(
+        client,
+        MODEL,
+        messages=messages or build_summary_messages(client, notes),
+        max_tokens=MAX_TOKENS,
+        temperature=TEMPERATURE,
+        stream=True
+    )
+
+    parts = []
+    for chunk in stream:
+        if meta['model'] is None:
+            meta['model'] = getattr(chunk, 'model', None) or MODEL
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    # mettre en cache le résumé complet une fois le flux terminé
+    # (sauf réponse du modèle de repli)
+    summary = ''.join(parts)
+    if summary and meta['model'] == MODEL:
+        summary_cache.set(cache_key, summary)
+        remember_summary(fingerprint, cache_key, text)
+
+    logger.debug("resume ia streame", chars=len(summary), model=meta['model'])
+
+def regenerate_section(summary, section, instructions):
+    """
+    réécrit une seule section d'un rapport selon de nouvelles consignes
+    les autres sections servent de contexte et sont reprises telles quelles
+    param summary: texte du rapport (résumé ia)
+    param section: nom de la section (ex: "recommandations")
+    param instructions: consignes de réécriture
+    return: tuple (texte du rapport mis à jour, métadonnées)
+            métadonnées: section (titre réécrit), model (modèle qui a répondu)
+    lève LookupError si le rapport n'a pas cette section, RuntimeError si
+    la clé api manque ou si la réponse est vide, GroqUnavailableError si
+    groq ne répond pas
+    """
+    from utils.sections import split_sections, join_sections, find_section, section_title
+
+    sections = split_sections(summary)
+    index = find_section(sections, section)
+    if index is None:
+        raise LookupError(f"Unknown section: {section}")
+
+    api_key = os.environ.get('GROQ_API_KEY')
+    if not api_key:
+        raise RuntimeError("Clé API Groq non configurée dans les variables d'environnement Vercel")
+
+    target = sections[index]
+    context = join_sections(sections[:index] + sections[index + 1:])
+    response = create_completion(
+        get_client(api_key),
+        MODEL,
+        messages=[
+            {"role": "system", "content": SECTION_PROMPT},
+            {"role": "user", "content": (
+                f"Autres sections du rapport :\n\n{context}\n\n"
+                f"Section à réécrire : {target.title}\n\n"
+                f"Contenu actuel :\n{target.body.strip()}\n\n"
+                f"Consignes : {instructions}"
+            )}
+        ],
+        max_tokens=SECTION_MAX_TOKENS,
+        temperature=TEMPERATURE
+    )
+
+    body = (response.choices[0].message.content or '').strip()
+    # titre répété par le modèle malgré la consigne
+    first_line, _, rest = body.partition('\n')
+    if section_title(first_line) is not None:
+        body = rest.strip()
+    if not body:
+        raise RuntimeError("Empty section returned by the AI service")
+
+    sections[index] = target._replace(body=body)
+    meta = {'section': target.title, 'model': getattr(response, 'model', None) or MODEL}
+    logger.info("section regeneree", section=target.title, chars=len(body), model=meta['model'])
+    return join_sections(sections), meta
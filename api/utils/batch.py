@@ -0,0 +1,128 @@
+"""
+génération de rapports par lot
+résumés ia en parallèle (concurrence bornée) et archive zip produite
+au fil de l'eau, sans construire l'archive complète en mémoire
+"""
+import contextvars
+import os
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# concurrence par défaut et plafonds des lots
+DEFAULT_CONCURRENCY = int(os.environ.get('SYNTHESIA_BATCH_CONCURRENCY', '4'))
+MAX_CONCURRENCY = int(os.environ.get('SYNTHESIA_BATCH_MAX_CONCURRENCY', '16'))
+MAX_REPORTS = int(os.environ.get('SYNTHESIA_BATCH_MAX_REPORTS', '100'))
+
+# champs texte facultatifs d'un rapport du lot
+TEXT_FIELDS = ('title', 'author', 'role')
+
+
+def is_valid_report(report, themes):
+    """
+    vérifie un rapport du lot avant de lancer les résumés
+    param report: rapport reçu (dict attendu)
+    param themes: noms de thèmes acceptés
+    return: True si raw_data est un texte non vide, les champs texte des
+            chaînes (ou absents) et le thème connu (ou absent)
+    """
+    if not isinstance(report, dict):
+        return False
+    raw_data = report.get('raw_data')
+    if not isinstance(raw_data, str) or not raw_data:
+        return False
+    if any(report.get(field) is not None and not isinstance(report[field], str) for field in TEXT_FIELDS):
+        return False
+    theme = report.get('theme')
+    return theme is None or (isinstance(theme, str) and theme in themes)
+
+
+def clamp_concurrency(value):
+    """
+    borne la concurrence demandée entre 1 et MAX_CONCURRENCY
+    param value: concurrence demandée (None = valeur par défaut)
+    return: entier utilisable
+    """
+    if value is None:
+        value = DEFAULT_CONCURRENCY
+    return max(1, min(int(value), MAX_CONCURRENCY))
+
+
+def summarize_concurrently(raw_texts, summarize, concurrency):
+    """
+    lance les résumés en parallèle avec au plus `concurrency` appels
+    simultanés et les produit dans l'ordre où ils se terminent
+    param raw_texts: liste de notes brutes
+    param summarize: fonction notes -> résumé (ex: generate_summary)
+    param concurrency: nombre maximal d'appels simultanés
+    return: générateur de tuples (index, résumé ou exception)
+    """
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='synthesia-batch')
+    try:
+        futures = {
+            # chaque appel garde le contexte de la requête (identifiant dans les journaux)
+            executor.submit(contextvars.copy_context().run, summarize, raw_text): index
+            for index, raw_text in enumerate(raw_texts)
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+    finally:
+        # client déconnecté ou erreur: annuler les appels pas encore lancés
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _ChunkWriter:
+    """
+    flux en écriture seule qui accumule les octets écrits par zipfile
+    jusqu'à ce qu'ils soient envoyés au client
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """
+    écrit une archive zip de façon incrémentale
+    chaque fichier est envoyé dès qu'il est ajouté
+    param entries: itérable de tuples (nom, contenu bytes)
+    return: générateur de morceaux de l'archive
+    """
+    writer = _ChunkWriter()
+    with zipfile.ZipFile(writer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+            chunk = writer.drain()
+            if chunk:
+                yield chunk
+
+    # répertoire central écrit à la fermeture de l'archive
+    chunk = writer.drain()
+    if chunk:
+        yield chunk
+
+
+def report_filename(index, title):
+    """
+    nom de fichier unique d'un rapport dans l'archive
+    param index: position du rapport dans le lot
+    param title: titre du rapport
+    return: nom de fichier sans caractères problématiques
+    """
+    safe_title = re.sub(r'[^\w\-]+', '_', title, flags=re.UNICODE).strip('_') or 'rapport'
+    return f"{index + 1:03d}_rapport_{safe_title[:60]}.pdf"
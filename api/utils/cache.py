@@ -0,0 +1,232 @@
+"""
+caches en mémoire et sur disque pour les résultats coûteux
+(résumés ia, pdf rendus...)
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from utils.logger import get_logger
+
+logger = get_logger('cache')
+
+# répertoire par défaut du cache disque (vercel est read-only sauf /tmp)
+DEFAULT_DISK_DIR = os.path.join(
+    '/tmp' if os.path.exists('/tmp') else tempfile.gettempdir(),
+    'synthesia_cache'
+)
+
+
+def make_key(*parts):
+    """
+    calcule une clé de cache stable à partir de plusieurs éléments
+    param parts: éléments sérialisables en json
+    return: empreinte sha256 hexadécimale
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """
+    cache mémoire lru avec taille maximale et expiration (ttl)
+    thread-safe, partagé par toutes les requêtes du processus
+    """
+
+    def __init__(self, max_size=256, ttl=3600):
+        """
+        param max_size: nombre maximal d'entrées conservées
+        param ttl: durée de vie d'une entrée en secondes (None = infinie)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        récupère une valeur et la marque comme récemment utilisée
+        return: la valeur ou default si absente ou expirée
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        enregistre une valeur et évince les entrées les plus anciennes
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """
+        supprime une entrée si elle existe
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """
+        vide complètement le cache
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """
+    cache disque simple (un fichier json par entrée)
+    permet aux instances serverless "chaudes" de conserver les résultats
+    entre deux invocations
+    """
+
+    def __init__(self, directory=DEFAULT_DISK_DIR, ttl=86400):
+        """
+        param directory: répertoire de stockage (créé si nécessaire)
+        param ttl: durée de vie d'une entrée en secondes (None = infinie)
+        """
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key, default=None):
+        """
+        lit une entrée sur disque
+        return: la valeur ou default si absente, expirée ou illisible
+        """
+        path = self._path(key)
+        try:
+            if self.ttl and os.path.getmtime(path) + self.ttl < time.time():
+                os.remove(path)
+                return default
+
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)['value']
+        except (OSError, ValueError, KeyError):
+            return default
+
+    def set(self, key, value):
+        """
+        écrit une entrée de façon atomique (fichier temporaire puis rename)
+        le fichier temporaire est supprimé si l'écriture échoue
+        """
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'value': value}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+            tmp_path = None
+        except (OSError, TypeError, ValueError) as e:
+            # le cache disque est optionnel, une erreur (disque plein, valeur
+            # non sérialisable) ne doit pas casser la requête
+            logger.warning("cache disque indisponible", error=str(e))
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def delete(self, key):
+        """
+        supprime une entrée si elle existe
+        """
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def prune(self):
+        """
+        supprime les entrées expirées, même jamais relues
+        return: nombre de fichiers supprimés
+        """
+        if not self.ttl:
+            return 0
+        removed = 0
+        limit = time.time() - self.ttl
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class TieredCache:
+    """
+    cache à deux niveaux: mémoire (rapide) puis disque (optionnel)
+    une entrée trouvée sur disque est remontée en mémoire
+    """
+
+    def __init__(self, memory, disk=None):
+        """
+        param memory: instance de LRUCache
+        param disk: instance de DiskCache ou None pour désactiver le disque
+        """
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                return value
+
+        return default
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        """
+        vide le niveau mémoire (le disque expire de lui-même via le ttl)
+        """
+        self.memory.clear()
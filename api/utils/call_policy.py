@@ -0,0 +1,648 @@
+"""
+politique d'appel à groq autour de chat.completions.create
+- délai maximal par tentative et budget total par appel
+- nouvelles tentatives espacées (backoff exponentiel avec gigue, retry-after respecté)
+- requête de couverture (hedging) optionnelle après un délai calé sur le p95
+- disjoncteur par modèle: échec immédiat tant que groq est en difficulté
+- modèle de repli plus rapide quand le modèle principal dépasse ses délais
+- limitation de débit partagée entre processus avant chaque envoi (voir rate_limiter)
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils.chunking import estimate_tokens
+from utils.rate_limiter import get_limiter, RateLimitTimeout, MAX_WAIT
+from utils.logger import get_logger
+
+logger = get_logger('call_policy')
+
+# tentatives
+ATTEMPT_TIMEOUT = float(os.environ.get('SYNTHESIA_GROQ_ATTEMPT_TIMEOUT', '20'))
+MAX_ATTEMPTS = int(os.environ.get('SYNTHESIA_GROQ_MAX_ATTEMPTS', '3'))
+DEADLINE = float(os.environ.get('SYNTHESIA_GROQ_DEADLINE', '45'))
+BACKOFF_BASE = float(os.environ.get('SYNTHESIA_GROQ_BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.environ.get('SYNTHESIA_GROQ_BACKOFF_MAX', '8'))
+# attente maximale d'une place auprès du limiteur de débit
+MAX_QUEUE_WAIT = MAX_WAIT
+
+# requête de couverture (désactivée par défaut: elle peut doubler la consommation)
+HEDGE_ENABLED = os.environ.get('SYNTHESIA_GROQ_HEDGE', '0') == '1'
+HEDGE_MIN_DELAY = float(os.environ.get('SYNTHESIA_GROQ_HEDGE_MIN_DELAY', '1'))
+HEDGE_MIN_SAMPLES = 20
+# requêtes de couverture simultanées (les requêtes principales n'y comptent
+# pas): au-delà, pas de couverture plutôt qu'une couverture en file d'attente
+HEDGE_WORKERS = int(os.environ.get('SYNTHESIA_GROQ_HEDGE_WORKERS', '8'))
+
+# disjoncteur
+BREAKER_THRESHOLD = int(os.environ.get('SYNTHESIA_GROQ_BREAKER_THRESHOLD', '5'))
+BREAKER_COOLDOWN = float(os.environ.get('SYNTHESIA_GROQ_BREAKER_COOLDOWN', '30'))
+
+# modèle de repli ('' pour désactiver)
+FALLBACK_MODEL = os.environ.get('SYNTHESIA_GROQ_FALLBACK_MODEL', 'llama-3.1-8b-instant')
+FALLBACK_AFTER_TIMEOUTS = int(os.environ.get('SYNTHESIA_GROQ_FALLBACK_AFTER', '2'))
+
+# types d'erreurs
+TIMEOUT = 'timeout'
+RETRYABLE = 'retryable'
+RATE_LIMITED = 'rate_limited'
+FATAL = 'fatal'
+
+
+class GroqUnavailableError(RuntimeError):
+    """
+    groq n'a pas répondu: tentatives épuisées ou disjoncteur ouvert
+    retry_after: délai conseillé avant de réessayer (secondes) ou None
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(GroqUnavailableError):
+    """
+    disjoncteur ouvert: l'appel n'a pas été envoyé
+    """
+
+
+class QuotaExhaustedError(GroqUnavailableError):
+    """
+    quota groq (requêtes ou tokens par minute) épuisé au-delà de
+    l'attente maximale: l'appel n'a pas été envoyé
+    """
+
+
+class CircuitBreaker:
+    """
+    disjoncteur: s'ouvre après `threshold` échecs consécutifs, laisse passer
+    une tentative d'essai après `cooldown` secondes (demi-ouvert) puis se
+    referme au premier succès
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return 'open'
+            return 'half_open'
+
+    def allow(self):
+        """
+        return: True si un appel peut être envoyé
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            # demi-ouvert: une seule tentative d'essai à la fois
+            if self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def retry_after(self):
+        """
+        return: secondes avant la prochaine tentative d'essai
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            # un échec en demi-ouvert rouvre le disjoncteur pour un cycle complet
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """
+        fin d'une tentative qui ne renseigne pas sur la santé de groq
+        (requête invalide, quota): libère seulement la tentative d'essai
+        """
+        with self._lock:
+            self._trial = False
+
+
+class LatencyTracker:
+    """
+    latences des derniers appels réussis d'un modèle (fenêtre glissante)
+    """
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction):
+        """
+        return: quantile des latences, ou None sans assez d'échantillons
+        """
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def hedge_delay(self):
+        """
+        délai avant la requête de couverture: p95 des latences observées
+        return: secondes, ou None tant que le p95 n'est pas connu
+        """
+        p95 = self.percentile(0.95)
+        if p95 is None:
+            return None
+        return max(HEDGE_MIN_DELAY, p95)
+
+
+_breakers = {}
+_trackers = {}
+_registry_lock = threading.Lock()
+_hedge_executor = None
+_hedge_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+
+
+def get_breaker(model):
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+        return _breakers[model]
+
+
+def get_tracker(model):
+    with _registry_lock:
+        if model not in _trackers:
+            _trackers[model] = LatencyTracker()
+        return _trackers[model]
+
+
+def policy_state():
+    """
+    état du disjoncteur et p95 de chaque modèle appelé
+    return: dictionnaire modèle -> état
+    """
+    with _registry_lock:
+        models = set(_breakers) | set(_trackers)
+    return {
+        model: {
+            'circuit': get_breaker(model).state,
+            'p95_seconds': get_tracker(model).percentile(0.95),
+        }
+        for model in sorted(models)
+    }
+
+
+def reset_policy():
+    """
+    oublie disjoncteurs et latences (changement de configuration, scénarios de test)
+    """
+    with _registry_lock:
+        _breakers.clear()
+        _trackers.clear()
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+
+    with _registry_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='synthesia-hedge')
+        return _hedge_executor
+
+
+def classify_error(error):
+    """
+    type d'une erreur groq pour la politique d'appel
+    param error: exception levée par le client groq
+    return: TIMEOUT, RATE_LIMITED, RETRYABLE ou FATAL
+    """
+    import groq
+
+    if isinstance(error, groq.APITimeoutError):
+        return TIMEOUT
+    if isinstance(error, groq.APIConnectionError):
+        return RETRYABLE
+    if isinstance(error, groq.APIStatusError):
+        if error.status_code == 429:
+            return RATE_LIMITED
+        if error.status_code == 408:
+            return TIMEOUT
+        if error.status_code == 409 or error.status_code >= 500:
+            return RETRYABLE
+    return FATAL
+
+
+def retry_after_seconds(error):
+    """
+    délai demandé par groq (en-tête retry-after) ou None
+    """
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return max(0.0, float(response.headers.get('retry-after')))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    attente avant la tentative suivante: backoff exponentiel avec gigue
+    complète, au moins le retry-after demandé par groq
+    param attempt: numéro de la tentative qui vient d'échouer (à partir de 0)
+    param retry_after: délai demandé par groq (secondes) ou None
+    return: secondes
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def estimate_call_tokens(params):
+    """
+    tokens estimés d'un appel: messages plus réponse maximale
+    """
+    prompt = ''.join(message.get('content') or '' for message in params.get('messages', ()))
+    return estimate_tokens(prompt) + params.get('max_tokens', 0)
+
+
+def _send_limited(client, model, stream, timeout, max_wait, params):
+    """
+    envoie une requête après avoir obtenu une place auprès du limiteur,
+    puis lui rend compte du résultat (tokens consommés, 429, retry-after)
+    lève QuotaExhaustedError si aucune place ne se libère dans max_wait
+    """
+    limiter = get_limiter()
+    if limiter is None:
+        return client.chat.completions.create(model=model, stream=stream, timeout=timeout, **params)
+
+    try:
+        lease = limiter.acquire(estimate_call_tokens(params), max_wait=max_wait)
+    except RateLimitTimeout as e:
+        raise QuotaExhaustedError(str(e), retry_after=e.retry_after)
+
+    try:
+        response = client.chat.completions.create(model=model, stream=stream, timeout=timeout, **params)
+    except Exception as e:
+        limiter.release(
+            lease,
+            success=False,
+            rate_limited=classify_error(e) == RATE_LIMITED,
+            retry_after=retry_after_seconds(e)
+        )
+        raise
+
+    usage = getattr(response, 'usage', None)
+    limiter.release(lease, used_tokens=getattr(usage, 'total_tokens', None) or None)
+    return response
+
+
+def _hedge_error(primary, hedge):
+    """
+    erreur à relever quand la requête et sa couverture ont toutes deux échoué
+    la plus récupérable l'emporte, celle de la requête principale à égalité:
+    un refus du limiteur sur la couverture (QuotaExhaustedError, fatal) ne
+    doit pas masquer un échec récupérable de la requête principale
+    param primary: erreur de la requête principale
+    param hedge: erreur de la requête de couverture
+    return: erreur à relever
+    """
+    if classify_error(primary) == FATAL and classify_error(hedge) != FATAL:
+        return hedge
+    return primary
+
+
+def _start_thread(send):
+    """
+    lance la requête principale dans un thread qui lui est propre: elle ne
+    prend pas de place dans le pool des couvertures et n'y attend jamais
+    (seul le limiteur de débit borne les appels simultanés)
+    param send: fonction d'envoi
+    return: Future du résultat
+    """
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(context.run(send))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='synthesia-groq', daemon=True).start()
+    return future
+
+
+def _submit_hedge(send):
+    """
+    envoie la requête de couverture dans le pool si une place est libre
+    param send: fonction d'envoi
+    return: Future du résultat, None si le pool est plein (pas de couverture)
+    """
+    if not _hedge_slots.acquire(blocking=False):
+        return None
+
+    def run():
+        try:
+            return send(True)
+        finally:
+            _hedge_slots.release()
+
+    return _get_hedge_executor().submit(contextvars.copy_context().run, run)
+
+
+def _hedged(send, delay):
+    """
+    envoie la requête, puis une seconde identique si la première n'a pas
+    répondu après `delay` secondes; la première réponse réussie l'emporte
+    (la requête perdante se termine en arrière-plan, son résultat est ignoré)
+    la seconde requête n'attend ni le limiteur ni une place du pool des
+    couvertures (HEDGE_WORKERS): pas de place, pas de couverture
+    si les deux échouent, l'erreur relevée est choisie par _hedge_error
+    """
+    first = _start_thread(send)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    hedge = _submit_hedge(send)
+    if hedge is None:
+        logger.info("groq lent: pool de couverture plein", delay=round(delay, 3))
+        return first.result()
+    logger.info("groq lent: requete de couverture envoyee", delay=round(delay, 3))
+    pending = {first, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+    raise _hedge_error(first.exception(), hedge.exception())
+
+
+def _select_model(model, current):
+    """
+    modèle de la prochaine tentative selon l'état des disjoncteurs
+    lève CircuitOpenError si aucun modèle n'est disponible
+    """
+    breaker = get_breaker(current)
+    if breaker.allow():
+        return current
+
+    if FALLBACK_MODEL and current == model and get_breaker(FALLBACK_MODEL).allow():
+        logger.warning("disjoncteur ouvert: repli", model=model, fallback=FALLBACK_MODEL)
+        return FALLBACK_MODEL
+
+    raise CircuitOpenError(
+        f"Groq indisponible (disjoncteur ouvert sur {current})",
+        retry_after=breaker.retry_after()
+    )
+
+
+def _record_failure(error, model, current, attempts, timeouts):
+    """
+    enregistre l'échec d'une tentative: disjoncteur, journal et repli
+    après des délais dépassés
+    param model: modèle principal
+    param current: modèle de la tentative en échec
+    param attempts: tentatives déjà envoyées
+    param timeouts: délais dépassés par le modèle principal
+    return: tuple (retry-after demandé, modèle suivant, délais dépassés)
+    relève l'erreur si elle n'est pas récupérable (requête invalide)
+    """
+    breaker = get_breaker(current)
+    kind = classify_error(error)
+    if kind == FATAL:
+        breaker.release()
+        raise error
+
+    if kind == RATE_LIMITED:
+        # quota dépassé: groq est sain, le disjoncteur n'est pas concerné
+        breaker.release()
+    else:
+        breaker.record_failure()
+
+    logger.warning("appel groq en echec", model=current, attempt=attempts, max_attempts=MAX_ATTEMPTS,
+                   error=type(error).__name__, details=str(error))
+
+    if kind == TIMEOUT and current == model:
+        timeouts += 1
+        if FALLBACK_MODEL and timeouts >= FALLBACK_AFTER_TIMEOUTS:
+            logger.warning("delais depasses: repli", model=model, fallback=FALLBACK_MODEL)
+            current = FALLBACK_MODEL
+
+    return retry_after_seconds(error), current, timeouts
+
+
+def _unavailable(attempts, last_error, retry_after):
+    return GroqUnavailableError(
+        f"Groq indisponible après {attempts} tentative(s): "
+        f"{type(last_error).__name__ if last_error else 'délai dépassé'}: {str(last_error or '')}",
+        retry_after=retry_after
+    )
+
+
+def create_completion(client, model, stream=False, **params):
+    """
+    chat.completions.create protégé par la politique d'appel
+    en streaming, la politique couvre l'ouverture du flux (pas de couverture)
+    param client: client groq
+    param model: modèle principal
+    param stream: réponse en flux
+    param params: paramètres de chat.completions.create (messages, max_tokens...)
+    return: réponse groq (ou flux)
+    lève GroqUnavailableError si groq ne répond pas, l'erreur d'origine
+    si la requête est invalide
+    """
+    # les nouvelles tentatives sont gérées ici, pas par le client
+    client = client.with_options(max_retries=0)
+    deadline = time.monotonic() + DEADLINE
+    current = model
+    timeouts = 0
+    retry_after = None
+    last_error = None
+    attempts = 0
+
+    while attempts < MAX_ATTEMPTS:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        current = _select_model(model, current)
+        breaker = get_breaker(current)
+        timeout = min(ATTEMPT_TIMEOUT, remaining)
+        attempts += 1
+
+        # attente du limiteur bornée par le budget restant de l'appel
+        def send(hedge=False, model_name=current, timeout=timeout, max_wait=min(MAX_QUEUE_WAIT, remaining)):
+            return _send_limited(client, model_name, stream, timeout, 0 if hedge else max_wait, params)
+
+        started = time.monotonic()
+        try:
+            hedge_delay = get_tracker(current).hedge_delay() if HEDGE_ENABLED and not stream else None
+            if hedge_delay is not None and hedge_delay < timeout:
+                response = _hedged(send, hedge_delay)
+            else:
+                response = send()
+        except Exception as e:
+            last_error = e
+            retry_after, current, timeouts = _record_failure(e, model, current, attempts, timeouts)
+            if attempts < MAX_ATTEMPTS:
+                delay = backoff_delay(attempts - 1, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    break
+                time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        if not stream:
+            get_tracker(current).record(time.monotonic() - started)
+        return response
+
+    raise _unavailable(attempts, last_error, retry_after) from last_error
+
+
+async def _send_limited_async(client, model, timeout, max_wait, params):
+    """
+    _send_limited pour un client asynchrone: l'attente du limiteur (sqlite,
+    éventuellement longue) se fait dans un thread, hors de la boucle d'événements
+    """
+    import asyncio
+
+    limiter = get_limiter()
+    if limiter is None:
+        return await client.chat.completions.create(model=model, timeout=timeout, **params)
+
+    try:
+        lease = await asyncio.to_thread(limiter.acquire, estimate_call_tokens(params), max_wait=max_wait)
+    except RateLimitTimeout as e:
+        raise QuotaExhaustedError(str(e), retry_after=e.retry_after)
+
+    try:
+        response = await client.chat.completions.create(model=model, timeout=timeout, **params)
+    except BaseException as e:
+        # y compris l'annulation de la requête: la place est rendue tout de suite
+        limiter.release(
+            lease,
+            success=False,
+            rate_limited=isinstance(e, Exception) and classify_error(e) == RATE_LIMITED,
+            retry_after=retry_after_seconds(e)
+        )
+        raise
+
+    usage = getattr(response, 'usage', None)
+    limiter.release(lease, used_tokens=getattr(usage, 'total_tokens', None) or None)
+    return response
+
+
+async def _hedged_async(send, delay):
+    """
+    _hedged pour un client asynchrone: la requête perdante est annulée
+    """
+    import asyncio
+
+    first = asyncio.ensure_future(send())
+    done, _ = await asyncio.wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    logger.info("groq lent: requete de couverture envoyee", delay=round(delay, 3))
+    hedge = asyncio.ensure_future(send(True))
+    pending = {first, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        raise _hedge_error(first.exception(), hedge.exception())
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def create_completion_async(client, model, **params):
+    """
+    create_completion pour un client groq asynchrone (groq.AsyncGroq):
+    même politique, attentes sans bloquer la boucle d'événements
+    (pas de streaming)
+    param client: client groq asynchrone
+    param model: modèle principal
+    param params: paramètres de chat.completions.create (messages, max_tokens...)
+    return: réponse groq
+    lève GroqUnavailableError si groq ne répond pas, l'erreur d'origine
+    si la requête est invalide
+    """
+    import asyncio
+
+    client = client.with_options(max_retries=0)
+    deadline = time.monotonic() + DEADLINE
+    current = model
+    timeouts = 0
+    retry_after = None
+    last_error = None
+    attempts = 0
+
+    while attempts < MAX_ATTEMPTS:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        current = _select_model(model, current)
+        breaker = get_breaker(current)
+        timeout = min(ATTEMPT_TIMEOUT, remaining)
+        attempts += 1
+
+        def send(hedge=False, model_name=current, timeout=timeout, max_wait=min(MAX_QUEUE_WAIT, remaining)):
+            return _send_limited_async(client, model_name, timeout, 0 if hedge else max_wait, params)
+
+        started = time.monotonic()
+        try:
+            hedge_delay = get_tracker(current).hedge_delay() if HEDGE_ENABLED else None
+            if hedge_delay is not None and hedge_delay < timeout:
+                response = await _hedged_async(send, hedge_delay)
+            else:
+                response = await send()
+        except Exception as e:
+            last_error = e
+            retry_after, current, timeouts = _record_failure(e, model, current, attempts, timeouts)
+            if attempts < MAX_ATTEMPTS:
+                delay = backoff_delay(attempts - 1, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    break
+                await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        get_tracker(current).record(time.monotonic() - started)
+        return response
+
+    raise _unavailable(attempts, last_error, retry_after) from last_error
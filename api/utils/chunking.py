@@ -0,0 +1,121 @@
+"""
+découpage des notes trop longues pour un seul appel au modèle
+les notes sont coupées sur leurs frontières naturelles (lignes vides,
+horodatages, blocs de logs) puis regroupées en morceaux de taille bornée
+"""
+import math
+import re
+
+# estimation prudente: environ 3 caractères par token pour du français technique
+CHARS_PER_TOKEN = 3
+
+# ligne qui commence une nouvelle entrée datée:
+# 2024-05-14, 14/05/2024, 14/05, [09:12], 09h12, lundi, jour 2, j3
+TIMESTAMP_PATTERN = re.compile(
+    r'^\s*(?:'
+    r'\[?\d{1,4}[/.\-]\d{1,2}(?:[/.\-]\d{2,4})?\b'
+    r'|\[?\d{1,2}[:h]\d{2}\b'
+    r'|(?:lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)\b'
+    r'|j(?:our)?\s*\d+\b'
+    r')',
+    re.IGNORECASE
+)
+
+# délimiteur d'un bloc de logs (```)
+FENCE = '```'
+
+
+def estimate_tokens(text):
+    """
+    estimation du nombre de tokens d'un texte (sans tokenizer)
+    param text: texte à estimer
+    return: nombre de tokens estimé
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_segments(text):
+    """
+    découpe les notes en segments insécables autant que possible:
+    paragraphes séparés par des lignes vides, entrées horodatées
+    et blocs de logs (entre ```) conservés entiers
+    param text: notes brutes
+    return: liste de segments (texte)
+    """
+    segments = []
+    current = []
+    in_fence = False
+
+    def flush():
+        if current:
+            segments.append('\n'.join(current))
+            current.clear()
+
+    for line in text.split('\n'):
+        if line.strip().startswith(FENCE):
+            if not in_fence:
+                flush()
+            current.append(line)
+            if in_fence:
+                flush()
+            in_fence = not in_fence
+            continue
+
+        if in_fence:
+            current.append(line)
+        elif not line.strip():
+            flush()
+        else:
+            if TIMESTAMP_PATTERN.match(line):
+                flush()
+            current.append(line)
+
+    flush()
+    return segments
+
+
+def _split_oversized(segment, max_chars):
+    """
+    coupe un segment trop long: par lignes, puis en dernier recours
+    au dernier espace avant la limite
+    """
+    pieces = []
+    for line in segment.split('\n'):
+        while len(line) > max_chars:
+            cut = line.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(line[:cut])
+            line = line[cut:].lstrip()
+        pieces.append(line)
+    return pieces
+
+
+def split_notes(text, max_tokens):
+    """
+    regroupe les segments des notes en morceaux d'au plus max_tokens
+    (estimés), dans l'ordre du texte
+    param text: notes brutes
+    param max_tokens: taille maximale d'un morceau en tokens estimés
+    return: liste de morceaux (texte)
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    size = 0
+
+    for segment in split_segments(text):
+        pieces = [segment] if len(segment) <= max_chars else _split_oversized(segment, max_chars)
+        for piece in pieces:
+            # +2: séparateur "\n\n" entre deux segments
+            if current and size + len(piece) + 2 > max_chars:
+                chunks.append('\n\n'.join(current))
+                current = []
+                size = 0
+            current.append(piece)
+            size += len(piece) + 2
+
+    if current:
+        chunks.append('\n\n'.join(current))
+
+    return chunks
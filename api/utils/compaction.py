@@ -0,0 +1,261 @@
+"""
+compactage des notes brutes avant la construction du prompt
+les sorties de console collées par les techniciens (ping répétés,
+traces de pile identiques, milliers de lignes de logs presque identiques)
+sont réduites pour ne pas payer ces tokens à chaque appel
+"""
+import os
+import re
+
+from utils.chunking import estimate_tokens
+
+# budget de tokens (estimés) d'un seul appel, 0 = pas de budget
+# dernier recours seulement (voir fit_budget): les notes longues passent
+# d'abord, entières, par le mode découpé (ai_handler.build_summary_messages)
+# et le budget ne s'applique qu'aux synthèses encore trop longues après
+BUDGET_TOKENS = int(os.environ.get('SYNTHESIA_COMPACTION_BUDGET_TOKENS', '30000'))
+
+# taille minimale d'un bloc de données (hex / base64) tronqué
+MIN_HEX_BLOB = 32
+MIN_BASE64_BLOB = 64
+# caractères conservés au début d'un bloc tronqué
+BLOB_PREFIX = 12
+
+# lignes prioritaires conservées en dernier quand le budget est dépassé
+IMPORTANT_PATTERN = re.compile(
+    r'erreur|error|err\b|échec|echec|fail|warn|avertissement|alerte|alert|critical|critique'
+    r'|fatal|exception|traceback|panic|denied|refus|timeout|expir|unreachable|injoignable',
+    re.IGNORECASE
+)
+
+# blocs de données sans intérêt pour le rapport (empreintes, dumps, pièces jointes)
+BLOB_PATTERN = re.compile(
+    r'\b(?:0x)?[0-9a-fA-F]{%d,}\b|[A-Za-z0-9+/]{%d,}={0,2}' % (MIN_HEX_BLOB, MIN_BASE64_BLOB)
+)
+
+# parties variables d'une ligne de log: ce qui reste forme son gabarit
+# (64 bytes from 10.0.0.1: icmp_seq=1 ttl=64 time=0.045 ms -> même gabarit pour chaque ping)
+TEMPLATE_PATTERN = re.compile(
+    r'\b\d{1,4}[-/.:]\d{1,2}[-/.:]\d{1,4}(?:[ T]\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d+)?)?'
+    r'|\b\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d+)?'
+    r'|\b0x[0-9a-fA-F]+\b'
+    r'|\b[0-9a-fA-F]{8,}\b'
+    r'|\d+(?:[.,]\d+)*'
+)
+
+# nombre minimal de lignes de même gabarit (mais différentes) fusionnées
+MIN_TEMPLATED_RUN = 3
+# taille minimale d'un bloc répété (trace de pile) dédoublonné
+MIN_REPEATED_BLOCK_LINES = 3
+
+
+def _trim_blob(match):
+    blob = match.group()
+    return f"{blob[:BLOB_PREFIX]}…[{len(blob)} caractères]"
+
+
+def trim_blobs(text):
+    """
+    tronque les longs blocs hexadécimaux ou base64
+    param text: notes brutes
+    return: tuple (texte, nombre de blocs tronqués)
+    """
+    return BLOB_PATTERN.subn(_trim_blob, text)
+
+
+def line_template(line):
+    """
+    gabarit d'une ligne: nombres, adresses, dates et heures remplacés
+    param line: ligne de texte
+    return: gabarit (deux lignes de même gabarit ne diffèrent que par ces valeurs)
+    """
+    return TEMPLATE_PATTERN.sub('#', line.strip())
+
+
+def collapse_repeated_lines(lines):
+    """
+    fusionne les suites de lignes identiques (au moins 2) ou de même
+    gabarit (au moins MIN_TEMPLATED_RUN) en une seule ligne suivie de "×N"
+    param lines: lignes des notes
+    return: tuple (lignes, nombre de lignes supprimées)
+    """
+    collapsed = []
+    removed = 0
+    index = 0
+
+    while index < len(lines):
+        line = lines[index]
+        template = line_template(line)
+        end = index + 1
+        if template:
+            while end < len(lines) and line_template(lines[end]) == template:
+                end += 1
+
+        # suite de même gabarit trop courte: seules les lignes identiques
+        # en tête de suite sont fusionnées
+        count = end - index
+        if count < MIN_TEMPLATED_RUN:
+            end = index + 1
+            while end < index + count and lines[end].strip() == line.strip():
+                end += 1
+            count = end - index
+
+        if count > 1:
+            # première et dernière occurrence gardées pour les valeurs extrêmes
+            if lines[end - 1].strip() == line.strip():
+                collapsed.append(f"{line} ×{count}")
+            else:
+                collapsed.append(f"{line} ×{count} (jusqu'à: {lines[end - 1].strip()})")
+            removed += count - 1
+        else:
+            collapsed.append(line)
+        index = end
+
+    return collapsed, removed
+
+
+def collapse_repeated_blocks(lines):
+    """
+    supprime les blocs de plusieurs lignes déjà vus (traces de pile
+    identiques) et indique leur nombre d'occurrences sur le premier
+    un bloc est une suite de lignes non vides, les lignes vides
+    consécutives sont réduites à une seule
+    param lines: lignes des notes
+    return: tuple (lignes, nombre de lignes supprimées)
+    """
+    blocks = []
+    current = []
+    for line in lines:
+        if line.strip():
+            current.append(line)
+        else:
+            if current:
+                blocks.append(current)
+                current = []
+            blocks.append([line])
+    if current:
+        blocks.append(current)
+
+    first_seen = {}
+    counts = []
+    kept = []
+    removed = 0
+    for block in blocks:
+        key = tuple(line.strip() for line in block)
+        if len(block) >= MIN_REPEATED_BLOCK_LINES and key in first_seen:
+            counts[first_seen[key]] += 1
+            removed += len(block)
+            continue
+        if len(block) >= MIN_REPEATED_BLOCK_LINES:
+            first_seen[key] = len(kept)
+        kept.append(block)
+        counts.append(1)
+
+    result = []
+    for block, count in zip(kept, counts):
+        # lignes vides consécutives (blocs retirés) réduites à une seule
+        if result and not block[0].strip() and not result[-1].strip():
+            continue
+        result.extend(block)
+        if count > 1:
+            result.append(f"(bloc ci-dessus répété ×{count})")
+
+    return result, removed
+
+
+def enforce_budget(lines, budget_tokens):
+    """
+    retire des lignes jusqu'à tenir dans le budget: d'abord les lignes
+    ordinaires les plus éloignées du début et de la fin des notes, les
+    lignes d'erreur et d'avertissement sont retirées en dernier
+    param lines: lignes des notes
+    param budget_tokens: budget en tokens estimés
+    return: tuple (lignes, nombre de lignes retirées)
+    """
+    sizes = [estimate_tokens(line) + 1 for line in lines]
+    total = sum(sizes)
+    if total <= budget_tokens:
+        return lines, 0
+
+    middle = (len(lines) - 1) / 2
+    order = sorted(
+        range(len(lines)),
+        key=lambda index: (
+            IMPORTANT_PATTERN.search(lines[index]) is not None,
+            abs(index - middle)
+        )
+    )
+
+    dropped = set()
+    for index in order:
+        if total <= budget_tokens:
+            break
+        dropped.add(index)
+        total -= sizes[index]
+
+    # un marqueur par suite de lignes retirées
+    kept = []
+    gap = 0
+    for index, line in enumerate(lines):
+        if index in dropped:
+            gap += 1
+            continue
+        if gap:
+            kept.append(f"[… {gap} lignes omises]")
+            gap = 0
+        kept.append(line)
+    if gap:
+        kept.append(f"[… {gap} lignes omises]")
+
+    return kept, len(dropped)
+
+
+def fit_budget(text, budget_tokens=None):
+    """
+    dernier recours avant un appel: retire des lignes pour tenir dans le
+    budget (voir enforce_budget)
+    param text: texte envoyé au modèle
+    param budget_tokens: budget en tokens estimés (BUDGET_TOKENS si None, 0 = aucun)
+    return: tuple (texte, nombre de lignes retirées)
+    """
+    if budget_tokens is None:
+        budget_tokens = BUDGET_TOKENS
+    if not budget_tokens:
+        return text, 0
+
+    lines, dropped = enforce_budget(text.split('\n'), budget_tokens)
+    return '\n'.join(lines), dropped
+
+
+def compact_notes(text, budget_tokens=0):
+    """
+    compacte les notes brutes avant l'appel au modèle, sans perte
+    d'information par défaut (lignes répétées, blocs de données)
+    param text: notes brutes (normalisées)
+    param budget_tokens: budget en tokens estimés (0 = aucun, les notes
+                         longues relèvent du mode découpé, voir fit_budget)
+    return: tuple (notes compactées, statistiques)
+    """
+    original_tokens = estimate_tokens(text)
+
+    compacted, trimmed_blobs = trim_blobs(text)
+    lines = compacted.split('\n')
+    lines, repeated_lines = collapse_repeated_lines(lines)
+    lines, repeated_block_lines = collapse_repeated_blocks(lines)
+
+    dropped_lines = 0
+    if budget_tokens:
+        lines, dropped_lines = enforce_budget(lines, budget_tokens)
+
+    compacted = '\n'.join(lines)
+    compacted_tokens = estimate_tokens(compacted)
+
+    stats = {
+        'original_tokens': original_tokens,
+        'compacted_tokens': compacted_tokens,
+        'tokens_saved': max(0, original_tokens - compacted_tokens),
+        'trimmed_blobs': trimmed_blobs,
+        'collapsed_lines': repeated_lines + repeated_block_lines,
+        'dropped_lines': dropped_lines,
+    }
+    return compacted, stats
@@ -0,0 +1,336 @@
+"""
+génération de rapports en tâche de fond (jobs)
+un pool de workers du processus exécute generate_summary puis render_report,
+l'état de chaque job est conservé dans un fichier sqlite local, puis
+supprimé après SYNTHESIA_JOB_TTL secondes (pdf compris)
+"""
+import contextvars
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from utils.cache import DEFAULT_DISK_DIR
+from utils.logger import get_logger
+
+logger = get_logger('jobs')
+
+# étapes successives d'un job
+STAGES = ('queued', 'summarizing', 'rendering', 'done')
+
+# configuration
+DB_PATH = os.environ.get('SYNTHESIA_JOBS_DB', os.path.join(DEFAULT_DISK_DIR, 'jobs.sqlite3'))
+WORKERS = int(os.environ.get('SYNTHESIA_JOB_WORKERS', '2'))
+CALLBACK_TIMEOUT = float(os.environ.get('SYNTHESIA_CALLBACK_TIMEOUT', '5'))
+# hôtes de callback autorisés (séparés par des virgules); sans liste, seules
+# les adresses publiques sont acceptées (ni boucle locale, ni réseau privé,
+# ni lien local comme les métadonnées du cloud)
+CALLBACK_HOSTS = {host.strip().lower() for host in os.environ.get('SYNTHESIA_CALLBACK_HOSTS', '').split(',')
+                  if host.strip()}
+# durée de conservation d'un job et de son pdf (secondes)
+JOB_TTL = float(os.environ.get('SYNTHESIA_JOB_TTL', '86400'))
+# job en cours sans nouvelle étape depuis ce délai: interrompu (redémarrage)
+JOB_STALE_AFTER = float(os.environ.get('SYNTHESIA_JOB_STALE_AFTER', '900'))
+# intervalle minimal entre deux nettoyages (secondes)
+CLEANUP_INTERVAL = 60.0
+
+# étapes d'un job pas encore terminé
+PENDING = STAGES[:-1]
+
+_executor = None
+_executor_lock = threading.Lock()
+_schema_ready = False
+_last_cleanup = 0.0
+
+
+def _connect():
+    """
+    ouvre une connexion sqlite (une par opération, sûr entre threads)
+    le schéma est créé à la première connexion du processus
+    """
+    global _schema_ready
+
+    if not _schema_ready:
+        os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
+
+    connection = sqlite3.connect(DB_PATH, timeout=10)
+    connection.row_factory = sqlite3.Row
+
+    if not _schema_ready:
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                callback_url TEXT,
+                error TEXT,
+                summary TEXT,
+                pdf BLOB,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        connection.execute('CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at)')
+        connection.commit()
+        _schema_ready = True
+        # premier accès du processus: jobs coupés par un redémarrage
+        cleanup_jobs(connection)
+
+    return connection
+
+
+def cleanup_jobs(connection, now=None):
+    """
+    supprime les jobs expirés (JOB_TTL) et passe en erreur les jobs en cours
+    sans nouvelle étape depuis JOB_STALE_AFTER (processus arrêté en route)
+    param connection: connexion sqlite ouverte
+    param now: horodatage de référence (maintenant par défaut)
+    return: tuple (jobs supprimés, jobs interrompus)
+    """
+    global _last_cleanup
+
+    now = time.time() if now is None else now
+    _last_cleanup = now
+    with connection:
+        expired = connection.execute('DELETE FROM jobs WHERE updated_at < ?', (now - JOB_TTL,)).rowcount
+        stale = connection.execute(
+            f"UPDATE jobs SET status = 'error', error = ?, updated_at = ? "
+            f"WHERE status IN ({', '.join('?' * len(PENDING))}) AND updated_at < ?",
+            ('Interrupted: job stopped before completion', now, *PENDING, now - JOB_STALE_AFTER)
+        ).rowcount
+    if expired or stale:
+        logger.info("nettoyage des jobs", expired=expired, interrupted=stale)
+    return expired, stale
+
+
+@contextmanager
+def _db():
+    """
+    connexion le temps d'une opération: commit en sortie puis fermeture
+    """
+    connection = _connect()
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def _get_executor():
+    """
+    pool de workers créé à la première soumission
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='synthesia-job')
+        return _executor
+
+
+def _update(job_id, **fields):
+    fields['updated_at'] = time.time()
+    assignments = ', '.join(f'{name} = ?' for name in fields)
+    with _db() as connection:
+        connection.execute(
+            f'UPDATE jobs SET {assignments} WHERE id = ?',
+            (*fields.values(), job_id)
+        )
+
+
+def _enter_stage(job_id, progress, stage, **fields):
+    """
+    passe le job à l'étape suivante et horodate la transition
+    param fields: colonnes à mettre à jour dans la même écriture
+    """
+    now = time.time()
+    for previous in progress.values():
+        if previous.get('finished_at') is None:
+            previous['finished_at'] = now
+    progress[stage] = {'started_at': now, 'finished_at': now if stage == 'done' else None}
+    _update(job_id, status=stage, progress=json.dumps(progress), **fields)
+
+
+def submit_job(payload, callback_url=None):
+    """
+    enregistre un job et le confie au pool de workers
+    param payload: dictionnaire title / raw_data / author / role / theme
+    param callback_url: url http(s) appelée en post à la fin du job (optionnel)
+    return: identifiant du job
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    progress = {'queued': {'started_at': now, 'finished_at': None}}
+
+    with _db() as connection:
+        if now - _last_cleanup >= CLEANUP_INTERVAL:
+            cleanup_jobs(connection, now)
+        connection.execute(
+            'INSERT INTO jobs (id, status, progress, payload, callback_url, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, 'queued', json.dumps(progress), json.dumps(payload, ensure_ascii=False),
+             callback_url, now, now)
+        )
+
+    # le job garde l'identifiant de la requête qui l'a créé dans ses journaux
+    _get_executor().submit(contextvars.copy_context().run, _run_job, job_id, payload, progress, callback_url)
+    logger.info("job en file d'attente", job_id=job_id)
+    return job_id
+
+
+def _run_job(job_id, payload, progress, callback_url):
+    """
+    exécute un job dans un worker: résumé ia, rendu pdf, callback
+    """
+    # imports locaux: les workers chargent les utilitaires à la demande
+    from utils.ai_handler import generate_summary
+    from utils.pdf_generator import render_report
+
+    try:
+        _enter_stage(job_id, progress, 'summarizing')
+        summary = generate_summary(payload['raw_data'])
+
+        _enter_stage(job_id, progress, 'rendering')
+        pdf, _ = render_report(
+            payload.get('title', 'Rapport'),
+            summary,
+            payload.get('author', 'Anonyme'),
+            payload.get('role', 'Technicien'),
+            theme=payload.get('theme')
+        )
+
+        _enter_stage(job_id, progress, 'done', summary=summary, pdf=sqlite3.Binary(pdf))
+        logger.info("job termine", job_id=job_id, pdf_bytes=pdf.nbytes)
+
+    except Exception as e:
+        logger.exception("erreur dans le job", job_id=job_id, error=type(e).__name__)
+        now = time.time()
+        for stage in progress.values():
+            if stage.get('finished_at') is None:
+                stage['finished_at'] = now
+        _update(job_id, status='error', error=f"{type(e).__name__}: {str(e)}", progress=json.dumps(progress))
+
+    if callback_url:
+        notify_callback(callback_url, get_job(job_id))
+
+
+def validate_callback_url(callback_url):
+    """
+    vérifie qu'une url de callback peut être appelée par le serveur
+    hôte de CALLBACK_HOSTS, sinon toutes ses adresses (après résolution
+    dns) doivent être publiques: le serveur ne doit pas servir de relais
+    vers le réseau interne
+    param callback_url: url fournie par le client
+    lève ValueError si l'url est refusée
+    """
+    if not isinstance(callback_url, str):
+        raise ValueError("callback_url must be a string")
+    parts = urllib.parse.urlsplit(callback_url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+
+    host = parts.hostname.lower()
+    if CALLBACK_HOSTS:
+        if host not in CALLBACK_HOSTS:
+            raise ValueError(f"callback host not allowed: {host}")
+        return
+
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError):
+        raise ValueError(f"callback host cannot be resolved: {host}")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ValueError(f"callback host resolves to a non-public address: {host}")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """
+    une redirection du callback pourrait viser une adresse refusée: pas suivie
+    """
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def notify_callback(callback_url, job):
+    """
+    prévient le client de la fin d'un job (post json)
+    l'url est vérifiée à nouveau au moment de l'appel (la résolution dns
+    a pu changer depuis la soumission), les redirections ne sont pas suivies
+    un échec du callback est seulement journalisé
+    param callback_url: url http(s) du client
+    param job: état du job tel que renvoyé par get_job
+    """
+    try:
+        validate_callback_url(callback_url)
+        request = urllib.request.Request(
+            callback_url,
+            data=json.dumps(job, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with _callback_opener.open(request, timeout=CALLBACK_TIMEOUT) as response:
+            logger.info("callback du job", job_id=job['id'], status=response.status)
+    except Exception as e:
+        logger.warning("callback du job en echec", job_id=job['id'], error=str(e))
+
+
+def get_job(job_id):
+    """
+    état public d'un job (sans le pdf)
+    param job_id: identifiant renvoyé par submit_job
+    return: dictionnaire ou None si le job est inconnu
+    """
+    with _db() as connection:
+        row = connection.execute(
+            'SELECT id, status, progress, error, created_at, updated_at, pdf IS NOT NULL AS has_pdf '
+            'FROM jobs WHERE id = ?',
+            (job_id,)
+        ).fetchone()
+
+    if row is None:
+        return None
+
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'progress': json.loads(row['progress']),
+        'error': row['error'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+        'pdf_url': f"/api/jobs/{row['id']}/pdf" if row['has_pdf'] else None,
+    }
+
+
+def get_job_pdf(job_id):
+    """
+    pdf d'un job terminé
+    param job_id: identifiant du job
+    return: tuple (statut, titre, pdf bytes ou None) ou None si inconnu
+    """
+    with _db() as connection:
+        row = connection.execute(
+            'SELECT status, payload, pdf FROM jobs WHERE id = ?',
+            (job_id,)
+        ).fetchone()
+
+    if row is None:
+        return None
+
+    title = json.loads(row['payload']).get('title', 'Rapport')
+    return row['status'], title, row['pdf']
@@ -0,0 +1,231 @@
+"""
+journalisation structurée du service
+- niveaux réglables par SYNTHESIA_LOG_LEVEL (WARNING par défaut sur vercel,
+  INFO en local)
+- identifiant de requête et champs clé=valeur sur chaque ligne
+- formatage et écriture différés: l'appelant ne fait qu'ajouter
+  l'enregistrement à une file, un thread de fond le formate et l'écrit
+- lignes debug échantillonnées sous charge (SYNTHESIA_LOG_DEBUG_PER_SECOND)
+
+usage:
+    logger = get_logger('index')
+    logger.info("pdf créé", bytes=pdf.nbytes, pages=3)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+
+# configuration
+LEVEL = os.environ.get('SYNTHESIA_LOG_LEVEL', 'WARNING' if os.environ.get('VERCEL') else 'INFO').upper()
+# text (clé=valeur) ou json (une ligne json par enregistrement)
+FORMAT = os.environ.get('SYNTHESIA_LOG_FORMAT', 'text')
+# lignes debug écrites au plus par seconde, les suivantes sont comptées puis ignorées
+DEBUG_PER_SECOND = int(os.environ.get('SYNTHESIA_LOG_DEBUG_PER_SECOND', '50'))
+# enregistrements en attente d'écriture au-delà desquels ils sont ignorés
+QUEUE_SIZE = 10000
+
+ROOT_LOGGER = 'synthesia'
+
+_request_id = contextvars.ContextVar('synthesia_request_id', default=None)
+
+
+def new_request_id(value=None):
+    """
+    fixe l'identifiant de la requête en cours (contexte du thread ou de la tâche)
+    param value: identifiant reçu (en-tête X-Request-ID) ou None pour en créer un
+    return: identifiant retenu
+    """
+    request_id = (value or '')[:64] or uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    return request_id
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def _quote(value):
+    text = str(value)
+    if not text or any(char in text for char in ' "=\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+def _timestamp(record):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z'
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    une ligne clé=valeur (logfmt) par enregistrement
+    """
+
+    def format(self, record):
+        parts = [f'time={_timestamp(record)}', f'level={record.levelname.lower()}', f'logger={record.name}']
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            parts.append(f'request_id={request_id}')
+        parts.append(f'msg={_quote(record.getMessage())}')
+        for key, value in getattr(record, 'fields', {}).items():
+            parts.append(f'{key}={_quote(value)}')
+        line = ' '.join(parts)
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    une ligne json par enregistrement
+    """
+
+    def format(self, record):
+        payload = {
+            'time': _timestamp(record),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', None),
+            'msg': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    file d'attente sans formatage dans le thread appelant
+    (QueueHandler formate normalement avant de mettre en file)
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # sortie saturée: l'enregistrement est perdu plutôt que de bloquer la requête
+            self.dropped += 1
+
+
+class DebugSampler:
+    """
+    limite le nombre de lignes debug par seconde
+    """
+
+    def __init__(self, per_second):
+        self.per_second = per_second
+        self._window = None
+        self._count = 0
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        return: (ligne autorisée, lignes ignorées depuis le dernier rapport)
+        """
+        window = int(time.monotonic())
+        with self._lock:
+            if window != self._window:
+                self._window = window
+                self._count = 0
+            self._count += 1
+            if self._count > self.per_second:
+                self._dropped += 1
+                return False, 0
+            dropped, self._dropped = self._dropped, 0
+            return True, dropped
+
+
+_sampler = DebugSampler(DEBUG_PER_SECOND)
+
+
+class StructuredLogger:
+    """
+    journal d'un module: message fixe et champs clé=valeur
+    les valeurs sont passées telles quelles et formatées au moment de l'écriture
+    """
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def is_enabled(self, level):
+        return self._logger.isEnabledFor(level)
+
+    def _log(self, level, message, fields, exc_info=None):
+        self._logger.log(level, message, exc_info=exc_info,
+                         extra={'fields': fields, 'request_id': _request_id.get()})
+
+    def debug(self, message, **fields):
+        if not self._logger.isEnabledFor(logging.DEBUG):
+            return
+        allowed, dropped = _sampler.allow()
+        if not allowed:
+            return
+        if dropped:
+            fields['debug_dropped'] = dropped
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message, **fields):
+        if self._logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, message, fields)
+
+    def warning(self, message, **fields):
+        if self._logger.isEnabledFor(logging.WARNING):
+            self._log(logging.WARNING, message, fields)
+
+    def error(self, message, **fields):
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, message, fields)
+
+    def exception(self, message, **fields):
+        """
+        erreur avec la trace de l'exception en cours
+        """
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, message, fields, exc_info=True)
+
+
+def _configure():
+    """
+    branche le journal racine sur une file écrite par un thread de fond
+    """
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(LEVEL)
+    root.propagate = False
+
+    log_queue = queue.Queue(QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if FORMAT == 'json' else KeyValueFormatter())
+    root.addHandler(DeferredQueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    # écrire les dernières lignes en attente à l'arrêt du processus
+    atexit.register(listener.stop)
+    return listener
+
+
+_listener = _configure()
+
+
+def get_logger(name):
+    """
+    journal structuré d'un module
+    param name: nom court du module (ex: index, ai_handler)
+    """
+    return StructuredLogger(logging.getLogger(f'{ROOT_LOGGER}.{name}'))
@@ -0,0 +1,212 @@
+"""
+analyseur en une passe du texte généré par l'ia
+transforme le markdown en blocs typés (titre de section, puce, paragraphe)
+avec le gras et l'italique convertis en balises reportlab (<b>, <i>)
+
+reproduit le résultat de clean_markdown_formatting + detect_section_title
+(pdf_generator) en parcourant le texte une seule fois
+"""
+import re
+from collections import namedtuple
+
+# types de blocs
+SECTION = 'section'
+BULLET = 'bullet'
+PARAGRAPH = 'paragraph'
+
+# bloc de contenu: kind = SECTION / BULLET / PARAGRAPH, text = balisage reportlab
+# (pour une puce, text ne contient pas le tiret initial)
+Block = namedtuple('Block', ['kind', 'text'])
+
+# mots-clés qui signalent un titre de section (ligne en majuscules)
+SECTION_KEYWORDS = (
+    'CONTEXTE', 'PROBLEME', 'DIAGNOSTIC', 'ACTIONS', 'RESULTATS',
+    'RECOMMANDATIONS', 'SUIVI', 'PHASE', 'ETAPE', 'CONFIGURATION',
+    'TEST', 'VALIDATION', 'BILAN', 'INVENTAIRE', 'PREPARATION',
+    'MAINTENANCE', 'LIVRABLE', 'SATISFACTION', 'METRICS', 'IMPACT'
+)
+
+# automate des mots-clés, compilé une fois: une seule recherche par ligne
+# au lieu d'un test par mot-clé
+SECTION_KEYWORDS_PATTERN = re.compile('|'.join(SECTION_KEYWORDS))
+
+# plages unicode supprimées (mêmes plages que clean_markdown_formatting)
+EMOJI_RANGES = '\u24c2-\U0001f251\U0001f300-\U0001f64f\U0001f680-\U0001f6ff'
+
+# titres markdown: dièses et espaces qui suivent (sauts de ligne compris)
+_HEADING = re.compile(r'#[#\s]*')
+
+# caractères au-delà du premier emoji: filtre rapide avant la vraie recherche
+_WIDE = re.compile('[^\x00-\u24c1]')
+_EMOJI = re.compile('[' + EMOJI_RANGES + ']+')
+_EQUAL_SEPARATOR = re.compile(r'={3,}')
+_DASH_SEPARATOR = re.compile(r'-{3,}')
+
+# marqueurs de liste reconnus en début de ligne
+_LIST_MARKERS = '-*+'
+
+# construction directe d'un Block, sans l'appel python de Block.__new__
+# (un bloc par ligne: c'est le coût dominant des textes courts par ligne)
+_new_tuple = tuple.__new__
+
+
+def is_section_title(line):
+    """
+    détecte si une ligne (déjà nettoyée et sans espaces autour)
+    est un titre de section: en majuscules, courte, avec un mot-clé
+    param line: ligne de texte
+    return: True si c'est un titre de section
+    """
+    return (
+        len(line) < 100
+        and line.isupper()
+        and SECTION_KEYWORDS_PATTERN.search(line.upper()) is not None
+    )
+
+
+def _pair_marks(line, mark, opening, closing):
+    """
+    remplace les `mark` deux par deux, de gauche à droite, par des balises
+    équivalent à re.sub(mark(.*?)mark, opening\\1closing) sur une ligne
+    param line: ligne de texte
+    param mark: '**' ou '*'
+    param opening: balise ouvrante
+    param closing: balise fermante
+    return: ligne convertie
+    """
+    parts = line.split(mark)
+    separators = len(parts) - 1
+    if separators < 2:
+        return line
+
+    tags = [opening, closing] * (separators // 2)
+    if separators % 2:
+        # dernier marqueur sans fermeture: conservé tel quel
+        tags.append(mark)
+
+    pieces = [None] * (separators * 2 + 1)
+    pieces[::2] = parts
+    pieces[1::2] = tags
+    return ''.join(pieces)
+
+
+def _clean_markup(line, wide):
+    """
+    convertit gras / italique puis supprime emojis et séparateurs d'une
+    ligne, dans l'ordre de clean_markdown_formatting
+    param line: ligne contenant du balisage
+    param wide: la ligne peut contenir des emojis
+    return: ligne nettoyée
+    """
+    if '*' in line:
+        line = _pair_marks(line, '**', '<b>', '</b>')
+        if '*' in line:
+            line = _pair_marks(line, '*', '<i>', '</i>')
+    if wide:
+        line = _EMOJI.sub('', line)
+    if '===' in line:
+        line = _EQUAL_SEPARATOR.sub('', line)
+    if '---' in line:
+        line = _DASH_SEPARATOR.sub('', line)
+    if '•' in line:
+        line = line.replace('•', '-')
+    return line
+
+
+def _classify(line):
+    """
+    type d'une ligne nettoyée et non vide
+    return: Block
+    """
+    if is_section_title(line):
+        return _new_tuple(Block, (SECTION, line))
+    if line[0] == '-':
+        return _new_tuple(Block, (BULLET, line[1:].lstrip()))
+    return _new_tuple(Block, (PARAGRAPH, line))
+
+
+def parse_blocks(text):
+    """
+    transforme le texte de l'ia en blocs typés en le parcourant une seule
+    fois, ligne par ligne (titres markdown, emojis et séparateurs retirés,
+    gras / italique convertis, puces normalisées)
+    les lignes sans balisage, la grande majorité, ne sont pas retravaillées
+    param text: texte généré par l'ia
+    return: générateur de Block (lignes vides ignorées)
+    """
+    # la recherche d'emojis n'est faite que si le texte peut en contenir
+    wide = _WIDE.search(text) is not None
+    # sans '#' ni '*', le nettoyage d'une ligne se réduit à retirer emojis
+    # puis séparateurs et à remplacer les '•', dans cet ordre: fait une fois
+    # sur tout le texte (aucune de ces étapes ne traverse un saut de ligne),
+    # les lignes ne sont plus nettoyées ensuite (un second passage retirerait
+    # les séparateurs formés par le premier). un '*' rendrait l'ordre faux
+    # (retirer un emoji ou un séparateur peut coller deux marqueurs), un '#'
+    # aussi (la fin de ligne testée par le traitement des titres change)
+    markup = True
+    if '#' not in text and '*' not in text:
+        markup = False
+        if wide:
+            text = _EMOJI.sub('', text)
+        if '===' in text:
+            text = _EQUAL_SEPARATOR.sub('', text)
+        if '---' in text:
+            text = _DASH_SEPARATOR.sub('', text)
+        if '•' in text:
+            text = text.replace('•', '-')
+    lines = text.split('\n')
+    count = len(lines)
+    index = 0
+    # préfixe "- " en attente: puce seule sur sa ligne, rattachée à la suivante
+    pending = ''
+
+    while index < count:
+        line = lines[index]
+        index += 1
+
+        # lignes vides ignorées (ou absorbées par la puce en attente)
+        if not line or line.isspace():
+            continue
+
+        # un titre markdown en fin de ligne absorbe les sauts de ligne suivants
+        if '#' in line:
+            while index < count and line.rstrip().endswith('#'):
+                line += '\n' + lines[index]
+                index += 1
+            line = _HEADING.sub('', line)
+
+        if markup and ('*' in line or '---' in line or '===' in line or '•' in line
+                       or (wide and _WIDE.search(line))):
+            line = _clean_markup(line, wide)
+
+        # ligne vidée par le nettoyage
+        stripped = line.lstrip()
+        if not stripped:
+            continue
+
+        # normalisation des puces (^\\s*[-*+]\\s+ -> "- "), une puce seule
+        # sur sa ligne est rattachée à la ligne non vide suivante
+        if pending and len(stripped) != len(line):
+            # ligne indentée: pas de nouvelle puce possible à cet endroit
+            line = pending + stripped
+        elif stripped[0] in _LIST_MARKERS:
+            rest = stripped[1:]
+            if rest and rest[0].isspace():
+                rest = rest.lstrip()
+                if not rest:
+                    pending += '- '
+                    continue
+                line = pending + '- ' + rest
+            elif not rest and index < count:
+                pending += '- '
+                continue
+            else:
+                line = pending + line
+        else:
+            line = pending + line
+
+        pending = ''
+        yield _classify(line.strip())
+
+    if pending:
+        yield _classify(pending.strip())
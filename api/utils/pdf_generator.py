@@ -3,26 +3,175 @@ générateur de pdf professionnel avec reportlab
 """
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.lib.units import cm, mm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.platypus import Frame, PageTemplate, Image
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
+from reportlab.lib.units import cm, mm, inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFName, PDFStream
+from reportlab.pdfgen.canvas import Canvas
+from reportlab import rl_config
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
+from functools import lru_cache
+from itertools import chain
+import io
 import os
 import re
+import time
+import types
+import zlib
 
-def header_footer(canvas, doc, title, author):
+from utils.cache import LRUCache, make_key
+from utils.metrics import timed, observe_pdf, record_cache
+from utils.logger import get_logger
+from utils.pdf_styles import get_theme
+from utils.markdown_parser import parse_blocks, is_section_title, SECTION, BULLET
+
+logger = get_logger('pdf_generator')
+
+# version du rendu: à incrémenter quand la mise en page change, pour que
+# les anciennes empreintes (etag, cache) ne correspondent plus
+RENDER_VERSION = 3
+
+# profils de sortie
+# - page_compression: flux compressés (None = réglage reportlab)
+# - logo_dpi: logo rééchantillonné à cette résolution d'impression
+#   (None = image d'origine intégrée telle quelle)
+# - ascii85: encodage ascii85 des flux binaires (None = réglage reportlab),
+#   +25% de taille, inutile en http
+# les polices sont les polices standard du pdf (helvetica), jamais
+# intégrées; une police ttf enregistrée serait sous-ensemblée par reportlab
+OutputProfile = namedtuple('OutputProfile', ['name', 'page_compression', 'logo_dpi', 'ascii85'])
+
+PROFILES = {
+    'standard': OutputProfile('standard', None, None, None),
+    'compact': OutputProfile('compact', 1, 150, False),
+}
+
+# profil utilisé quand aucun n'est demandé: standard (sortie historique),
+# compact sur demande (téléchargement sur données mobiles)
+DEFAULT_PROFILE = os.environ.get('SYNTHESIA_PDF_PROFILE', 'standard')
+
+# encodage ascii85 du rendu en cours (None: réglage reportlab)
+# reportlab lit rl_config.useA85 à l'écriture des flux; les rendus sans pool
+# ont lieu en parallèle dans le même processus, la valeur d'un profil ne peut
+# donc pas être posée sur le module: elle est lue dans une ContextVar propre
+# au rendu (thread ou tâche), la valeur du module restant celle des autres
+# utilisateurs de reportlab
+_ascii85 = ContextVar('synthesia_pdf_ascii85', default=None)
+
+class _RenderConfig(types.ModuleType):
     """
-    fonction appelée automatiquement pour chaque page
-    dessine l'en-tête et le pied de page
+    module rl_config dont useA85 tient compte du profil du rendu en cours
     """
-    canvas.saveState()
+
+    @property
+    def useA85(self):
+        value = _ascii85.get()
+        return self.__dict__['useA85'] if value is None else int(value)
+
+    @useA85.setter
+    def useA85(self, value):
+        self.__dict__['useA85'] = value
+
+rl_config.__class__ = _RenderConfig
+
+# construction en flux: les flowables du contenu sont produits pendant la
+# mise en page et chaque page terminée est compressée aussitôt, au lieu de
+# garder toute la story et tous les flux de page en clair jusqu'à la fin
+STREAMING = os.environ.get('SYNTHESIA_PDF_STREAMING', '1') == '1'
+# flowables construits d'avance (regard en avant de keepWithNext)
+STREAM_LOOKAHEAD = 64
+
+# taille du logo dans l'en-tête
+LOGO_SIZE = 1.5*cm
+
+# pdf rendus récents, indexés par l'empreinte de leurs entrées
+pdf_cache = LRUCache(
+    max_size=int(os.environ.get('SYNTHESIA_PDF_CACHE_SIZE', '32')),
+    ttl=int(os.environ.get('SYNTHESIA_PDF_CACHE_TTL', '3600'))
+)
+
+# emplacements possibles du logo (répertoire courant puis à côté du code)
+LOGO_CANDIDATES = (
+    os.path.join('assets', 'logo.png'),
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'logo.png'),
+)
+
+@contextmanager
+def profile_encoding(profile):
+    """
+    applique l'encodage ascii85 du profil aux flux écrits dans le bloc
+    (rendu en cours seulement)
+    param profile: OutputProfile
+    """
+    token = _ascii85.set(profile.ascii85)
+    try:
+        yield
+    finally:
+        _ascii85.reset(token)
+
+def get_profile(name=None):
+    """
+    retourne un profil de sortie
+    param name: nom du profil (DEFAULT_PROFILE si None)
+    return: instance de OutputProfile
+    lève ValueError si le profil est inconnu
+    """
+    if name is None:
+        name = DEFAULT_PROFILE
+
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Profil inconnu: {name} (disponibles: {', '.join(PROFILES)})")
+
+def _downsample(logo_path, dpi):
+    """
+    logo réduit à sa taille imprimée pour la résolution donnée
+    (jamais agrandi, transparence conservée)
+    return: image pillow
+    """
+    from PIL import Image
     
+    image = Image.open(logo_path)
+    image.load()
+    pixels = max(1, round(LOGO_SIZE / inch * dpi))
+    image.thumbnail((pixels, pixels), Image.LANCZOS)
+    return image
+
+@lru_cache(maxsize=None)
+def get_logo(dpi=None):
+    """
+    charge le logo une seule fois par processus et par résolution
+    (un seul test d'existence et un seul décodage png)
+    param dpi: résolution d'impression visée, None pour l'image d'origine
+    return: ImageReader du logo ou None s'il est absent ou illisible
+    """
+    for logo_path in LOGO_CANDIDATES:
+        if os.path.exists(logo_path):
+            try:
+                logo = ImageReader(_downsample(logo_path, dpi) if dpi else logo_path)
+                # forcer le décodage maintenant pour le garder en cache
+                logo.getRGBData()
+                return logo
+            except Exception as e:
+                logger.warning("logo illisible", path=logo_path, error=str(e))
+    return None
+
+def draw_static_header_footer(canvas, theme, profile=None):
+    """
+    dessine la partie fixe de l'en-tête et du pied de page
+    (bandeau, textes, logo, ligne) - enregistrée une fois par document
+    sous forme de form xobject puis réutilisée sur chaque page
+    """
+    if profile is None:
+        profile = get_profile()
     page_width, page_height = A4
     
     # en-tête avec fond bleu
-    canvas.setFillColor(colors.HexColor('#1e3a8a'))
+    canvas.setFillColor(theme.palette['primary'])
     canvas.rect(0, page_height - 2*cm, page_width, 2*cm, fill=1, stroke=0)
     
     # texte blanc dans l'en-tête
@@ -33,42 +182,71 @@ def header_footer(canvas, doc, title, author):
     canvas.setFont('Helvetica', 10)
     canvas.drawString(2*cm, page_height - 1.7*cm, "Rapport d'Intervention Technique")
     
-    # logo png si disponible
-    logo_path = os.path.join('assets', 'logo.png')
-    if os.path.exists(logo_path):
+    # logo png si disponible (décodé une fois par processus, intégré une fois par document)
+    logo = get_logo(profile.logo_dpi)
+    if logo is not None:
         try:
             canvas.drawImage(
-                logo_path,
+                logo,
                 page_width - 3.5*cm,
                 page_height - 1.8*cm,
-                width=1.5*cm,
-                height=1.5*cm,
+                width=LOGO_SIZE,
+                height=LOGO_SIZE,
                 preserveAspectRatio=True,
                 mask='auto'
             )
-        except:
+        except Exception:
             pass
     
-    # pied de page avec ligne et informations
-    canvas.setStrokeColor(colors.HexColor('#e5e7eb'))
+    # pied de page avec ligne
+    canvas.setStrokeColor(theme.palette['border'])
     canvas.setLineWidth(0.5)
     canvas.line(2*cm, 2*cm, page_width - 2*cm, 2*cm)
     
-    canvas.setFillColor(colors.HexColor('#6b7280'))
+    # texte au centre
+    canvas.setFillColor(theme.palette['muted'])
+    canvas.setFont('Helvetica', 8)
+    canvas.drawCentredString(
+        page_width / 2, 
+        1.5*cm, 
+        "Document confidentiel - Usage interne"
+    )
+
+def header_footer(canvas, doc, title, author, theme=None, generated_at=None, profile=None):
+    """
+    fonction appelée automatiquement pour chaque page
+    dessine l'en-tête et le pied de page: la partie fixe est un form
+    xobject créé à la première page, seuls la date et le numéro de
+    page sont dessinés à chaque page
+    """
+    if theme is None:
+        theme = get_theme()
+    if generated_at is None:
+        generated_at = datetime.now()
+    if profile is None:
+        profile = get_profile()
+    
+    # partie fixe: enregistrée une fois par document
+    form_name = f'header_footer_{theme.name}_{profile.name}'
+    if not canvas.hasForm(form_name):
+        canvas.beginForm(form_name)
+        draw_static_header_footer(canvas, theme, profile)
+        canvas.endForm()
+    
+    canvas.saveState()
+    
+    canvas.doForm(form_name)
+    
+    page_width, page_height = A4
+    
+    canvas.setFillColor(theme.palette['muted'])
     canvas.setFont('Helvetica', 8)
     
     # date de génération à gauche
     canvas.drawString(
         2*cm, 
         1.5*cm, 
-        f"Généré le {datetime.now().strftime('%d/%m/%Y a %H:%M')}"
-    )
-    
-    # texte au centre
-    canvas.drawCentredString(
-        page_width / 2, 
-        1.5*cm, 
-        "Document confidentiel - Usage interne"
+        f"Généré le {generated_at.strftime('%d/%m/%Y a %H:%M')}"
     )
     
     # numéro de page à droite
@@ -80,6 +258,28 @@ def header_footer(canvas, doc, title, author):
     
     canvas.restoreState()
 
+# emojis supprimés du texte de l'ia (compilé une fois)
+EMOJI_PATTERN = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"
+    "\U0001F300-\U0001F5FF"
+    "\U0001F680-\U0001F6FF"
+    "\U0001F1E0-\U0001F1FF"
+    "\U00002702-\U000027B0"
+    "\U000024C2-\U0001F251"
+    "]+", 
+    flags=re.UNICODE
+)
+
+# objets page du pdf (hors arbre /Pages)
+PAGE_PATTERN = re.compile(rb'/Type /Page\b(?!s)')
+
+def count_pages(pdf):
+    """
+    nombre de pages d'un pdf rendu (bytes ou memoryview)
+    """
+    return len(PAGE_PATTERN.findall(pdf))
+
 def clean_markdown_formatting(text):
     """
     nettoie le texte des formats markdown et emojis
@@ -93,18 +293,7 @@ def clean_markdown_formatting(text):
     text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', text)
     
     # supprimer les emojis (unicode)
-    emoji_pattern = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"
-        "\U0001F300-\U0001F5FF"
-        "\U0001F680-\U0001F6FF"
-        "\U0001F1E0-\U0001F1FF"
-        "\U00002702-\U000027B0"
-        "\U000024C2-\U0001F251"
-        "]+", 
-        flags=re.UNICODE
-    )
-    text = emoji_pattern.sub('', text)
+    text = EMOJI_PATTERN.sub('', text)
     
     # supprimer les séparateurs markdown (=== et ---)
     text = re.sub(r'={3,}', '', text)
@@ -125,33 +314,125 @@ def clean_markdown_formatting(text):
 def detect_section_title(line):
     """
     détecte si une ligne est un titre de section
-    cherche des mots-clés en majuscules
+    cherche des mots-clés en majuscules (automate précompilé)
+    """
+    return is_section_title(line)
+
+def blocks_to_flowables(blocks, theme):
+    """
+    convertit les blocs du texte de l'ia en éléments reportlab
+    param blocks: itérable de Block (voir markdown_parser.parse_blocks)
+    param theme: thème précompilé (voir pdf_styles)
+    return: générateur de flowables
+    """
+    for block in blocks:
+        # titres de section
+        if block.kind == SECTION:
+            yield Spacer(1, 0.5*cm)
+            
+            # mettre le titre en gras
+            yield Paragraph(f"<b>{block.text}</b>", theme.section)
+            
+            # ligne décorative sous le titre
+            line_table = Table([['  ']], colWidths=[theme.layout.content_width])
+            line_table.setStyle(theme.section_rule)
+            yield line_table
+        
+        # listes à puces
+        elif block.kind == BULLET:
+            yield Paragraph(f"- {block.text}", theme.bullet)
+        
+        # contenu normal
+        else:
+            yield Paragraph(block.text, theme.content)
+
+def timed_flowables(flowables, timings, name):
+    """
+    générateur chronométré: le temps passé à produire les éléments est
+    cumulé et enregistré comme une seule étape quand il est épuisé
+    (en flux, l'analyse du texte est entrelacée avec la mise en page)
+    param flowables: itérable d'éléments
+    param timings: RequestTimings de la requête ou None
+    param name: nom de l'étape
+    """
+    if timings is None:
+        yield from flowables
+        return
+
+    iterator = iter(flowables)
+    total = 0.0
+    while True:
+        started = time.perf_counter()
+        try:
+            flowable = next(iterator)
+        except StopIteration:
+            break
+        finally:
+            total += time.perf_counter() - started
+        yield flowable
+    timings.add(name, total)
+
+class FlowableStream(list):
+    """
+    story alimentée par un itérable: doc.build retire les flowables mis en
+    page en tête de liste et en relit la longueur à chaque tour, la liste
+    est alors complétée jusqu'à STREAM_LOOKAHEAD éléments
+    seuls les flowables en attente sont en mémoire, pas tout le document
     """
-    keywords = [
-        'CONTEXTE', 'PROBLEME', 'DIAGNOSTIC', 'ACTIONS', 'RESULTATS', 
-        'RECOMMANDATIONS', 'SUIVI', 'PHASE', 'ETAPE', 'CONFIGURATION',
-        'TEST', 'VALIDATION', 'BILAN', 'INVENTAIRE', 'PREPARATION',
-        'MAINTENANCE', 'LIVRABLE', 'SATISFACTION', 'METRICS', 'IMPACT'
-    ]
-    
-    line_upper = line.upper().strip()
-    
-    # si la ligne est en majuscules et contient un mot-clé
-    if line.isupper() and len(line) < 100:
-        for keyword in keywords:
-            if keyword in line_upper:
-                return True
-    
-    return False
 
-def create_pdf(title, content, author, role):
+    def __init__(self, flowables, lookahead=STREAM_LOOKAHEAD):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._lookahead:
+            flowable = next(self._source, None)
+            if flowable is None:
+                self._source = None
+            else:
+                self.append(flowable)
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+class PageCompressingCanvas(Canvas):
     """
-    génère un pdf professionnel avec signature flexible
+    canevas qui compresse le flux de chaque page dès qu'elle est terminée
+    reportlab garde sinon le texte de toutes les pages jusqu'à la sauvegarde
+    et ne le compresse qu'à ce moment; le filtre est déjà indiqué dans le
+    flux, il n'est donc pas appliqué une seconde fois (mêmes octets en sortie)
+    s'appuie sur l'état interne de reportlab (pdfdoc: Pages, PDFPage.stream,
+    Contents), vérifié avec la version de requirements.txt (4.0.7) et la 5.0;
+    si cet état change, les pages sont laissées à reportlab (pas de
+    compression anticipée, même résultat, seulement plus de mémoire)
+    """
+
+    def showPage(self):
+        super().showPage()
+        pages = getattr(getattr(self._doc, 'Pages', None), 'pages', None)
+        page = pages[-1] if pages else None
+        if page is None or not hasattr(page, 'stream') or not hasattr(page, 'Contents'):
+            return
+        if getattr(page, 'compression', False) and page.stream and not page.Contents and not rl_config.useA85:
+            data = page.stream.encode('utf8') if isinstance(page.stream, str) else page.stream
+            contents = PDFStream(PDFDictionary({'Filter': PDFArray([PDFName('FlateDecode')])}),
+                                 zlib.compress(data))
+            contents.__Comment__ = "page stream"
+            page.Contents = contents
+            page.stream = None
+
+def create_pdf(title, content, author, role, theme=None, profile=None):
+    """
+    génère un pdf professionnel avec signature flexible dans un fichier
     
     param title: titre du rapport
     param content: contenu ia généré
     param author: nom de l'auteur
     param role: poste/rôle de l'auteur
+    param theme: nom du thème (voir pdf_styles.THEMES)
+    param profile: profil de sortie (voir PROFILES, ex: compact)
     return: chemin complet du fichier pdf généré (dans /tmp pour vercel)
     """
     import tempfile
@@ -162,163 +443,178 @@ def create_pdf(title, content, author, role):
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
     # créer un fichier temporaire dans /tmp
-    temp_file = tempfile.NamedTemporaryFile(
+    with tempfile.NamedTemporaryFile(
         mode='wb',
         suffix='.pdf',
         prefix=f'rapport_{timestamp}_',
         delete=False,
         dir='/tmp' if os.path.exists('/tmp') else None
+    ) as temp_file:
+        filename = temp_file.name
+        logger.debug("creation du pdf", path=filename)
+        render_pdf(title, content, author, role, buffer=temp_file, theme=theme, profile=profile)
+    
+    return filename
+
+def parse_generated_at(value):
+    """
+    date de génération fournie par la requête
+    param value: date iso 8601 (ex: 2026-01-02T03:04:05+01:00) ou None
+    return: datetime à la seconde (maintenant si value est vide)
+    lève ValueError si la date est invalide
+    """
+    if not value:
+        return datetime.now().replace(microsecond=0)
+    if not isinstance(value, str):
+        raise ValueError(f"invalid generated_at: {value!r}")
+    return datetime.fromisoformat(value).replace(microsecond=0)
+
+def _pdf_date(generated_at):
+    """
+    date au format pdf (D:AAAAMMJJHHmmSS et décalage horaire s'il est connu)
+    """
+    text = generated_at.strftime('D:%Y%m%d%H%M%S')
+    offset = generated_at.utcoffset()
+    if offset is None:
+        return text
+    minutes = int(offset.total_seconds()) // 60
+    sign = '+' if minutes >= 0 else '-'
+    hours, minutes = divmod(abs(minutes), 60)
+    return f"{text}{sign}{hours:02d}'{minutes:02d}'"
+
+def pdf_cache_key(title, content, author, role, theme=None, generated_at=None, profile=None):
+    """
+    empreinte des entrées du rendu: le pdf est une fonction de ces seules
+    entrées, l'empreinte sert donc de clé de cache et d'etag fort
+    param generated_at: datetime du rapport (voir parse_generated_at)
+    return: empreinte sha256 hexadécimale
+    """
+    import reportlab
+    
+    return make_key(
+        'pdf', RENDER_VERSION, reportlab.Version,
+        title, content, author, role,
+        get_theme(theme).name, generated_at.isoformat(), get_profile(profile).name
     )
-    filename = temp_file.name
-    temp_file.close()
+
+def render_report(title, content, author, role, theme=None, generated_at=None, timings=None,
+                  profile=None):
+    """
+    pdf d'un rapport avec son etag, servi depuis le cache si les mêmes
+    entrées ont déjà été rendues
+    param generated_at: datetime du rapport (maintenant par défaut)
+    param timings: RequestTimings de la requête ou None
+    param profile: profil de sortie (voir PROFILES)
+    return: tuple (pdf, etag)
+    lève RenderUnavailableError si le pool de rendu est saturé ou en échec
+    """
+    if generated_at is None:
+        generated_at = parse_generated_at(None)
+    etag = pdf_cache_key(title, content, author, role, theme, generated_at, profile)
+    
+    pdf = pdf_cache.get(etag)
+    record_cache('pdf', pdf is not None)
+    if pdf is None:
+        # rendu hors du thread de la requête (pool de processus, voir render_pool)
+        from utils.render_pool import render
+        
+        pdf = render(title, content, author, role, theme=theme, generated_at=generated_at,
+                     key=etag, profile=profile, timings=timings)
+        pdf_cache.set(etag, pdf)
+    return pdf, etag
+
+def render_pdf(title, content, author, role, buffer=None, theme=None, timings=None,
+               generated_at=None, key=None, profile=None, streaming=None):
+    """
+    génère un pdf professionnel en mémoire (aucun fichier temporaire)
     
-    print(f"création du pdf dans: {filename}")
+    param title: titre du rapport
+    param content: contenu ia généré
+    param author: nom de l'auteur
+    param role: poste/rôle de l'auteur
+    param buffer: flux binaire de destination (BytesIO par défaut)
+    param theme: nom du thème (voir pdf_styles.THEMES)
+    param timings: RequestTimings de la requête (étapes markdown et pdf) ou None
+    param generated_at: datetime du rapport (maintenant par défaut)
+    param key: empreinte des entrées (pdf_cache_key), calculée si absente
+    param profile: profil de sortie (voir PROFILES, ex: compact)
+    param streaming: construction en flux (STREAMING par défaut), mémoire
+                     bornée quelle que soit la longueur du rapport
+    return: memoryview sur le contenu du pdf (sans copie), ou None
+            si buffer n'est pas un BytesIO (ex: fichier ouvert)
+    """
+    if buffer is None:
+        buffer = io.BytesIO()
+    if streaming is None:
+        streaming = STREAMING
+    
+    # une seule date pour tout le document (métadonnées, référence, pied de
+    # page, dates du pdf): mêmes entrées et même date -> mêmes octets
+    if generated_at is None:
+        generated_at = parse_generated_at(None)
+    if key is None:
+        key = pdf_cache_key(title, content, author, role, theme, generated_at, profile)
+    timestamp = generated_at.strftime('%Y%m%d_%H%M%S')
+    
+    # styles et mise en page précompilés (construits une fois par processus)
+    theme = get_theme(theme)
+    layout = theme.layout
+    profile = get_profile(profile)
     
     # créer le document pdf avec marges
+    # invariant: ni horloge ni identifiant aléatoire dans le fichier
     doc = SimpleDocTemplate(
-        filename,
+        buffer,
+        invariant=1,
+        pageCompression=profile.page_compression,
         pagesize=A4,
-        rightMargin=2*cm,
-        leftMargin=2*cm,
-        topMargin=3*cm,
-        bottomMargin=2.5*cm
-    )
-    
-    # styles pour le document
-    styles = getSampleStyleSheet()
-    
-    # style pour le titre principal
-    style_title = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=22,
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=20,
-        spaceBefore=10,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    # style pour les titres de section (bien visibles)
-    style_section = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=12,
-        spaceBefore=20,
-        fontName='Helvetica-Bold',
-        leading=18,
-        leftIndent=0,
-        borderWidth=0,
-        borderPadding=8
-    )
-    
-    # style pour le contenu (bien différencié des titres)
-    style_content = ParagraphStyle(
-        'CustomBody',
-        parent=styles['BodyText'],
-        fontSize=10,
-        leading=16,
-        spaceAfter=10,
-        alignment=TA_JUSTIFY,
-        textColor=colors.HexColor('#374151'),
-        fontName='Helvetica'
-    )
-    
-    # style pour les listes à puces
-    style_bullet = ParagraphStyle(
-        'BulletPoint',
-        parent=style_content,
-        fontSize=10,
-        leftIndent=20,
-        bulletIndent=10,
-        spaceAfter=6
+        rightMargin=layout.right_margin,
+        leftMargin=layout.left_margin,
+        topMargin=layout.top_margin,
+        bottomMargin=layout.bottom_margin
     )
     
     # construction du contenu du pdf
     story = []
     
     # titre principal
-    story.append(Paragraph(title, style_title))
+    story.append(Paragraph(title, theme.title))
     story.append(Spacer(1, 0.3*cm))
     
     # métadonnées dans un tableau
     metadata_data = [
-        ['Date', datetime.now().strftime('%d/%m/%Y')],
-        ['Heure', datetime.now().strftime('%H:%M')],
+        ['Date', generated_at.strftime('%d/%m/%Y')],
+        ['Heure', generated_at.strftime('%H:%M')],
         ['Auteur', author],
         ['Poste', role],
         ['Type', 'Rapport d\'intervention technique'],
-        ['Reference', f'SYNTH-{timestamp}']
+        ['Reference', f'SYNTH-{timestamp}-{key[:6].upper()}']
     ]
     
-    metadata_table = Table(metadata_data, colWidths=[4*cm, 12*cm])
-    metadata_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#374151')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb'))
-    ]))
+    metadata_table = Table(metadata_data, colWidths=layout.metadata_col_widths)
+    metadata_table.setStyle(theme.metadata_table)
     
     story.append(metadata_table)
     story.append(Spacer(1, 0.8*cm))
     
     # badge statut (vert)
     status_data = [['RAPPORT VALIDÉ - Document généré automatiquement par IA']]
-    status_table = Table(status_data, colWidths=[16*cm])
-    status_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#d1fae5')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#065f46')),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-    ]))
+    status_table = Table(status_data, colWidths=[layout.content_width])
+    status_table.setStyle(theme.status_table)
     
     story.append(status_table)
     story.append(Spacer(1, 0.8*cm))
     
-    # nettoyer le contenu et le formater
-    content = clean_markdown_formatting(content)
-    lines = content.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        # détection des titres de section
-        if detect_section_title(line):
-            story.append(Spacer(1, 0.5*cm))
-            
-            # mettre le titre en gras
-            story.append(Paragraph(f"<b>{line}</b>", style_section))
-            
-            # ligne décorative sous le titre
-            line_data = [['  ']]
-            line_table = Table(line_data, colWidths=[16*cm])
-            line_table.setStyle(TableStyle([
-                ('LINEABOVE', (0, 0), (-1, 0), 2, colors.HexColor('#3b82f6')),
-                ('TOPPADDING', (0, 0), (-1, -1), 0),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ]))
-            story.append(line_table)
-        
-        # détection des listes à puces
-        elif line.startswith('-') or line.startswith('•'):
-            clean_line = re.sub(r'^[-•]\s*', '', line)
-            story.append(Paragraph(f"- {clean_line}", style_bullet))
-        
-        # contenu normal
-        else:
-            story.append(Paragraph(line, style_content))
+    # analyser le contenu en une passe et le formater
+    # en flux, l'analyse a lieu pendant la mise en page: étape markdown
+    # cumulée, aussi comprise dans l'étape pdf
+    body = blocks_to_flowables(parse_blocks(content), theme)
+    if streaming:
+        body = timed_flowables(body, timings, 'markdown')
+    else:
+        with timed(timings, 'markdown'):
+            story.extend(body)
+        body = ()
     
     # signature flexible (tableau)
     signature_data = [
@@ -327,25 +623,31 @@ def create_pdf(title, content, author, role):
         [role],
     ]
     
-    signature_table = Table(signature_data, colWidths=[8*cm, 8*cm])
-    signature_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('LINEABOVE', (0, 0), (-1, 0), 1, colors.HexColor('#1e3a8a')),
-        ('LINEBELOW', (0, -1), (-1, -1), 1, colors.HexColor('#e5e7eb'))
-    ]))
+    signature_table = Table(signature_data, colWidths=layout.signature_col_widths)
+    signature_table.setStyle(theme.signature_table)
     
-    story.append(signature_table)
+    if streaming:
+        story = FlowableStream(chain(story, body, [signature_table]))
+    else:
+        story.append(signature_table)
     
     # génération du pdf avec en-tête et pied de page
     def page_template(canvas, doc):
-        header_footer(canvas, doc, title, author)
-    
-    doc.build(story, onFirstPage=page_template, onLaterPages=page_template)
-    
-    print(f"pdf professionnel créé : {filename}")
-    return filename
+        if doc.page == 1:
+            # dates du pdf et identifiant (/ID) dérivés des entrées
+            canvas.setDateFormatter(lambda *args: _pdf_date(generated_at))
+            canvas._doc.signature.update(key.encode('ascii'))
+        header_footer(canvas, doc, title, author, theme, generated_at, profile)
+    
+    with timed(timings, 'pdf'), profile_encoding(profile):
+        doc.build(story, onFirstPage=page_template, onLaterPages=page_template,
+                  canvasmaker=PageCompressingCanvas if streaming else Canvas)
+    observe_pdf(buffer.tell(), doc.page)
+    
+    if not isinstance(buffer, io.BytesIO):
+        return None
+    
+    # vue directe sur le tampon: pas de copie supplémentaire du pdf
+    pdf = buffer.getbuffer()
+    logger.debug("pdf cree en memoire", bytes=pdf.nbytes, pages=doc.page)
+    return pdf
@@ -0,0 +1,220 @@
+"""
+registre des styles et de la mise en page des rapports pdf
+tout est construit une seule fois par processus, au chargement du module:
+create_pdf sélectionne un thème au lieu de reconstruire ses styles
+"""
+from collections import namedtuple
+from types import MappingProxyType
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import TableStyle
+
+# thème par défaut utilisé quand aucun n'est demandé
+DEFAULT_THEME = 'default'
+
+# marges de la page et largeurs des tableaux (en points)
+Layout = namedtuple('Layout', [
+    'right_margin', 'left_margin', 'top_margin', 'bottom_margin',
+    'content_width', 'metadata_col_widths', 'signature_col_widths'
+])
+
+# thème complet: couleurs, styles de paragraphe et styles de tableau
+# les objets reportlab sont partagés entre tous les rapports: ne pas les modifier
+Theme = namedtuple('Theme', [
+    'name', 'palette', 'layout',
+    'title', 'section', 'content', 'bullet',
+    'metadata_table', 'status_table', 'section_rule', 'signature_table'
+])
+
+LAYOUT = Layout(
+    right_margin=2*cm,
+    left_margin=2*cm,
+    top_margin=3*cm,
+    bottom_margin=2.5*cm,
+    content_width=16*cm,
+    metadata_col_widths=(4*cm, 12*cm),
+    signature_col_widths=(8*cm, 8*cm)
+)
+
+# couleurs de chaque thème
+PALETTES = {
+    # bleu synthesia (rendu historique)
+    'default': {
+        'primary': '#1e3a8a',
+        'accent': '#3b82f6',
+        'text': '#374151',
+        'muted': '#6b7280',
+        'border': '#e5e7eb',
+        'label_background': '#f3f4f6',
+        'status_background': '#d1fae5',
+        'status_text': '#065f46',
+    },
+    # niveaux de gris pour l'impression noir et blanc
+    'sobre': {
+        'primary': '#111827',
+        'accent': '#4b5563',
+        'text': '#1f2937',
+        'muted': '#6b7280',
+        'border': '#d1d5db',
+        'label_background': '#f3f4f6',
+        'status_background': '#e5e7eb',
+        'status_text': '#111827',
+    },
+}
+
+
+def _build_theme(name, palette, sample_styles):
+    """
+    construit les styles d'un thème à partir de sa palette
+    param name: nom du thème
+    param palette: dictionnaire de couleurs hexadécimales
+    param sample_styles: feuille de styles reportlab de base
+    return: instance de Theme
+    """
+    color = {key: colors.HexColor(value) for key, value in palette.items()}
+
+    # style pour le titre principal
+    style_title = ParagraphStyle(
+        'CustomTitle',
+        parent=sample_styles['Heading1'],
+        fontSize=22,
+        textColor=color['primary'],
+        spaceAfter=20,
+        spaceBefore=10,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+
+    # style pour les titres de section (bien visibles)
+    style_section = ParagraphStyle(
+        'SectionTitle',
+        parent=sample_styles['Heading2'],
+        fontSize=14,
+        textColor=color['primary'],
+        spaceAfter=12,
+        spaceBefore=20,
+        fontName='Helvetica-Bold',
+        leading=18,
+        leftIndent=0,
+        borderWidth=0,
+        borderPadding=8
+    )
+
+    # style pour le contenu (bien différencié des titres)
+    style_content = ParagraphStyle(
+        'CustomBody',
+        parent=sample_styles['BodyText'],
+        fontSize=10,
+        leading=16,
+        spaceAfter=10,
+        alignment=TA_JUSTIFY,
+        textColor=color['text'],
+        fontName='Helvetica'
+    )
+
+    # style pour les listes à puces
+    style_bullet = ParagraphStyle(
+        'BulletPoint',
+        parent=style_content,
+        fontSize=10,
+        leftIndent=20,
+        bulletIndent=10,
+        spaceAfter=6
+    )
+
+    # tableau des métadonnées
+    metadata_table = TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), color['label_background']),
+        ('TEXTCOLOR', (0, 0), (0, -1), color['text']),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, color['border'])
+    ])
+
+    # badge statut
+    status_table = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), color['status_background']),
+        ('TEXTCOLOR', (0, 0), (-1, -1), color['status_text']),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('TOPPADDING', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+    ])
+
+    # ligne décorative sous les titres de section
+    section_rule = TableStyle([
+        ('LINEABOVE', (0, 0), (-1, 0), 2, color['accent']),
+        ('TOPPADDING', (0, 0), (-1, -1), 0),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ])
+
+    # signature flexible
+    signature_table = TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('TOPPADDING', (0, 0), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('LINEABOVE', (0, 0), (-1, 0), 1, color['primary']),
+        ('LINEBELOW', (0, -1), (-1, -1), 1, color['border'])
+    ])
+
+    return Theme(
+        name=name,
+        palette=MappingProxyType(color),
+        layout=LAYOUT,
+        title=style_title,
+        section=style_section,
+        content=style_content,
+        bullet=style_bullet,
+        metadata_table=metadata_table,
+        status_table=status_table,
+        section_rule=section_rule,
+        signature_table=signature_table
+    )
+
+
+def _build_registry():
+    sample_styles = getSampleStyleSheet()
+    return MappingProxyType({
+        name: _build_theme(name, palette, sample_styles)
+        for name, palette in PALETTES.items()
+    })
+
+
+# registre immuable des thèmes, construit une fois par processus
+THEMES = _build_registry()
+
+
+def is_theme(name):
+    """
+    vérifie un nom de thème reçu d'un client
+    param name: valeur reçue (n'importe quel type json)
+    return: True si c'est le nom d'un thème du registre
+    """
+    # une liste ou un objet json n'est pas hachable: tester le type d'abord
+    return isinstance(name, str) and name in THEMES
+
+
+def get_theme(name=None):
+    """
+    retourne un thème précompilé
+    param name: nom du thème (DEFAULT_THEME si None)
+    return: instance de Theme
+    lève ValueError si le thème est inconnu (ou n'est pas un texte)
+    """
+    if name is None:
+        name = DEFAULT_THEME
+
+    if not is_theme(name):
+        raise ValueError(f"Thème inconnu: {name!r} (disponibles: {', '.join(THEMES)})")
+    return THEMES[name]
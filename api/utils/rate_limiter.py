@@ -0,0 +1,275 @@
+"""
+limitation de débit côté client pour le quota groq
+- seaux à jetons requêtes/minute et tokens/minute
+- concurrence adaptative (aimd): divisée par deux à chaque 429, +1 par
+  fenêtre d'appels réussis
+- blocage de tous les appels pendant le retry-after renvoyé par groq
+l'état est partagé entre les processus workers via un fichier sqlite local,
+un appel au-delà de la limite attend (attente bornée) au lieu d'échouer
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.cache import DEFAULT_DISK_DIR
+from utils.logger import get_logger
+
+logger = get_logger('rate_limiter')
+
+# configuration (quota du compte groq)
+ENABLED = os.environ.get('SYNTHESIA_RATE_LIMIT', '1') == '1'
+DB_PATH = os.environ.get('SYNTHESIA_RATE_LIMIT_DB', os.path.join(DEFAULT_DISK_DIR, 'ratelimit.sqlite3'))
+REQUESTS_PER_MINUTE = float(os.environ.get('SYNTHESIA_GROQ_RPM', '30'))
+TOKENS_PER_MINUTE = float(os.environ.get('SYNTHESIA_GROQ_TPM', '12000'))
+MAX_WAIT = float(os.environ.get('SYNTHESIA_RATE_LIMIT_MAX_WAIT', '20'))
+MAX_CONCURRENCY = int(os.environ.get('SYNTHESIA_GROQ_MAX_CONCURRENCY', '8'))
+MIN_CONCURRENCY = 1
+
+# un appel dont le processus a disparu libère sa place après ce délai
+LEASE_TTL = 120
+# intervalle de vérification quand la concurrence est saturée
+POLL_INTERVAL = 0.05
+# blocage par défaut après un 429 sans retry-after
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class RateLimitTimeout(Exception):
+    """
+    le quota ne s'est pas libéré dans le délai d'attente accordé
+    retry_after: attente estimée avant qu'une place se libère (secondes)
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    limiteur partagé par tous les processus qui utilisent le même fichier
+    chaque appel autorisé prend un bail (lease), rendu par release()
+    """
+
+    def __init__(self, path, requests_per_minute, tokens_per_minute, max_concurrency):
+        self.path = path
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self):
+        """
+        connexion sqlite en autocommit: les transactions sont ouvertes
+        explicitement (BEGIN IMMEDIATE) pour verrouiller l'état entre processus
+        """
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+
+        if not self._schema_ready:
+            with self._schema_lock:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute('''
+                    CREATE TABLE IF NOT EXISTS limiter (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        requests REAL NOT NULL,
+                        tokens REAL NOT NULL,
+                        concurrency REAL NOT NULL,
+                        blocked_until REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                ''')
+                connection.execute('''
+                    CREATE TABLE IF NOT EXISTS leases (
+                        id TEXT PRIMARY KEY,
+                        tokens REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                ''')
+                # seaux pleins et concurrence maximale au premier démarrage
+                connection.execute(
+                    'INSERT OR IGNORE INTO limiter VALUES (1, ?, ?, ?, 0, ?)',
+                    (self.requests_per_minute, self.tokens_per_minute, self.max_concurrency, time.time())
+                )
+                self._schema_ready = True
+
+        return connection
+
+    def _load(self, connection, now):
+        """
+        lit l'état et remplit les seaux selon le temps écoulé
+        return: dictionnaire de l'état courant
+        """
+        row = connection.execute('SELECT * FROM limiter WHERE id = 1').fetchone()
+        elapsed = max(0.0, now - row['updated_at'])
+        return {
+            'requests': min(self.requests_per_minute,
+                            row['requests'] + elapsed * self.requests_per_minute / 60),
+            'tokens': min(self.tokens_per_minute,
+                          row['tokens'] + elapsed * self.tokens_per_minute / 60),
+            'concurrency': min(self.max_concurrency, max(MIN_CONCURRENCY, row['concurrency'])),
+            'blocked_until': row['blocked_until'],
+        }
+
+    def _save(self, connection, state, now):
+        connection.execute(
+            'UPDATE limiter SET requests = ?, tokens = ?, concurrency = ?, blocked_until = ?, updated_at = ? '
+            'WHERE id = 1',
+            (state['requests'], state['tokens'], state['concurrency'], state['blocked_until'], now)
+        )
+
+    def acquire(self, tokens, max_wait=None):
+        """
+        attend une place pour un appel (requête, tokens et concurrence)
+        param tokens: tokens estimés de l'appel (prompt + réponse maximale)
+        param max_wait: attente maximale en secondes (MAX_WAIT si None)
+        return: identifiant du bail, à rendre avec release()
+        lève RateLimitTimeout si aucune place ne se libère à temps
+        """
+        if max_wait is None:
+            max_wait = MAX_WAIT
+        # un appel plus gros que le seau entier passerait jamais: il attend un seau plein
+        tokens = min(float(tokens), self.tokens_per_minute)
+        deadline = time.time() + max_wait
+        connection = self._connect()
+
+        try:
+            while True:
+                now = time.time()
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    state = self._load(connection, now)
+                    connection.execute('DELETE FROM leases WHERE expires_at < ?', (now,))
+                    in_flight = connection.execute('SELECT COUNT(*) FROM leases').fetchone()[0]
+
+                    if state['blocked_until'] > now:
+                        # retry-after de groq en cours
+                        wait = state['blocked_until'] - now
+                        reason = 'retry-after'
+                    elif in_flight >= math.floor(state['concurrency']):
+                        wait = POLL_INTERVAL
+                        reason = 'concurrence'
+                    else:
+                        wait = max(
+                            (1 - state['requests']) * 60 / self.requests_per_minute,
+                            (tokens - state['tokens']) * 60 / self.tokens_per_minute,
+                            0
+                        )
+                        reason = 'quota'
+
+                    if wait <= 0:
+                        lease = uuid.uuid4().hex
+                        state['requests'] -= 1
+                        state['tokens'] -= tokens
+                        connection.execute(
+                            'INSERT INTO leases VALUES (?, ?, ?)',
+                            (lease, tokens, now + LEASE_TTL)
+                        )
+                        self._save(connection, state, now)
+                        connection.execute('COMMIT')
+                        return lease
+
+                    self._save(connection, state, now)
+                    connection.execute('COMMIT')
+                except Exception:
+                    connection.execute('ROLLBACK')
+                    raise
+
+                if now + wait > deadline:
+                    raise RateLimitTimeout(
+                        f"Quota Groq atteint ({reason}), attente maximale de {max_wait:g}s dépassée",
+                        retry_after=wait
+                    )
+                time.sleep(wait)
+        finally:
+            connection.close()
+
+    def release(self, lease, success=True, used_tokens=None, rate_limited=False, retry_after=None):
+        """
+        rend le bail d'un appel terminé et ajuste la concurrence
+        param lease: identifiant renvoyé par acquire()
+        param success: l'appel a abouti
+        param used_tokens: tokens réellement consommés (usage groq) si connus
+        param rate_limited: groq a répondu 429
+        param retry_after: délai demandé par groq (secondes) ou None
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                state = self._load(connection, now)
+                row = connection.execute('SELECT tokens FROM leases WHERE id = ?', (lease,)).fetchone()
+                connection.execute('DELETE FROM leases WHERE id = ?', (lease,))
+
+                # correction de l'estimation avec la consommation réelle
+                if row is not None and used_tokens is not None:
+                    state['tokens'] = min(self.tokens_per_minute, state['tokens'] + row['tokens'] - used_tokens)
+
+                if rate_limited:
+                    # diminution multiplicative et pause de tous les processus
+                    state['concurrency'] = max(MIN_CONCURRENCY, state['concurrency'] / 2)
+                    pause = retry_after if retry_after is not None else DEFAULT_RETRY_AFTER
+                    state['blocked_until'] = max(state['blocked_until'], now + pause)
+                    logger.warning("quota groq atteint", pause=pause,
+                                   concurrency=math.floor(state['concurrency']))
+                elif success:
+                    # augmentation additive: +1 après une fenêtre complète de succès
+                    state['concurrency'] = min(self.max_concurrency,
+                                               state['concurrency'] + 1 / state['concurrency'])
+
+                self._save(connection, state, now)
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+        finally:
+            connection.close()
+
+    def snapshot(self):
+        """
+        état courant (pour la supervision)
+        return: dictionnaire requests / tokens / concurrency / in_flight / blocked_for
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            state = self._load(connection, now)
+            in_flight = connection.execute(
+                'SELECT COUNT(*) FROM leases WHERE expires_at >= ?', (now,)
+            ).fetchone()[0]
+        finally:
+            connection.close()
+
+        return {
+            'requests_available': state['requests'],
+            'tokens_available': state['tokens'],
+            'concurrency': math.floor(state['concurrency']),
+            'in_flight': in_flight,
+            'blocked_for': max(0.0, state['blocked_until'] - now),
+        }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """
+    limiteur du processus (None si la limitation est désactivée)
+    """
+    global _limiter
+
+    if not ENABLED:
+        return None
+
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(DB_PATH, REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, MAX_CONCURRENCY)
+        return _limiter
@@ -0,0 +1,250 @@
+"""
+rendu des pdf dans un pool de processus
+reportlab met en page en python pur sans relâcher le gil: dans le serveur
+flask threadé, un long rapport rendu sur le thread de la requête ralentit
+toutes les autres. les rendus sont confiés à des processus préchauffés
+(thèmes, polices, logo)
+
+- au plus WORKERS rendus en cours: les suivants attendent une place, au
+  plus QUEUE_SIZE à la fois et QUEUE_TIMEOUT secondes, sinon refus (503)
+- délai par rendu (RENDER_TIMEOUT): les workers sont arrêtés et le pool
+  est recréé
+- worker arrêté brutalement: le pool est recréé et le rendu retenté une fois
+
+SYNTHESIA_RENDER_WORKERS=0 rend les pdf dans le processus (défaut sur vercel)
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.logger import get_logger
+from utils.metrics import RequestTimings, timed, observe_pdf, record_render_event
+
+logger = get_logger('render_pool')
+
+
+def _default_workers():
+    # pas de pool sur vercel: une invocation ne traite qu'une requête
+    if os.environ.get('VERCEL'):
+        return 0
+    return min(4, os.cpu_count() or 1)
+
+
+# configuration
+WORKERS = int(os.environ.get('SYNTHESIA_RENDER_WORKERS', str(_default_workers())))
+QUEUE_SIZE = int(os.environ.get('SYNTHESIA_RENDER_QUEUE', str(4 * max(WORKERS, 1))))
+QUEUE_TIMEOUT = float(os.environ.get('SYNTHESIA_RENDER_QUEUE_TIMEOUT', '5'))
+RENDER_TIMEOUT = float(os.environ.get('SYNTHESIA_RENDER_TIMEOUT', '60'))
+START_METHOD = os.environ.get(
+    'SYNTHESIA_RENDER_START_METHOD',
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+# tentatives d'un rendu dont le worker s'est arrêté
+ATTEMPTS = 2
+
+# modules importés une fois par le serveur de processus (forkserver):
+# chaque worker démarre avec reportlab et les thèmes déjà chargés
+PRELOAD_MODULES = ['reportlab.platypus', 'PIL.Image', 'utils.pdf_styles']
+
+_pool = None
+_pool_lock = threading.Lock()
+# places de rendu: un rendu soumis au pool démarre immédiatement,
+# son délai ne compte donc pas l'attente
+_running = threading.BoundedSemaphore(max(WORKERS, 1))
+_waiting = 0
+_waiting_lock = threading.Lock()
+
+
+class RenderUnavailableError(RuntimeError):
+    """
+    le pdf n'a pas pu être rendu: file pleine, délai dépassé ou worker arrêté
+    retry_after: délai conseillé avant de réessayer (secondes) ou None
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _init_worker():
+    """
+    préchauffage d'un worker à son démarrage: thèmes, polices, logo
+    """
+    from utils.pdf_generator import get_logo, get_profile
+    from utils.pdf_styles import THEMES, get_theme
+    from utils.warmup import warm_fonts
+
+    for name in THEMES:
+        get_theme(name)
+    warm_fonts()
+    get_logo(get_profile().logo_dpi)
+
+
+def _render_job(title, content, author, role, theme, generated_at, key, profile):
+    """
+    rendu exécuté dans un worker
+    return: tuple (contenu du pdf (bytes), étapes mesurées dans le worker
+            hors pdf, déjà mesurée par le processus de la requête)
+    """
+    from utils.pdf_generator import render_pdf
+
+    timings = RequestTimings(None)
+    pdf = render_pdf(title, content, author, role, theme=theme, timings=timings,
+                     generated_at=generated_at, key=key, profile=profile)
+    return pdf.tobytes(), [(name, seconds) for name, seconds in timings.stages if name != 'pdf']
+
+
+def _ping():
+    return os.getpid()
+
+
+def _get_pool():
+    """
+    pool de processus créé au premier rendu
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context(START_METHOD)
+            if START_METHOD == 'forkserver':
+                context.set_forkserver_preload(PRELOAD_MODULES)
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=context, initializer=_init_worker)
+            logger.info("pool de rendu demarre", workers=WORKERS, start_method=START_METHOD)
+        return _pool
+
+
+def _restart(pool, kill=False):
+    """
+    remplace le pool (worker arrêté ou rendu hors délai)
+    param pool: pool en échec
+    param kill: arrêter ses workers (rendu bloqué)
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is not pool:
+            # déjà remplacé par une autre requête
+            return
+        _pool = None
+
+    record_render_event('restart')
+    if kill:
+        # ProcessPoolExecutor ne sait pas interrompre une tâche en cours:
+        # ses processus sont arrêtés, les autres rendus en cours sont retentés
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False)
+
+
+def _acquire_slot():
+    """
+    attend une place de rendu (file bornée)
+    return: sémaphore des places, à libérer après le rendu
+    lève RenderUnavailableError si la file est pleine ou l'attente trop longue
+    """
+    global _waiting
+
+    running = _running
+    if running.acquire(blocking=False):
+        return running
+
+    with _waiting_lock:
+        if _waiting >= QUEUE_SIZE:
+            record_render_event('rejected')
+            raise RenderUnavailableError("PDF render queue is full", retry_after=1)
+        _waiting += 1
+    try:
+        acquired = running.acquire(timeout=QUEUE_TIMEOUT)
+    finally:
+        with _waiting_lock:
+            _waiting -= 1
+
+    if not acquired:
+        record_render_event('rejected')
+        raise RenderUnavailableError(f"No PDF renderer available after {QUEUE_TIMEOUT:.0f}s", retry_after=1)
+    return running
+
+
+def _submit(args):
+    """
+    soumet un rendu au pool, retenté sur un nouveau pool si le worker s'arrête
+    return: tuple (contenu du pdf (bytes), étapes du worker)
+    """
+    for attempt in range(ATTEMPTS):
+        pool = _get_pool()
+        try:
+            future = pool.submit(_render_job, *args)
+            return future.result(timeout=RENDER_TIMEOUT)
+        except FutureTimeoutError:
+            record_render_event('timeout')
+            logger.error("rendu hors delai", timeout=RENDER_TIMEOUT)
+            _restart(pool, kill=True)
+            raise RenderUnavailableError(f"PDF rendering exceeded {RENDER_TIMEOUT:.0f}s")
+        except BrokenProcessPool:
+            record_render_event('crash')
+            logger.error("worker de rendu arrete", attempt=attempt + 1)
+            _restart(pool)
+        except RuntimeError:
+            # pool arrêté par une autre requête entre _get_pool et submit
+            if _pool is pool:
+                raise
+    raise RenderUnavailableError("PDF rendering worker crashed", retry_after=1)
+
+
+def render(title, content, author, role, theme=None, generated_at=None, key=None, profile=None,
+           timings=None):
+    """
+    rend un pdf dans le pool (dans le processus si WORKERS vaut 0)
+    param timings: RequestTimings de la requête ou None
+    return: memoryview sur le contenu du pdf
+    lève RenderUnavailableError si le pdf n'a pas pu être rendu
+    """
+    from utils.pdf_generator import render_pdf, count_pages
+
+    if WORKERS <= 0:
+        return render_pdf(title, content, author, role, theme=theme, timings=timings,
+                          generated_at=generated_at, key=key, profile=profile)
+
+    with timed(timings, 'pdf'):
+        running = _acquire_slot()
+        try:
+            pdf, stages = _submit((title, content, author, role, theme, generated_at, key, profile))
+        finally:
+            running.release()
+    if timings is not None:
+        for name, seconds in stages:
+            timings.add(name, seconds)
+
+    observe_pdf(len(pdf), count_pages(pdf))
+    return memoryview(pdf)
+
+
+def start_pool():
+    """
+    démarre et préchauffe tous les workers (sans effet si WORKERS vaut 0)
+    return: identifiants des processus workers
+    """
+    if WORKERS <= 0:
+        return []
+    pool = _get_pool()
+    # soumissions simultanées: un processus est créé par tâche en attente
+    futures = [pool.submit(_ping) for _ in range(WORKERS)]
+    return sorted({future.result(timeout=RENDER_TIMEOUT) for future in futures})
+
+
+def reset_pool():
+    """
+    arrête le pool et recrée les places de rendu d'après WORKERS
+    (changement de configuration, scénarios de test)
+    le prochain rendu démarre un nouveau pool
+    """
+    global _pool, _running
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+        _running = threading.BoundedSemaphore(max(WORKERS, 1))
+    if pool is not None:
+        pool.shutdown(wait=True)
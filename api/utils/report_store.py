@@ -0,0 +1,105 @@
+"""
+stockage des rapports générés
+permet de récupérer un pdf après coup à partir de son identifiant
+
+les rapports sont gardés en mémoire, propres au processus. avec
+SYNTHESIA_REPORT_STORE_DISK=1, une copie est aussi écrite sur le disque local
+(/tmp): ils sont alors partagés entre les processus d'une même machine
+(workers gunicorn), au prix d'une écriture du pdf par rapport. jamais entre
+deux instances serverless distinctes: un identifiant créé par une autre
+instance est inconnu ici (voir NOT_FOUND_MESSAGE)
+"""
+import base64
+import os
+import re
+import time
+import uuid
+
+from utils.cache import LRUCache, DiskCache, DEFAULT_DISK_DIR
+
+# durée de conservation d'un rapport (secondes)
+TTL = int(os.environ.get('SYNTHESIA_REPORT_STORE_TTL', '3600'))
+
+# intervalle minimal entre deux nettoyages du disque (secondes)
+CLEANUP_INTERVAL = 60.0
+
+# réponse d'un identifiant inconnu: expiré, ou créé par une autre instance
+NOT_FOUND_MESSAGE = (
+    "Report not found: unknown or expired id. Reports are kept for "
+    f"{TTL} seconds on the server instance that generated them; "
+    "on multi-instance deployments, generate the report again"
+)
+
+# rapports récents du processus (les plus anciens sont évincés)
+_reports = LRUCache(
+    max_size=int(os.environ.get('SYNTHESIA_REPORT_STORE_SIZE', '128')),
+    ttl=TTL
+)
+
+# copie sur disque, partagée par les processus de la machine (désactivée par
+# défaut: une écriture du pdf entier à chaque rapport)
+_disk = DiskCache(
+    directory=os.environ.get('SYNTHESIA_REPORT_STORE_DIR', os.path.join(DEFAULT_DISK_DIR, 'reports')),
+    ttl=TTL
+) if os.environ.get('SYNTHESIA_REPORT_STORE_DISK', '0') == '1' else None
+
+# forme des identifiants (uuid4 hexadécimal): rien d'autre n'atteint le disque
+ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+_last_cleanup = 0.0
+
+
+def save_report(title, summary, author, role, pdf, etag=None, theme=None):
+    """
+    enregistre un rapport généré
+    param title: titre du rapport
+    param summary: résumé ia utilisé pour le pdf
+    param author: nom de l'auteur
+    param role: poste de l'auteur
+    param pdf: contenu du pdf rendu (bytes ou memoryview)
+    param etag: empreinte du pdf (voir pdf_generator.render_report) ou None
+    param theme: thème du pdf (None: thème par défaut)
+    return: identifiant du rapport
+    """
+    global _last_cleanup
+
+    report_id = uuid.uuid4().hex
+    report = {
+        'id': report_id,
+        'title': title,
+        'summary': summary,
+        'author': author,
+        'role': role,
+        'pdf': pdf,
+        'etag': etag,
+        'theme': theme,
+    }
+    _reports.set(report_id, report)
+
+    if _disk is not None:
+        # pdf encodé en base64 dans l'entrée json
+        _disk.set(report_id, {**report, 'pdf': base64.b64encode(pdf).decode('ascii')})
+        now = time.monotonic()
+        if now - _last_cleanup >= CLEANUP_INTERVAL:
+            _last_cleanup = now
+            _disk.prune()
+    return report_id
+
+
+def get_report(report_id):
+    """
+    récupère un rapport enregistré
+    param report_id: identifiant renvoyé par save_report
+    return: dictionnaire du rapport ou None si inconnu ou expiré
+    """
+    report = _reports.get(report_id)
+    if report is not None or _disk is None or not ID_PATTERN.fullmatch(report_id):
+        return report
+
+    # rapport enregistré par un autre processus de la machine
+    stored = _disk.get(report_id)
+    if not isinstance(stored, dict) or stored.get('id') != report_id:
+        return None
+    report = {**stored, 'pdf': base64.b64decode(stored['pdf'])}
+    _reports.set(report_id, report)
+    return report
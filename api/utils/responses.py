@@ -0,0 +1,84 @@
+"""
+en-têtes http des réponses de l'api, communs aux points d'entrée
+(flask, handler vercel, asgi)
+"""
+import os
+import unicodedata
+from urllib.parse import quote
+
+
+# un pdf ne change jamais pour un même etag (rendu déterministe)
+PDF_CACHE_CONTROL = os.environ.get('SYNTHESIA_PDF_CACHE_CONTROL', 'private, max-age=86400, immutable')
+
+
+def attachment_names(filename):
+    """
+    paramètres filename / filename* du content-disposition (rfc 5987)
+    les noms accentués sont encodés en utf-8, avec un repli ascii
+    param filename: nom du fichier proposé au téléchargement
+    return: dictionnaire des paramètres de l'en-tête
+    """
+    try:
+        filename.encode('ascii')
+        return {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+
+
+def content_disposition(filename):
+    """
+    valeur complète de l'en-tête content-disposition d'un téléchargement
+    param filename: nom du fichier proposé au téléchargement
+    return: texte de l'en-tête
+    """
+    parts = ['attachment']
+    for name, value in attachment_names(filename).items():
+        if name == 'filename':
+            value = '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        parts.append(f'{name}={value}')
+    return '; '.join(parts)
+
+
+def etag_matches(if_none_match, etag):
+    """
+    vrai si l'en-tête If-None-Match contient l'etag (ou *)
+    param if_none_match: valeur de l'en-tête ou None
+    param etag: empreinte du pdf (sans guillemets)
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == '*' or candidate.strip('"') == etag:
+            return True
+    return False
+
+
+def report_headers(report_id):
+    """
+    en-tête identifiant un rapport enregistré (voir report_store.save_report)
+    param report_id: identifiant du rapport
+    return: dictionnaire d'en-têtes http (X-Report-ID)
+    """
+    return {'X-Report-ID': report_id}
+
+
+def summary_headers(meta):
+    """
+    en-têtes décrivant la génération du résumé
+    param meta: métadonnées renvoyées par generate_summary_details
+    return: dictionnaire d'en-têtes http
+    """
+    headers = {'X-Summary-Cache': 'hit' if meta.get('cached') else 'miss'}
+    compaction = meta.get('compaction')
+    if compaction:
+        headers['X-Tokens-Original'] = str(compaction['original_tokens'])
+        headers['X-Tokens-Sent'] = str(compaction['compacted_tokens'])
+        headers['X-Tokens-Saved'] = str(compaction['tokens_saved'])
+    if meta.get('near_duplicate') is not None:
+        # rapport repris de notes presque identiques (similarité des empreintes)
+        headers['X-Summary-Similarity'] = f"{meta['near_duplicate']:.3f}"
+    return headers
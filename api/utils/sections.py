@@ -0,0 +1,89 @@
+"""
+découpage d'un rapport généré en sections (titres reconnus comme par
+pdf_generator.detect_section_title) pour n'en régénérer qu'une seule:
+les autres sections sont reprises telles quelles
+"""
+import re
+import unicodedata
+from collections import namedtuple
+
+from utils.markdown_parser import is_section_title
+
+# section du rapport: title = titre nettoyé (None pour le texte avant le
+# premier titre), heading = ligne du titre telle quelle, body = contenu
+Section = namedtuple('Section', ['title', 'heading', 'body'])
+
+# balisage autour d'un titre: dièses, gras, deux-points final
+_TITLE_MARKUP = re.compile(r'^[#\s]*\**\s*|\s*\**\s*:?\s*\**\s*$')
+
+
+def section_title(line):
+    """
+    titre de section porté par une ligne du texte de l'ia
+    param line: ligne brute (balisage markdown éventuel)
+    return: titre nettoyé, None si la ligne n'est pas un titre
+    """
+    title = _TITLE_MARKUP.sub('', line)
+    if title and is_section_title(title):
+        return title
+    return None
+
+
+def split_sections(text):
+    """
+    découpe le texte de l'ia en sections
+    param text: texte généré par l'ia
+    return: liste de Section dans l'ordre du texte
+    """
+    sections = []
+    title, heading, lines = None, None, []
+    for line in text.split('\n'):
+        found = section_title(line)
+        if found is None:
+            lines.append(line)
+            continue
+        if title is not None or any(part.strip() for part in lines):
+            sections.append(Section(title, heading, '\n'.join(lines).strip('\n')))
+        title, heading, lines = found, line, []
+    if title is not None or any(part.strip() for part in lines):
+        sections.append(Section(title, heading, '\n'.join(lines).strip('\n')))
+    return sections
+
+
+def join_sections(sections):
+    """
+    reconstitue le texte du rapport à partir de ses sections
+    param sections: liste de Section
+    return: texte du rapport
+    """
+    parts = []
+    for section in sections:
+        block = section.body if section.heading is None else f"{section.heading}\n{section.body}"
+        parts.append(block.strip('\n'))
+    return '\n\n'.join(parts)
+
+
+def _normalize(name):
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.findall(r'[A-Z0-9]+', name.upper()))
+
+
+def find_section(sections, name):
+    """
+    position de la section demandée (sans tenir compte de la casse ni des
+    accents): titre identique, sinon premier titre qui contient le nom
+    param sections: liste de Section
+    param name: nom de la section (ex: "recommandations")
+    return: position dans la liste, None si aucune section ne correspond
+    """
+    wanted = _normalize(name)
+    if not wanted:
+        return None
+    titles = [_normalize(section.title) if section.title else None for section in sections]
+    for index, title in enumerate(titles):
+        if title == wanted:
+            return index
+    for index, title in enumerate(titles):
+        if title and wanted in title:
+            return index
+    return None
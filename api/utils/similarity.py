@@ -0,0 +1,200 @@
+"""
+empreintes simhash des notes et index des notes presque identiques
+deux notes qui ne diffèrent que par un étage, un nom d'utilisateur ou une
+heure ont des empreintes de 64 bits voisines (quelques bits différents),
+alors que le cache exact (sha256 des notes) les considère différentes
+
+l'index découpe chaque empreinte en 4 blocs de 16 bits (lsh): deux empreintes
+à au plus d bits l'une de l'autre ont au moins un bloc qui diffère d'au plus
+d // 4 bits. une recherche consulte, pour chaque bloc, les valeurs à au plus
+d // 4 bits du bloc cherché et ne compare que ces empreintes, pas tout l'index
+"""
+import hashlib
+import itertools
+import re
+import threading
+from collections import OrderedDict
+
+FINGERPRINT_BITS = 64
+BLOCKS = 4
+BLOCK_BITS = FINGERPRINT_BITS // BLOCKS
+BLOCK_MASK = (1 << BLOCK_BITS) - 1
+# compteurs par bit, calculés tous ensemble dans un grand entier:
+# un compteur de 32 bits par bit de l'empreinte
+LANE_BITS = 32
+LANE_MASK = (1 << LANE_BITS) - 1
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def _spread_byte(byte):
+    # les 8 bits d'un octet, un par compteur
+    return sum(1 << (bit * LANE_BITS) for bit in range(8) if byte >> bit & 1)
+
+
+# octet -> ses bits répartis dans 8 compteurs
+_SPREAD = [_spread_byte(byte) for byte in range(256)]
+
+
+def features(text):
+    """
+    caractéristiques d'une note: ses mots (en minuscules) et leur nombre
+    d'occurrences. les paires de mots rendent les empreintes de notes
+    courtes trop sensibles à un mot changé
+    param text: notes normalisées
+    return: dictionnaire mot -> poids
+    """
+    weights = {}
+    for word in WORD_PATTERN.findall(text.lower()):
+        weights[word] = weights.get(word, 0) + 1
+    return weights
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text):
+    """
+    empreinte simhash de 64 bits d'une note
+    param text: notes normalisées
+    return: entier de 64 bits (0 pour une note sans mot)
+    """
+    counters = 0
+    total = 0
+    for feature, weight in features(text).items():
+        value = _feature_hash(feature)
+        spread = 0
+        for index in range(FINGERPRINT_BITS // 8):
+            spread |= _SPREAD[value >> (8 * index) & 0xff] << (8 * index * LANE_BITS)
+        counters += weight * spread
+        total += weight
+
+    # bit à 1 quand la majorité (pondérée) des caractéristiques l'ont à 1
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if 2 * (counters >> (bit * LANE_BITS) & LANE_MASK) > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def distance(first, second):
+    """
+    nombre de bits différents entre deux empreintes
+    """
+    return (first ^ second).bit_count()
+
+
+def similarity(first, second):
+    """
+    similarité de deux empreintes, de 0 à 1 (1: empreintes identiques)
+    """
+    return 1 - distance(first, second) / FINGERPRINT_BITS
+
+
+def max_distance_for(threshold):
+    """
+    distance maximale (bits) correspondant à un seuil de similarité
+    param threshold: similarité minimale, de 0 à 1
+    """
+    return max(0, min(FINGERPRINT_BITS - 1, int((1 - threshold) * FINGERPRINT_BITS + 1e-9)))
+
+
+def _probe_masks(flips):
+    """
+    masques de 16 bits d'au plus `flips` bits à 1 (0 compris)
+    """
+    return [sum(1 << bit for bit in bits)
+            for count in range(flips + 1)
+            for bits in itertools.combinations(range(BLOCK_BITS), count)]
+
+
+class SimHashIndex:
+    """
+    index des empreintes des notes déjà résumées (lsh par blocs)
+    thread-safe, borné à max_size entrées (les plus anciennes sortent)
+    """
+
+    def __init__(self, max_size=100000, max_distance=7):
+        """
+        param max_size: nombre maximal d'empreintes conservées
+        param max_distance: bits différents au plus entre deux notes voisines
+        """
+        self.max_size = max_size
+        self.max_distance = max_distance
+        # variantes d'un bloc consultées par une recherche
+        self._probes = _probe_masks(max_distance // BLOCKS)
+        self._entries = OrderedDict()
+        # par bloc: valeur du bloc -> empreintes
+        self._buckets = [{} for _ in range(BLOCKS)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, fingerprint, value):
+        """
+        enregistre une empreinte (remplace la valeur si elle est déjà connue)
+        param fingerprint: empreinte simhash
+        param value: valeur associée (ex: clé du résumé)
+        """
+        with self._lock:
+            if fingerprint in self._entries:
+                self._entries[fingerprint] = value
+                self._entries.move_to_end(fingerprint)
+                return
+
+            self._entries[fingerprint] = value
+            for index, buckets in enumerate(self._buckets):
+                buckets.setdefault(fingerprint >> (index * BLOCK_BITS) & BLOCK_MASK, []).append(fingerprint)
+
+            while len(self._entries) > self.max_size:
+                oldest, _ = self._entries.popitem(last=False)
+                self._unlink(oldest)
+
+    def discard(self, fingerprint):
+        """
+        retire une empreinte (valeur devenue inutilisable)
+        """
+        with self._lock:
+            if self._entries.pop(fingerprint, None) is not None:
+                self._unlink(fingerprint)
+
+    def _unlink(self, fingerprint):
+        for index, buckets in enumerate(self._buckets):
+            block = fingerprint >> (index * BLOCK_BITS) & BLOCK_MASK
+            bucket = buckets[block]
+            bucket.remove(fingerprint)
+            if not bucket:
+                del buckets[block]
+
+    def nearest(self, fingerprint):
+        """
+        empreinte la plus proche à au plus max_distance bits
+        param fingerprint: empreinte cherchée
+        return: tuple (empreinte, valeur, distance) ou None
+        """
+        best = None
+        best_distance = self.max_distance + 1
+        with self._lock:
+            value = self._entries.get(fingerprint)
+            if value is not None:
+                return fingerprint, value, 0
+
+            for index, buckets in enumerate(self._buckets):
+                block = fingerprint >> (index * BLOCK_BITS) & BLOCK_MASK
+                for probe in self._probes:
+                    for candidate in buckets.get(block ^ probe, ()):
+                        candidate_distance = (candidate ^ fingerprint).bit_count()
+                        if candidate_distance < best_distance:
+                            best, best_distance = candidate, candidate_distance
+
+            if best is None:
+                return None
+            return best, self._entries[best], best_distance
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for buckets in self._buckets:
+                buckets.clear()
@@ -0,0 +1,162 @@
+"""
+démarrage à froid: chargement des modules lourds (reportlab, pillow, groq)
+hors du chemin de la première requête, et préchauffage complet à la demande
+
+modes (SYNTHESIA_PRELOAD):
+- thread: les modules lourds sont importés par un thread de fond lancé à
+  l'import du point d'entrée (défaut)
+- lazy: rien n'est chargé avant la première requête qui en a besoin
+- eager: import synchrone au démarrage (démarrage plus long, première
+  requête plus rapide)
+"""
+import importlib
+import os
+import threading
+import time
+
+from utils.logger import get_logger
+
+logger = get_logger('warmup')
+
+PRELOAD = os.environ.get('SYNTHESIA_PRELOAD', 'thread')
+
+# modules chargés par le préchargement, dans l'ordre
+HEAVY_MODULES = (
+    'reportlab.platypus',
+    'PIL.Image',
+    'utils.pdf_generator',
+    'utils.ai_handler',
+    'httpx',
+    'groq',
+)
+
+_preload_thread = None
+_preload_done = threading.Event()
+_preload_lock = threading.Lock()
+# durée d'import de chaque module préchargé (millisecondes)
+preload_report = {}
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def preload_modules():
+    """
+    importe les modules lourds (sans effet s'ils sont déjà chargés)
+    return: dictionnaire module -> millisecondes
+    """
+    for name in HEAVY_MODULES:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("prechargement impossible", module=name, error=str(e))
+            continue
+        preload_report.setdefault(name, _elapsed_ms(started))
+    _preload_done.set()
+    return dict(preload_report)
+
+
+def start_preload(mode=None):
+    """
+    lance le préchargement selon le mode (appelé à l'import des points d'entrée)
+    param mode: thread, lazy ou eager (SYNTHESIA_PRELOAD par défaut)
+    """
+    global _preload_thread
+
+    mode = mode or PRELOAD
+    if mode == 'lazy':
+        return
+    if mode == 'eager':
+        preload_modules()
+        return
+
+    with _preload_lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=preload_modules, name='synthesia-preload', daemon=True)
+            _preload_thread.start()
+
+
+def wait_preload(timeout=None):
+    """
+    attend la fin du préchargement lancé par start_preload
+    return: True si le préchargement est terminé
+    """
+    if _preload_thread is None:
+        return _preload_done.is_set()
+    return _preload_done.wait(timeout)
+
+
+def warm_fonts():
+    """
+    charge les métriques des polices des thèmes (et leurs variantes
+    gras / italique utilisées par les balises <b> et <i>)
+    """
+    from reportlab.lib.fonts import ps2tt, tt2ps
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.pdfbase import pdfmetrics
+
+    from utils.pdf_styles import THEMES
+
+    fonts = set()
+    for theme in THEMES.values():
+        for value in theme:
+            if isinstance(value, ParagraphStyle):
+                family, _, _ = ps2tt(value.fontName)
+                fonts.update(tt2ps(family, bold, italic) for bold in (0, 1) for italic in (0, 1))
+
+    for font in sorted(fonts):
+        pdfmetrics.stringWidth('SyntheSIA', font, 10)
+    return sorted(fonts)
+
+
+def warm_up():
+    """
+    préchauffage complet avant le trafic: modules, thèmes, polices, logo,
+    workers de rendu et client groq (pool de connexions)
+    return: dictionnaire étape -> millisecondes (et détails)
+    """
+    steps = {}
+
+    started = time.perf_counter()
+    preload_modules()
+    steps['modules'] = _elapsed_ms(started)
+
+    from utils.pdf_styles import THEMES, get_theme
+    from utils.pdf_generator import get_logo, get_profile
+    from utils.render_pool import start_pool
+    from utils.groq_client import get_client
+
+    started = time.perf_counter()
+    for name in THEMES:
+        get_theme(name)
+    steps['styles'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    fonts = warm_fonts()
+    steps['fonts'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    logo = get_logo(get_profile().logo_dpi)
+    steps['logo'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    render_workers = start_pool()
+    steps['render_pool'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    client_ready = bool(os.environ.get('GROQ_API_KEY'))
+    if client_ready:
+        get_client()
+    steps['groq_client'] = _elapsed_ms(started)
+
+    logger.info("prechauffage termine", **steps)
+    return {
+        'steps_ms': steps,
+        'fonts': fonts,
+        'logo': logo is not None,
+        'groq_client': client_ready,
+        'render_workers': len(render_workers),
+        'preload_ms': dict(preload_report),
+    }
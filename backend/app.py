@@ -1,7 +1,8 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 from utils.ai_handler import generate_summary
-from utils.pdf_generator import create_pdf
+from utils.pdf_generator import render_pdf
+from utils.metrics import RequestTimings, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
 import os
 from datetime import datetime
 
@@ -15,10 +16,33 @@ CORS(app, resources={
     r"/api/*": {
         "origins": "*",
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type"],
+        "expose_headers": ["Server-Timing"]
     }
 })
 
+def iter_chunks(data, chunk_size=64 * 1024):
+    """Découpe le PDF en morceaux pour l'envoyer en streaming"""
+    view = memoryview(data)
+    for start in range(0, view.nbytes, chunk_size):
+        yield view[start:start + chunk_size].tobytes()
+
+# Durées des étapes : en-tête Server-Timing et histogrammes de /api/metrics
+@app.after_request
+def add_server_timing(response):
+    """Ajoute l'en-tête Server-Timing aux requêtes mesurées"""
+    timings = g.pop('timings', None)
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.header()
+        timings.finish(response.status_code)
+    return response
+
+# Métriques Prometheus du processus
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Métriques au format texte Prometheus"""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 # Route de test
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -38,9 +62,12 @@ def generate_report():
     if request.method == 'OPTIONS':
         return '', 204
     
+    g.timings = timings = RequestTimings('generate-report')
+    
     try:
         # Récupération des données
-        data = request.json
+        with timings.stage('parse'):
+            data = request.json
         title = data.get('title', 'Rapport sans titre')
         raw_data = data.get('raw_data', '')
         author = data.get('author', 'Anonyme')
@@ -51,19 +78,24 @@ def generate_report():
         
         # Génération IA
         print(f"🤖 Génération du résumé IA pour : {title}")
-        summary = generate_summary(raw_data)
+        with timings.stage('groq'):
+            summary = generate_summary(raw_data)
         
-        # Création PDF
+        # Création PDF en mémoire (plus de fichiers qui s'accumulent sur disque)
         print(f"📄 Création du PDF...")
-        pdf_path = create_pdf(title, summary, author, role)
+        pdf = render_pdf(title, summary, author, role, timings=timings)
         
-        # Envoi du PDF
-        return send_file(
-            pdf_path,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f"rapport_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        )
+        # Envoi du PDF directement depuis le tampon
+        with timings.stage('encode'):
+            filename = f"rapport_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            response = Response(
+                iter_chunks(pdf),
+                mimetype='application/pdf',
+                headers={'Content-Length': str(pdf.nbytes)},
+                direct_passthrough=True
+            )
+            response.headers.set('Content-Disposition', 'attachment', filename=filename)  # Nom ASCII (horodatage)
+        return response
         
     except Exception as e:
         print(f"❌ Erreur : {str(e)}")
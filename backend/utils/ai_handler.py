@@ -1,12 +1,42 @@
-from groq import Groq
 import os
+import unicodedata
 from dotenv import load_dotenv
+from utils.cache import LRUCache, DiskCache, TieredCache, make_key, DEFAULT_DISK_DIR
+from utils.groq_client import get_client
+from utils.metrics import record_cache
 
 # Chargement des variables d'environnement
 load_dotenv()
 
-# Initialisation du client Groq (IA GRATUITE)
-client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+# Paramètres du modèle (inclus dans la clé de cache)
+MODEL = "llama-3.3-70b-versatile"
+MAX_TOKENS = 800
+TEMPERATURE = 0.7
+
+# À incrémenter à chaque modification du prompt système
+PROMPT_VERSION = 1
+
+# Cache des résumés : mémoire (LRU + TTL) puis disque optionnel
+summary_cache = TieredCache(
+    LRUCache(
+        max_size=int(os.getenv('SYNTHESIA_SUMMARY_CACHE_SIZE', '256')),
+        ttl=int(os.getenv('SYNTHESIA_SUMMARY_CACHE_TTL', '86400'))
+    ),
+    DiskCache(
+        directory=os.getenv('SYNTHESIA_SUMMARY_CACHE_DIR', os.path.join(DEFAULT_DISK_DIR, 'summaries')),
+        ttl=int(os.getenv('SYNTHESIA_SUMMARY_CACHE_TTL', '86400'))
+    ) if os.getenv('SYNTHESIA_SUMMARY_CACHE_DISK', '1') == '1' else None
+)
+
+def normalize_raw_text(raw_text):
+    """Normalise les notes (fins de ligne, espaces) pour la clé de cache"""
+    text = unicodedata.normalize('NFC', raw_text)
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return '\n'.join(line.rstrip() for line in text.split('\n')).strip()
+
+def summary_cache_key(raw_text):
+    """Clé de cache : modèle, version du prompt, paramètres et notes normalisées"""
+    return make_key(MODEL, PROMPT_VERSION, TEMPERATURE, MAX_TOKENS, normalize_raw_text(raw_text))
 
 def generate_summary(raw_text):
     """
@@ -19,6 +49,14 @@ def generate_summary(raw_text):
         str: Résumé structuré et professionnel
     """
     
+    # Résumé déjà généré pour les mêmes notes ?
+    cache_key = summary_cache_key(raw_text)
+    cached = summary_cache.get(cache_key)
+    record_cache('summary', cached is not None)
+    if cached is not None:
+        print(f"♻️ Résumé IA servi depuis le cache ({len(cached)} caractères)")
+        return cached
+    
     # Prompt optimisé pour générer un rapport technique
     system_prompt = """Tu es un assistant expert qui transforme des notes techniques 
     en rapports professionnels de qualité. Tu dois :
@@ -36,20 +74,27 @@ def generate_summary(raw_text):
     Le rapport doit être adapté pour être lu par un responsable technique."""
     
     try:
+        # Client Groq partagé (IA GRATUITE), créé à la première requête
+        client = get_client()
+        
         # Appel à l'API Groq
         response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Modèle gratuit ultra-performant
+            model=MODEL,  # Modèle gratuit ultra-performant
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": f"Transforme ces notes techniques en rapport professionnel structuré :\n\n{raw_text}"}
             ],
-            max_tokens=800,  # Permet des rapports détaillés
-            temperature=0.7  # Bon équilibre créativité/précision
+            max_tokens=MAX_TOKENS,  # Permet des rapports détaillés
+            temperature=TEMPERATURE  # Bon équilibre créativité/précision
         )
         
         # Extraction du texte généré
         summary = response.choices[0].message.content
         
+        # Seuls les résumés réussis sont mis en cache
+        if summary:
+            summary_cache.set(cache_key, summary)
+        
         print(f"✅ Résumé IA généré avec succès ({len(summary)} caractères)")
         return summary
         
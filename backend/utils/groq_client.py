@@ -0,0 +1,118 @@
+"""
+client groq persistant partagé par tout le processus
+un seul pool de connexions httpx (keep-alive) réutilisé entre les requêtes
+"""
+import os
+import threading
+
+# client unique du processus et clé api avec laquelle il a été créé
+_client = None
+_client_api_key = None
+_lock = threading.Lock()
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def client_settings():
+    """
+    lit la configuration du pool de connexions depuis l'environnement
+    return: dictionnaire des paramètres
+    """
+    return {
+        'base_url': os.environ.get('GROQ_BASE_URL') or None,
+        'max_connections': _env_int('GROQ_POOL_SIZE', '20'),
+        'max_keepalive_connections': _env_int('GROQ_KEEPALIVE_CONNECTIONS', '10'),
+        'keepalive_expiry': _env_float('GROQ_KEEPALIVE_EXPIRY', '30'),
+        'connect_timeout': _env_float('GROQ_CONNECT_TIMEOUT', '5'),
+        'read_timeout': _env_float('GROQ_READ_TIMEOUT', '60'),
+        'max_retries': _env_int('GROQ_MAX_RETRIES', '2'),
+    }
+
+
+def _build_client(api_key):
+    """
+    crée un client groq adossé à un httpx.Client configuré
+    (imports locaux pour ne pas charger groq au démarrage)
+    """
+    import httpx
+    from groq import Groq
+
+    settings = client_settings()
+
+    timeout = httpx.Timeout(
+        settings['read_timeout'],
+        connect=settings['connect_timeout']
+    )
+    http_client = httpx.Client(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=settings['max_connections'],
+            max_keepalive_connections=settings['max_keepalive_connections'],
+            keepalive_expiry=settings['keepalive_expiry']
+        )
+    )
+
+    return Groq(
+        api_key=api_key,
+        base_url=settings['base_url'],
+        timeout=timeout,
+        max_retries=settings['max_retries'],
+        http_client=http_client
+    )
+
+
+def get_client(api_key=None):
+    """
+    retourne le client groq du processus, créé à la première utilisation
+    le client est recréé automatiquement si la clé api a changé
+    param api_key: clé api (par défaut GROQ_API_KEY)
+    return: instance de groq.Groq
+    """
+    global _client, _client_api_key
+
+    if api_key is None:
+        api_key = os.environ.get('GROQ_API_KEY')
+
+    # chemin rapide sans verrou: client déjà créé avec la bonne clé
+    client = _client
+    if client is not None and _client_api_key == api_key:
+        return client
+
+    with _lock:
+        if _client is not None and _client_api_key != api_key:
+            _close(_client)
+            _client = None
+
+        if _client is None:
+            print("création du client groq partagé")
+            _client = _build_client(api_key)
+            _client_api_key = api_key
+
+        return _client
+
+
+def reset_client():
+    """
+    ferme et oublie le client courant (ex: rotation de la clé api)
+    le prochain appel à get_client() en recrée un
+    """
+    global _client, _client_api_key
+
+    with _lock:
+        if _client is not None:
+            _close(_client)
+        _client = None
+        _client_api_key = None
+
+
+def _close(client):
+    try:
+        client.close()
+    except Exception as e:
+        print(f"erreur à la fermeture du client groq: {str(e)}")
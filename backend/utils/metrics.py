@@ -0,0 +1,218 @@
+"""
+mesures du service: durée des étapes de chaque requête (en-tête
+server-timing) et métriques du processus au format texte prometheus
+(histogrammes de durées, tailles et pages des pdf, taux de cache)
+les métriques sont propres au processus: chaque worker (ou instance
+vercel) expose les siennes
+"""
+import contextlib
+import threading
+import time
+
+# bornes des histogrammes
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (10_000, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+PAGES_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    compteur cumulatif, une série par combinaison de libellés
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.values().items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """
+    histogramme cumulatif à bornes fixes, une série par combinaison de libellés
+    """
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {key: (list(s['counts']), s['sum'], s['count']) for key, s in self._series.items()}
+
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+# métriques du processus
+STAGE_SECONDS = Histogram(
+    'synthesia_stage_duration_seconds', "Durée des étapes d'une requête",
+    SECONDS_BUCKETS, ('handler', 'stage')
+)
+REQUEST_SECONDS = Histogram(
+    'synthesia_request_duration_seconds', "Durée totale des requêtes",
+    SECONDS_BUCKETS, ('handler', 'status')
+)
+PDF_BYTES = Histogram('synthesia_pdf_size_bytes', "Taille des pdf générés", BYTES_BUCKETS)
+PDF_PAGES = Histogram('synthesia_pdf_pages', "Nombre de pages des pdf générés", PAGES_BUCKETS)
+CACHE_LOOKUPS = Counter('synthesia_cache_lookups_total', "Consultations des caches", ('cache', 'result'))
+
+REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, PDF_BYTES, PDF_PAGES, CACHE_LOOKUPS]
+
+
+class RequestTimings:
+    """
+    durées des étapes d'une requête, publiées dans les histogrammes au fil
+    de l'eau et résumées dans l'en-tête server-timing
+    """
+
+    def __init__(self, handler):
+        """
+        param handler: nom du point d'entrée (libellé des métriques)
+        """
+        self.handler = handler
+        self.stages = []
+        self._started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        mesure le bloc comme étape `name` (même en cas d'exception)
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.stages.append((name, seconds))
+        STAGE_SECONDS.observe(seconds, handler=self.handler, stage=name)
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def header(self):
+        """
+        valeur de l'en-tête server-timing (durées en millisecondes)
+        """
+        parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.stages]
+        parts.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(parts)
+
+    def finish(self, status):
+        """
+        enregistre la durée totale de la requête
+        param status: code http de la réponse
+        """
+        REQUEST_SECONDS.observe(self.elapsed(), handler=self.handler, status=status)
+
+
+def timed(timings, name):
+    """
+    étape mesurée si des timings sont fournis, sans effet sinon
+    """
+    if timings is None:
+        return contextlib.nullcontext()
+    return timings.stage(name)
+
+
+def observe_pdf(size, pages):
+    """
+    enregistre la taille (octets) et le nombre de pages d'un pdf généré
+    """
+    PDF_BYTES.observe(size)
+    PDF_PAGES.observe(pages)
+
+
+def record_cache(cache, hit):
+    """
+    enregistre une consultation de cache
+    param cache: nom du cache (ex: summary)
+    param hit: la valeur était en cache
+    """
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def render():
+    """
+    toutes les métriques au format texte prometheus (version 0.0.4)
+    le taux de succès de chaque cache est ajouté sous forme de jauge
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+
+    lookups = {}
+    for (cache, result), count in CACHE_LOOKUPS.values().items():
+        hits, total = lookups.get(cache, (0, 0))
+        lookups[cache] = (hits + (count if result == 'hit' else 0), total + count)
+    lines.append('# HELP synthesia_cache_hit_ratio Part des consultations servies par le cache')
+    lines.append('# TYPE synthesia_cache_hit_ratio gauge')
+    for cache, (hits, total) in sorted(lookups.items()):
+        lines.append(f'synthesia_cache_hit_ratio{_format_labels(("cache",), (cache,))} {_format_value(hits / total)}')
+
+    return '\n'.join(lines) + '\n'
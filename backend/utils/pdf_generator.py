@@ -6,9 +6,12 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.platypus import Frame, PageTemplate, Image
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 from datetime import datetime
+import io
 import os
 import re
 
+from utils.metrics import timed, observe_pdf
+
 def header_footer(canvas, doc, title, author):
     """
     Fonction appelée automatiquement pour CHAQUE page
@@ -135,6 +138,9 @@ def create_pdf(title, content, author, role):
         content: Contenu IA
         author: Nom de l'auteur
         role: Poste/rôle de l'auteur
+    
+    Returns:
+        str: Chemin du fichier PDF créé dans generated_reports/
     """
     
     output_dir = "generated_reports"
@@ -143,8 +149,35 @@ def create_pdf(title, content, author, role):
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f"{output_dir}/rapport_{timestamp}.pdf"
     
+    with open(filename, 'wb') as f:
+        render_pdf(title, content, author, role, buffer=f)
+    
+    print(f"✅ PDF professionnel créé : {filename}")
+    return filename
+
+def render_pdf(title, content, author, role, buffer=None, timings=None):
+    """
+    Génère le PDF en mémoire, sans fichier sur disque
+    
+    Args:
+        title: Titre du rapport
+        content: Contenu IA
+        author: Nom de l'auteur
+        role: Poste/rôle de l'auteur
+        buffer: Flux binaire de destination (BytesIO par défaut)
+        timings: RequestTimings de la requête (étapes markdown et pdf) ou None
+    
+    Returns:
+        memoryview: Contenu du PDF sans copie (None si buffer n'est pas un BytesIO)
+    """
+    
+    if buffer is None:
+        buffer = io.BytesIO()
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
     doc = SimpleDocTemplate(
-        filename,
+        buffer,
         pagesize=A4,
         rightMargin=2*cm,
         leftMargin=2*cm,
@@ -252,41 +285,42 @@ def create_pdf(title, content, author, role):
     story.append(status_table)
     story.append(Spacer(1, 0.8*cm))
     
-    # Nettoyer le contenu
-    content = clean_markdown_formatting(content)
-    lines = content.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
+    # Nettoyer le contenu et construire les paragraphes
+    with timed(timings, 'markdown'):
+        content = clean_markdown_formatting(content)
+        lines = content.split('\n')
         
-        # DÉTECTION AMÉLIORÉE DES TITRES DE SECTION
-        if detect_section_title(line):
-            story.append(Spacer(1, 0.5*cm))  # Espace avant le titre
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
             
-            # Mettre le titre en majuscules ET gras avec trait de séparation visuel
-            story.append(Paragraph(f"<b>{line}</b>", style_section))
+            # DÉTECTION AMÉLIORÉE DES TITRES DE SECTION
+            if detect_section_title(line):
+                story.append(Spacer(1, 0.5*cm))  # Espace avant le titre
+                
+                # Mettre le titre en majuscules ET gras avec trait de séparation visuel
+                story.append(Paragraph(f"<b>{line}</b>", style_section))
+                
+                # Ligne décorative sous le titre
+                line_data = [['  ']]
+                line_table = Table(line_data, colWidths=[16*cm])
+                line_table.setStyle(TableStyle([
+                    ('LINEABOVE', (0, 0), (-1, 0), 2, colors.HexColor('#3b82f6')),
+                    ('TOPPADDING', (0, 0), (-1, -1), 0),
+                    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+                ]))
+                story.append(line_table)
             
-            # Ligne décorative sous le titre
-            line_data = [['  ']]
-            line_table = Table(line_data, colWidths=[16*cm])
-            line_table.setStyle(TableStyle([
-                ('LINEABOVE', (0, 0), (-1, 0), 2, colors.HexColor('#3b82f6')),
-                ('TOPPADDING', (0, 0), (-1, -1), 0),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ]))
-            story.append(line_table)
-        
-        # Détection des listes à puces
-        elif line.startswith('-') or line.startswith('•'):
-            clean_line = re.sub(r'^[-•]\s*', '', line)
-            story.append(Paragraph(f"- {clean_line}", style_bullet))
+            # Détection des listes à puces
+            elif line.startswith('-') or line.startswith('•'):
+                clean_line = re.sub(r'^[-•]\s*', '', line)
+                story.append(Paragraph(f"- {clean_line}", style_bullet))
+            
+            # Contenu normal
+            else:
+                story.append(Paragraph(line, style_content))
         
-        # Contenu normal
-        else:
-            story.append(Paragraph(line, style_content))
-    
     # SIGNATURE FLEXIBLE
     signature_data = [
         ['Rapport généré par', 'Valide par'],
@@ -312,7 +346,12 @@ def create_pdf(title, content, author, role):
     def page_template(canvas, doc):
         header_footer(canvas, doc, title, author)
     
-    doc.build(story, onFirstPage=page_template, onLaterPages=page_template)
+    with timed(timings, 'pdf'):
+        doc.build(story, onFirstPage=page_template, onLaterPages=page_template)
+    observe_pdf(buffer.tell(), doc.page)
     
-    print(f"✅ PDF professionnel créé : {filename}")
-    return filename
\ No newline at end of file
+    if not isinstance(buffer, io.BytesIO):
+        return None
+    
+    # Vue directe sur le tampon (pas de copie du PDF)
+    return buffer.getbuffer()
@@ -0,0 +1,117 @@
+"""
+benchmark: analyse du texte de l'ia avant la mise en page pdf
+vérifie d'abord que utils.markdown_parser produit exactement les blocs
+de l'ancien traitement (legacy_markdown) sur le corpus de référence et
+sur des entrées piégeuses, puis compare les temps d'analyse
+
+usage: python benchmarks/bench_markdown.py [--repeat N]
+code de sortie 1 si un résultat diffère de la référence
+"""
+import argparse
+import glob
+import os
+import sys
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from legacy_markdown import legacy_blocks
+from utils.markdown_parser import parse_blocks
+
+CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus', 'llm_outputs')
+
+
+def load_corpus():
+    """
+    sorties ia de référence
+    return: liste de tuples (nom, texte)
+    """
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, '*.md'))):
+        with open(path, encoding='utf-8') as f:
+            corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+
+def adversarial_inputs():
+    """
+    entrées construites pour piéger les expressions régulières
+    (astérisques non fermés, séparateurs, lignes vides, emojis collés)
+    """
+    return [
+        ('etoiles_non_fermees', '**' + 'a*' * 5000),
+        ('etoiles_seules', '*' * 20000),
+        ('gras_imbrique', '***gras*** et **demi* ' * 2000),
+        ('lignes_vides', '-\n' + '\n' * 20000 + 'texte'),
+        ('separateurs', ('=-' * 3 + '🔧' + '---\n') * 3000),
+        ('separateurs_gras', '*---*\n--**--\n•--*x*\n-*-*-\n===**===\n  ---- - a\n' * 1000),
+        ('emojis_balisage', ('#🔧\n  - 🚀 **gras🔥** *it\u3000*\n\u3000•🔧\n-🔧--\n✅ CONTEXTE 📋\n🔧\n') * 1000),
+        # retirer un emoji change la fin de ligne vue par le traitement des '#'
+        ('emoji_apres_titre', 'Fin #🔧\n- y\n' * 2000),
+        # retirer un séparateur avant le gras changerait l'appariement des '*'
+        ('separateurs_dans_gras', '**----= *---**xx\n' * 2000),
+        # séparateur formé par la suppression d'un emoji, sans '#' ni '*'
+        ('separateur_apres_emoji', 'x=---\u3000==✅\n' * 2000),
+        ('puces_melangees', '• a\n* b\n+ c\n- d\n  -\n\n  e\n' * 2000),
+        ('titres_longs', ('# ' + 'CONTEXTE ' * 20 + '\n') * 1000),
+        ('sans_saut', 'x' * 200000),
+    ]
+
+
+def long_output(corpus, size):
+    """
+    sortie longue réaliste: le corpus concaténé jusqu'à `size` caractères
+    """
+    text = '\n\n'.join(content for _, content in corpus)
+    return (text * (size // len(text) + 1))[:size]
+
+
+def check(cases):
+    """
+    compare nouvel analyseur et référence
+    return: liste des noms de cas divergents
+    """
+    failures = []
+    for name, text in cases:
+        expected = legacy_blocks(text)
+        actual = [tuple(block) for block in parse_blocks(text)]
+        if actual != expected:
+            failures.append(name)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help="analyses par mesure")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    if not corpus:
+        print(f"corpus vide: {CORPUS_DIR}")
+        return 1
+
+    adversarial = adversarial_inputs()
+    failures = check(corpus + adversarial)
+    if failures:
+        print(f"résultats différents de la référence: {', '.join(failures)}")
+        return 1
+    print(f"équivalence vérifiée sur {len(corpus)} sorties du corpus et {len(adversarial)} entrées piégeuses")
+
+    cases = [('corpus', '\n\n'.join(content for _, content in corpus)),
+             ('long_200k', long_output(corpus, 200000))] + adversarial
+
+    print(f"{'entrée':<22} {'taille':>8} {'ancien ms':>10} {'une passe ms':>13} {'gain':>6}")
+    for name, text in cases:
+        legacy = min(timeit.repeat(lambda: legacy_blocks(text), number=args.repeat, repeat=3)) / args.repeat
+        single = min(timeit.repeat(lambda: list(parse_blocks(text)), number=args.repeat, repeat=3)) / args.repeat
+        print(f"{name:<22} {len(text):>8} {legacy * 1e3:>10.2f} {single * 1e3:>13.2f} {legacy / single:>5.1f}x")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+suite de micro-benchmarks du pipeline de rapport, comparée à des
+références enregistrées (benchmarks/baselines.json)
+
+cas mesurés:
+- clean_markdown_formatting et detect_section_title sur le corpus
+- render_pdf puis create_pdf pour des rapports de 1, 5 et 50 pages
+- encodage base64 du pdf et handler complet de api/generate-report.py
+- requête flask complète sur api/index.app
+le résumé ia est remplacé par la sortie du corpus associée aux notes
+(corpus/notes/*.txt -> corpus/llm_outputs/*.md): aucun appel groq
+
+usage:
+    python benchmarks/bench_pipeline.py                  comparer aux références
+    python benchmarks/bench_pipeline.py --update         enregistrer les références
+    python benchmarks/bench_pipeline.py --only pdf --threshold 0.3
+code de sortie 1 si un cas est plus lent que sa référence de plus du seuil
+(SYNTHESIA_BENCH_THRESHOLD, 25 % par défaut), confirmé par une nouvelle mesure
+
+les références dépendent de la machine: les régénérer (--update) sur la
+machine qui exécute la comparaison
+"""
+import argparse
+import base64
+import contextlib
+import glob
+import importlib.util
+import json
+import os
+import platform
+import re
+import sys
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+# pas de cache de résumé ni de limiteur: seul le pipeline local est mesuré
+os.environ.setdefault('SYNTHESIA_SUMMARY_CACHE_DISK', '0')
+os.environ.setdefault('SYNTHESIA_RATE_LIMIT', '0')
+# rendu dans le processus: le pool de rendu a son propre test (stress_render_pool.py)
+os.environ.setdefault('SYNTHESIA_RENDER_WORKERS', '0')
+
+import PIL
+import reportlab
+
+from utils import ai_handler
+from utils.pdf_generator import clean_markdown_formatting, create_pdf, detect_section_title, render_pdf, pdf_cache
+
+CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+DEFAULT_THRESHOLD = float(os.environ.get('SYNTHESIA_BENCH_THRESHOLD', '0.25'))
+
+# nouvelles mesures d'un cas au-delà du seuil avant de conclure (bruit machine)
+CONFIRM_ATTEMPTS = 2
+
+# lignes de contenu ia (corpus répété) pour obtenir 1, 5 et 50 pages
+PAGE_SIZES = {1: 10, 5: 110, 50: 1290}
+
+PAGE_PATTERN = re.compile(rb'/Type /Page\b(?!s)')
+
+
+def load_corpus():
+    """
+    notes brutes et sorties ia associées (même nom de fichier)
+    return: liste de tuples (nom, notes, sortie ia)
+    """
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, 'notes', '*.txt'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding='utf-8') as f:
+            notes = f.read()
+        with open(os.path.join(CORPUS_DIR, 'llm_outputs', f'{name}.md'), encoding='utf-8') as f:
+            output = f.read()
+        corpus.append((name, notes, output))
+    return corpus
+
+
+def report_content(corpus, lines):
+    """
+    sortie ia de `lines` lignes construite en répétant le corpus
+    """
+    source = []
+    for _, _, output in corpus:
+        source.extend(output.splitlines())
+        source.append('')
+    return '\n'.join((source * (lines // len(source) + 1))[:lines])
+
+
+def count_pages(pdf):
+    return len(PAGE_PATTERN.findall(bytes(pdf)))
+
+
+@contextlib.contextmanager
+def stub_summary(corpus):
+    """
+    remplace la génération ia par la sortie du corpus des notes reçues
+    """
+    outputs = {notes: output for _, notes, output in corpus}
+    original = ai_handler.generate_summary, ai_handler.generate_summary_details
+
+    def generate_summary_details(raw_text):
+        return outputs[raw_text], {'cached': False, 'model': ai_handler.MODEL, 'compaction': None}
+
+    ai_handler.generate_summary_details = generate_summary_details
+    ai_handler.generate_summary = lambda raw_text: generate_summary_details(raw_text)[0]
+    try:
+        yield
+    finally:
+        ai_handler.generate_summary, ai_handler.generate_summary_details = original
+
+
+def load_vercel_handler():
+    """
+    module api/generate-report.py (nom de fichier non importable tel quel)
+    """
+    spec = importlib.util.spec_from_file_location('generate_report', os.path.join(API_DIR, 'generate-report.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def build_cases(corpus):
+    """
+    cas du benchmark
+    return: liste de tuples (nom, fonction sans argument)
+    """
+    outputs = [output for _, _, output in corpus]
+    lines = [line for output in outputs for line in output.splitlines()]
+    _, notes, _ = corpus[0]
+    payload = {'title': 'Intervention imprimante', 'raw_data': notes,
+               'author': 'Camille Martin', 'role': 'Technicien support'}
+
+    cases = [
+        ('clean_markdown_formatting', lambda: [clean_markdown_formatting(output) for output in outputs]),
+        ('detect_section_title', lambda: [detect_section_title(line) for line in lines]),
+    ]
+
+    for pages, size in PAGE_SIZES.items():
+        content = report_content(corpus, size)
+        cases.append((f'render_pdf_{pages}p', lambda content=content: render_pdf('Rapport', content, 'A', 'B')))
+        cases.append((f'create_pdf_{pages}p', lambda content=content: os.remove(create_pdf('Rapport', content, 'A', 'B'))))
+
+    pdf = bytes(render_pdf('Rapport', report_content(corpus, PAGE_SIZES[5]), 'A', 'B'))
+    cases.append(('base64_5p', lambda: base64.b64encode(pdf).decode('ascii')))
+
+    handler = load_vercel_handler()
+    request = {'method': 'POST', 'body': json.dumps(payload)}
+
+    # rendu complet à chaque tour: le cache des pdf rendus est vidé
+    def vercel_handler():
+        pdf_cache.clear()
+        response = handler(request)
+        assert response['statusCode'] == 200, response
+    cases.append(('vercel_handler', vercel_handler))
+
+    import index
+    client = index.app.test_client()
+
+    def flask_request():
+        pdf_cache.clear()
+        response = client.post('/api/generate-report', json=payload)
+        assert response.status_code == 200, response.status_code
+        response.get_data()
+    cases.append(('flask_generate_report', flask_request))
+
+    return cases
+
+
+def measure(func, rounds):
+    """
+    temps par appel: meilleur de `rounds` séries d'au moins 0,2 s
+    (le minimum est la mesure la moins perturbée par le reste de la machine)
+    return: secondes
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=rounds, number=number)) / number
+
+
+def machine():
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'reportlab': reportlab.Version,
+        'pillow': PIL.__version__,
+    }
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--update', action='store_true', help="enregistrer les mesures comme références")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="ralentissement toléré (0.25 = 25 %%)")
+    parser.add_argument('--rounds', type=int, default=5, help="séries de mesure par cas")
+    parser.add_argument('--only', default='', help="ne mesurer que les cas contenant ce texte")
+    parser.add_argument('--baselines', default=BASELINE_PATH, help="fichier des références")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    if not corpus:
+        print(f"corpus vide: {CORPUS_DIR}")
+        return 1
+
+    baselines = load_baselines(args.baselines)
+    reference = (baselines or {}).get('cases', {})
+    if baselines and baselines.get('machine') != machine() and not args.update:
+        print(f"attention: références mesurées sur une autre machine ({baselines.get('machine')})")
+
+    results = {}
+    regressions = []
+    print(f"{'cas':<26} {'référence ms':>13} {'mesure ms':>10} {'écart':>8}")
+
+    # les utilitaires écrivent leurs logs sur stdout: ignorés pendant les mesures
+    with open(os.devnull, 'w') as devnull, stub_summary(corpus):
+        with contextlib.redirect_stdout(devnull):
+            cases = build_cases(corpus)
+            pages = {size: count_pages(render_pdf('Rapport', report_content(corpus, size), 'A', 'B'))
+                     for size in PAGE_SIZES.values()}
+
+        for name, func in cases:
+            if args.only not in name:
+                continue
+            with contextlib.redirect_stdout(devnull):
+                seconds = measure(func, args.rounds)
+            results[name] = {'seconds': seconds}
+
+            baseline = reference.get(name, {}).get('seconds')
+            if baseline is None:
+                print(f"{name:<26} {'-':>13} {seconds * 1e3:>10.3f} {'nouveau':>8}")
+                continue
+            for _ in range(CONFIRM_ATTEMPTS):
+                if seconds / baseline - 1 <= args.threshold:
+                    break
+                with contextlib.redirect_stdout(devnull):
+                    seconds = min(seconds, measure(func, args.rounds))
+            results[name] = {'seconds': seconds}
+            change = seconds / baseline - 1
+            status = ''
+            if change > args.threshold:
+                regressions.append(name)
+                status = '  RÉGRESSION'
+            print(f"{name:<26} {baseline * 1e3:>13.3f} {seconds * 1e3:>10.3f} {change:>+8.0%}{status}")
+
+    for target, size in PAGE_SIZES.items():
+        if pages[size] != target:
+            print(f"attention: le rapport de {size} lignes fait {pages[size]} pages au lieu de {target}")
+
+    if args.update:
+        cases = dict(reference) if args.only else {}
+        cases.update(results)
+        with open(args.baselines, 'w', encoding='utf-8') as f:
+            json.dump({'machine': machine(), 'cases': cases}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"références enregistrées: {args.baselines}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"aucune régression au-delà de {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
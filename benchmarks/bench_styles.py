@@ -0,0 +1,135 @@
+"""
+benchmark: coût de préparation des styles par rapport
+compare la construction des styles à chaque appel (ancien create_pdf)
+au registre de thèmes précompilé de utils.pdf_styles
+
+usage: python benchmarks/bench_styles.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+# les utilitaires sont importés comme depuis api/
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import TableStyle
+
+from utils.pdf_styles import get_theme
+
+# nombre de titres de section d'un rapport type (une règle décorative chacun)
+SECTIONS_PER_REPORT = 5
+
+
+def legacy_setup():
+    """
+    reproduit la préparation des styles faite à chaque appel
+    avant l'introduction du registre de thèmes
+    """
+    styles = getSampleStyleSheet()
+    style_title = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=22,
+                                 textColor=colors.HexColor('#1e3a8a'), spaceAfter=20, spaceBefore=10,
+                                 alignment=TA_CENTER, fontName='Helvetica-Bold')
+    style_section = ParagraphStyle('SectionTitle', parent=styles['Heading2'], fontSize=14,
+                                   textColor=colors.HexColor('#1e3a8a'), spaceAfter=12, spaceBefore=20,
+                                   fontName='Helvetica-Bold', leading=18, leftIndent=0,
+                                   borderWidth=0, borderPadding=8)
+    style_content = ParagraphStyle('CustomBody', parent=styles['BodyText'], fontSize=10, leading=16,
+                                   spaceAfter=10, alignment=TA_JUSTIFY,
+                                   textColor=colors.HexColor('#374151'), fontName='Helvetica')
+    style_bullet = ParagraphStyle('BulletPoint', parent=style_content, fontSize=10, leftIndent=20,
+                                  bulletIndent=10, spaceAfter=6)
+    tables = [
+        TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#374151')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb'))
+        ]),
+        TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#d1fae5')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#065f46')),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+        ]),
+        TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('LINEABOVE', (0, 0), (-1, 0), 1, colors.HexColor('#1e3a8a')),
+            ('LINEBELOW', (0, -1), (-1, -1), 1, colors.HexColor('#e5e7eb'))
+        ]),
+    ]
+    for _ in range(SECTIONS_PER_REPORT):
+        tables.append(TableStyle([
+            ('LINEABOVE', (0, 0), (-1, 0), 2, colors.HexColor('#3b82f6')),
+            ('TOPPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ]))
+    return style_title, style_section, style_content, style_bullet, tables
+
+
+def registry_setup():
+    """
+    préparation actuelle: sélection d'un thème précompilé
+    """
+    theme = get_theme('default')
+    return theme.title, theme.section, theme.content, theme.bullet, theme.section_rule
+
+
+def measure(func, repeat):
+    """
+    mesure le temps moyen et les allocations d'un appel
+    return: (microsecondes par appel, octets alloués par appel, nombre d'allocations)
+    """
+    seconds = min(timeit.repeat(func, number=repeat, repeat=5)) / repeat
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [func() for _ in range(100)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats if stat.size_diff > 0) / 100
+    count = sum(stat.count_diff for stat in stats if stat.count_diff > 0) / 100
+    del kept
+
+    return seconds * 1e6, size, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200, help="appels par mesure")
+    args = parser.parse_args()
+
+    print(f"{'préparation':<12} {'µs/rapport':>12} {'octets':>10} {'allocs':>8}")
+    results = {}
+    for name, func in (('par appel', legacy_setup), ('registre', registry_setup)):
+        results[name] = measure(func, args.repeat)
+        micros, size, count = results[name]
+        print(f"{name:<12} {micros:>12.1f} {size:>10.0f} {count:>8.0f}")
+
+    speedup = results['par appel'][0] / results['registre'][0]
+    print(f"gain: x{speedup:.0f} sur le temps de préparation par rapport")
+
+
+if __name__ == '__main__':
+    main()
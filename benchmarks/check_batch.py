@@ -0,0 +1,228 @@
+"""
+vérification de la génération par lot (utils.batch, /api/generate-reports):
+concurrence bornée (locale et vue par le faux serveur groq), archive zip
+produite au fil de l'eau, contenu de l'archive, erreurs par rapport qui
+n'interrompent pas le lot et lots invalides refusés (400)
+
+usage: python benchmarks/check_batch.py
+code de sortie 1 si un scénario échoue
+"""
+import io
+import os
+import sys
+import threading
+import time
+import traceback
+import zipfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_groq import FakeGroq
+
+server = FakeGroq().start()
+os.environ['GROQ_BASE_URL'] = server.url
+os.environ['GROQ_API_KEY'] = 'test'
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+import index
+from utils import batch, pdf_generator
+from utils.batch import clamp_concurrency, report_filename, stream_zip, summarize_concurrently
+
+client = index.app.test_client()
+
+
+def reports(count, **fields):
+    # notes uniques: aucun résumé servi depuis le cache
+    stamp = time.time_ns()
+    return [{'title': f'Rapport {number}', 'raw_data': f'notes du rapport {number} {stamp}', **fields}
+            for number in range(count)]
+
+
+def post(body):
+    return client.post('/api/generate-reports', json=body)
+
+
+def max_overlap(requests):
+    """
+    nombre maximal de requêtes simultanées vues par le serveur
+    """
+    events = sorted([(request['started'], 1) for request in requests]
+                    + [(request['finished'], -1) for request in requests])
+    current = peak = 0
+    for _, step in events:
+        current += step
+        peak = max(peak, current)
+    return peak
+
+
+def scenario_concurrency_clamped():
+    assert clamp_concurrency(None) == batch.DEFAULT_CONCURRENCY
+    assert clamp_concurrency(0) == 1 and clamp_concurrency(-5) == 1
+    assert clamp_concurrency(10 ** 6) == batch.MAX_CONCURRENCY
+    assert clamp_concurrency('3') == 3
+    for value in ('abc', [2]):
+        try:
+            clamp_concurrency(value)
+        except (TypeError, ValueError):
+            pass
+        else:
+            raise AssertionError(f"concurrence acceptée: {value!r}")
+    assert post({'reports': reports(1), 'concurrency': 'abc'}).status_code == 400
+
+
+def scenario_summarize_concurrently():
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def summarize(text):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        if text == 'erreur':
+            raise RuntimeError('échec du résumé')
+        return text.upper()
+
+    texts = [f'notes {number}' for number in range(12)] + ['erreur']
+    results = dict(summarize_concurrently(texts, summarize, 3))
+    assert running[1] == 3, running[1]
+    assert sorted(results) == list(range(len(texts))), sorted(results)
+    assert all(results[number] == texts[number].upper() for number in range(12))
+    # une erreur est produite comme résultat, sans interrompre les autres
+    assert isinstance(results[12], RuntimeError), results[12]
+
+
+def scenario_stream_zip_incremental():
+    consumed = []
+
+    def entries():
+        for number in range(3):
+            consumed.append(number)
+            yield f'fichier_{number}.txt', f'contenu {number}'.encode() * 100
+
+    stream = stream_zip(entries())
+    first = next(stream)
+    # premier morceau envoyé avant que le fichier suivant soit produit
+    assert consumed == [0] and first.startswith(b'PK'), consumed
+    data = first + b''.join(stream)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == [f'fichier_{number}.txt' for number in range(3)]
+        assert archive.read('fichier_2.txt') == b'contenu 2' * 100
+        assert archive.testzip() is None
+
+    assert report_filename(0, 'Panne réseau / site 2') == '001_rapport_Panne_réseau_site_2.pdf'
+    assert report_filename(41, '???') == '042_rapport_rapport.pdf'
+
+
+def scenario_archive_contents():
+    server.reset()
+    batch_reports = reports(5)
+    response = post({'reports': batch_reports, 'concurrency': 2})
+    assert response.status_code == 200 and response.mimetype == 'application/zip', response.status_code
+    assert 'rapports.zip' in response.headers['Content-Disposition']
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        names = sorted(archive.namelist())
+        assert names == [report_filename(number, report['title']) for number, report in enumerate(batch_reports)], names
+        assert all(archive.read(name).startswith(b'%PDF') for name in names)
+    assert len(server.requests) == 5, len(server.requests)
+
+
+def scenario_concurrency_seen_by_groq():
+    server.reset()
+    server.defaults['delay'] = 0.2
+    try:
+        response = post({'reports': reports(8), 'concurrency': 2})
+    finally:
+        server.defaults['delay'] = 0.0
+    assert response.status_code == 200, response.status_code
+    peak = max_overlap(server.requests)
+    assert peak == 2, peak
+
+
+def scenario_per_report_errors():
+    # rendu en échec pour un seul rapport (une erreur groq devient un
+    # rapport d'erreur, voir ai_handler.generation_error_text)
+    render_report = pdf_generator.render_report
+
+    def failing_render(title, *args, **kwargs):
+        if title == 'Rapport 0':
+            raise RuntimeError('rendu impossible')
+        return render_report(title, *args, **kwargs)
+
+    batch_reports = reports(3)
+    pdf_generator.render_report = failing_render
+    try:
+        response = post({'reports': batch_reports, 'concurrency': 1})
+    finally:
+        pdf_generator.render_report = render_report
+    assert response.status_code == 200, response.status_code
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        names = sorted(archive.namelist())
+        assert names == ['001_erreur.txt'] + [report_filename(number, batch_reports[number]['title'])
+                                              for number in (1, 2)], names
+        error = archive.read('001_erreur.txt').decode('utf-8')
+    assert error == 'RuntimeError: rendu impossible', error
+
+
+def scenario_invalid_batches_rejected():
+    assert post({'reports': []}).status_code == 400
+    assert post({'concurrency': 2}).status_code == 400
+    assert post({'reports': reports(batch.MAX_REPORTS + 1)}).status_code == 400
+
+    invalid = reports(8)
+    invalid[1]['title'] = ['liste']
+    invalid[2]['author'] = {'nom': 'AB'}
+    invalid[3]['raw_data'] = ['notes']
+    invalid[4]['theme'] = 'inconnu'
+    invalid[5] = 'pas un objet'
+    # thèmes non hachables: refusés, pas d'erreur 500
+    invalid[6]['theme'] = []
+    invalid[7]['theme'] = {'nom': 'sombre'}
+    response = post({'reports': invalid})
+    assert response.status_code == 400, response.status_code
+    assert response.get_json()['indexes'] == [1, 2, 3, 4, 5, 6, 7], response.get_json()
+
+    # titre absent ou nul: titre par défaut
+    server.reset()
+    response = post([{'raw_data': f'notes sans titre {time.time_ns()}', 'title': None}])
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == ['001_rapport_Rapport.pdf'], archive.namelist()
+
+
+SCENARIOS = [
+    scenario_concurrency_clamped,
+    scenario_summarize_concurrently,
+    scenario_stream_zip_incremental,
+    scenario_archive_contents,
+    scenario_concurrency_seen_by_groq,
+    scenario_per_report_errors,
+    scenario_invalid_batches_rejected,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    server.stop()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
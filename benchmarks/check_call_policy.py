@@ -0,0 +1,302 @@
+"""
+vérification de la politique d'appel groq (utils.call_policy) contre le
+faux serveur local: nouvelles tentatives, retry-after, délai par
+tentative et modèle de repli, disjoncteur, requête de couverture (et
+pool des couvertures qui ne borne pas les requêtes principales), erreurs non récupérables, streaming et réponse 503 de l'api
+
+usage: python benchmarks/check_call_policy.py
+code de sortie 1 si un scénario échoue
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_groq import FakeGroq
+
+PRIMARY = 'llama-3.3-70b-versatile'
+FALLBACK = 'llama-3.1-8b-instant'
+MESSAGES = [{'role': 'user', 'content': 'notes'}]
+
+server = FakeGroq().start()
+os.environ['GROQ_BASE_URL'] = server.url
+os.environ['GROQ_API_KEY'] = 'test'
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+# le limiteur de débit a ses propres scénarios (check_rate_limiter.py)
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+
+import groq
+import httpx
+from utils import call_policy
+from utils.groq_client import get_client, reset_client
+
+# réglages de référence, restaurés avant chaque scénario
+BASELINE = {
+    'ATTEMPT_TIMEOUT': 2.0,
+    'MAX_ATTEMPTS': 3,
+    'DEADLINE': 10.0,
+    'BACKOFF_BASE': 0.01,
+    'BACKOFF_MAX': 0.05,
+    'HEDGE_ENABLED': False,
+    'HEDGE_MIN_DELAY': 0.05,
+    'BREAKER_THRESHOLD': 5,
+    'BREAKER_COOLDOWN': 30.0,
+    'FALLBACK_MODEL': FALLBACK,
+    'FALLBACK_AFTER_TIMEOUTS': 2,
+}
+
+
+def setup(**overrides):
+    for name, value in {**BASELINE, **overrides}.items():
+        setattr(call_policy, name, value)
+    call_policy.reset_policy()
+    server.reset()
+    server.defaults.update(status=200, delay=0.0)
+    server.models.clear()
+
+
+def complete(**params):
+    return call_policy.create_completion(get_client(), PRIMARY, messages=MESSAGES, max_tokens=50, **params)
+
+
+def scenario_retry_5xx():
+    setup()
+    server.script([{'status': 500}, {'status': 503}])
+    response = complete()
+    assert response.choices[0].message.content, "réponse vide"
+    assert [r['status'] for r in server.requests] == [500, 503, 200], server.requests
+
+
+def scenario_retry_after():
+    setup()
+    server.script([{'status': 429, 'retry_after': 1}])
+    started = time.monotonic()
+    complete()
+    elapsed = time.monotonic() - started
+    assert elapsed >= 1.0, f"retry-after ignoré ({elapsed:.2f}s)"
+    assert call_policy.get_breaker(PRIMARY).state == 'closed', "un 429 ne doit pas ouvrir le disjoncteur"
+
+
+def scenario_timeout_fallback():
+    setup(ATTEMPT_TIMEOUT=0.3)
+    server.set_model(PRIMARY, delay=2)
+    started = time.monotonic()
+    response = complete()
+    elapsed = time.monotonic() - started
+    models = [r['model'] for r in server.requests]
+    assert response.model == FALLBACK, f"pas de repli: {response.model}"
+    assert elapsed < 1.5, f"délai par tentative non respecté ({elapsed:.2f}s)"
+    assert FALLBACK in models, models
+
+
+def scenario_circuit_breaker():
+    setup(BREAKER_THRESHOLD=3, BREAKER_COOLDOWN=0.5, FALLBACK_MODEL='')
+    server.defaults['status'] = 500
+    try:
+        complete()
+        raise AssertionError("échec attendu")
+    except call_policy.GroqUnavailableError:
+        pass
+    sent = len(server.requests)
+    assert call_policy.get_breaker(PRIMARY).state == 'open'
+
+    started = time.monotonic()
+    try:
+        complete()
+        raise AssertionError("échec immédiat attendu")
+    except call_policy.CircuitOpenError as e:
+        assert e.retry_after > 0
+    assert time.monotonic() - started < 0.05, "le disjoncteur ouvert doit échouer sans attendre"
+    assert len(server.requests) == sent, "aucune requête ne doit partir disjoncteur ouvert"
+
+    # après le délai de refroidissement: tentative d'essai puis fermeture
+    time.sleep(0.6)
+    server.defaults['status'] = 200
+    complete()
+    assert call_policy.get_breaker(PRIMARY).state == 'closed'
+
+
+def scenario_open_circuit_uses_fallback():
+    setup(BREAKER_THRESHOLD=2, MAX_ATTEMPTS=2)
+    server.set_model(PRIMARY, status=500)
+    try:
+        complete()
+    except call_policy.GroqUnavailableError:
+        pass
+    response = complete()
+    assert response.model == FALLBACK, response.model
+
+
+def scenario_hedging():
+    setup(HEDGE_ENABLED=True, HEDGE_MIN_DELAY=0.05)
+    server.defaults['delay'] = 0.01
+    for _ in range(call_policy.HEDGE_MIN_SAMPLES):
+        complete()
+    server.reset()
+    server.script([{'delay': 2.0}, {'delay': 0.0}])
+    started = time.monotonic()
+    complete()
+    elapsed = time.monotonic() - started
+    assert elapsed < 0.5, f"pas de requête de couverture ({elapsed:.2f}s)"
+    assert len(server.requests) >= 1
+
+
+def scenario_hedge_errors_prefer_retryable():
+    # principale en échec récupérable, couverture refusée par le limiteur
+    # (plus tôt ou plus tard): l'erreur relevée reste la récupérable
+    connection_error = groq.APIConnectionError(request=httpx.Request('POST', server.url))
+    quota_error = call_policy.QuotaExhaustedError("quota", retry_after=5)
+    for primary_delay, hedge_delay in ((0.1, 0.0), (0.05, 0.2)):
+        def send(hedge=False):
+            time.sleep(hedge_delay if hedge else primary_delay)
+            raise quota_error if hedge else connection_error
+
+        async def send_async(hedge=False):
+            await asyncio.sleep(hedge_delay if hedge else primary_delay)
+            raise quota_error if hedge else connection_error
+
+        for run in (lambda: call_policy._hedged(send, 0.01),
+                    lambda: asyncio.run(call_policy._hedged_async(send_async, 0.01))):
+            try:
+                run()
+                raise AssertionError("erreur attendue")
+            except groq.APIConnectionError:
+                pass
+
+    # deux erreurs fatales: celle de la principale; principale fatale et
+    # couverture récupérable: celle de la couverture
+    bad_request = call_policy.QuotaExhaustedError("principale")
+    assert call_policy._hedge_error(bad_request, quota_error) is bad_request
+    assert call_policy._hedge_error(quota_error, connection_error) is connection_error
+
+
+def scenario_hedge_pool_not_a_global_limit():
+    # requêtes principales hors du pool des couvertures: plus d'appels lents
+    # simultanés que HEDGE_WORKERS, sans attente; pool plein: pas de couverture
+    lock = threading.Lock()
+    running = [0, 0]
+    hedges = []
+
+    def send(hedge=False):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+            if hedge:
+                hedges.append(time.monotonic())
+        time.sleep(0.3)
+        with lock:
+            running[0] -= 1
+        return 'couverture' if hedge else 'principale'
+
+    calls = call_policy.HEDGE_WORKERS * 3
+    results = []
+    started = time.monotonic()
+    threads = [threading.Thread(target=lambda: results.append(call_policy._hedged(send, 0.05)))
+               for _ in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    assert len(results) == calls and elapsed < 0.6, (len(results), f"{elapsed:.2f}s")
+    assert running[1] == calls + call_policy.HEDGE_WORKERS, running[1]
+    # couvertures bornées et jamais en file d'attente
+    assert len(hedges) == call_policy.HEDGE_WORKERS, len(hedges)
+    assert max(hedges) - started < 0.2, f"{max(hedges) - started:.2f}s"
+
+
+def scenario_key_rotation_keeps_calls():
+    # changement de GROQ_API_KEY pendant un appel: l'ancien client n'est
+    # pas fermé sous les threads qui s'en servent encore
+    setup()
+    server.script([{'delay': 0.3}])
+    results = []
+    thread = threading.Thread(target=lambda: results.append(complete()))
+    thread.start()
+    time.sleep(0.1)
+    old_client = get_client()
+    try:
+        os.environ['GROQ_API_KEY'] = 'test-rotation'
+        assert get_client() is not old_client
+        thread.join()
+        assert len(results) == 1, 'appel en cours interrompu par la rotation'
+    finally:
+        os.environ['GROQ_API_KEY'] = 'test'
+
+
+def scenario_fatal_not_retried():
+    setup()
+    server.script([{'status': 400}])
+    try:
+        complete()
+        raise AssertionError("erreur attendue")
+    except groq.BadRequestError:
+        pass
+    assert len(server.requests) == 1, server.requests
+    assert call_policy.get_breaker(PRIMARY).state == 'closed'
+
+
+def scenario_streaming():
+    setup()
+    server.script([{'status': 502}])
+    stream = complete(stream=True)
+    text = ''.join(chunk.choices[0].delta.content or '' for chunk in stream if chunk.choices)
+    assert 'CONTEXTE' in text, text[:80]
+
+
+def scenario_api_503():
+    setup(MAX_ATTEMPTS=2, FALLBACK_MODEL='')
+    server.defaults['status'] = 503
+    server.script([{'status': 503, 'retry_after': 2}, {'status': 503, 'retry_after': 2}])
+    import index
+    response = index.app.test_client().post('/api/generate-report', json={
+        'title': 'Test', 'raw_data': f'notes {time.time()}'
+    })
+    assert response.status_code == 503, response.status_code
+    assert response.headers.get('Retry-After') == '2', dict(response.headers)
+
+
+SCENARIOS = [
+    scenario_retry_5xx,
+    scenario_retry_after,
+    scenario_timeout_fallback,
+    scenario_circuit_breaker,
+    scenario_open_circuit_uses_fallback,
+    scenario_hedging,
+    scenario_hedge_errors_prefer_retryable,
+    scenario_hedge_pool_not_a_global_limit,
+    scenario_key_rotation_keeps_calls,
+    scenario_fatal_not_retried,
+    scenario_streaming,
+    scenario_api_503,
+]
+
+
+def main():
+    reset_client()
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    server.stop()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
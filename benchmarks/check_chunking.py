@@ -0,0 +1,245 @@
+"""
+vérification du mode découpé (utils.chunking, ai_handler.build_summary_messages):
+frontières des segments (lignes vides, entrées horodatées, blocs de logs),
+morceaux bornés et dans l'ordre, appels map puis reduce, au plus
+CHUNK_ROUNDS tours de découpage (résumés servis par le faux serveur groq)
+
+usage: python benchmarks/check_chunking.py
+code de sortie 1 si un scénario échoue
+"""
+import asyncio
+import os
+import random
+import sys
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_groq import DEFAULT_CONTENT, FakeGroq
+
+server = FakeGroq().start()
+os.environ['GROQ_BASE_URL'] = server.url
+os.environ['GROQ_API_KEY'] = 'test'
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+from utils import ai_handler
+from utils.metrics import CACHE_LOOKUPS
+from utils.chunking import CHARS_PER_TOKEN, estimate_tokens, split_notes, split_segments
+
+LOG_BLOCK = """```
+09:12:01 ERROR sync failed
+
+09:12:05 WARN retrying
+14/05 share unreachable
+```"""
+
+
+def reset():
+    ai_handler.summary_cache.clear()
+    ai_handler.near_duplicate_index.clear()
+    ai_handler.recent_notes.clear()
+    server.reset()
+
+
+def long_notes(entries, tag):
+    """
+    notes datées assez longues pour le mode découpé, chaque entrée
+    porte un identifiant unique (tag-N) et un texte différent (rien à
+    fusionner au compactage)
+    """
+    rng = random.Random(tag)
+    subjects = ['serveur de fichiers', 'switch du 2e', 'lien vpn', 'onduleur', 'proxy', 'borne wifi']
+    actions = ['disque remplacé', 'firmware mis à jour', 'câble changé', 'service redémarré', 'règle corrigée']
+    results = ['contrôlé par AB', 'en attente de CD', 'erreur persistante', 'validé avec le client']
+    return '\n'.join(
+        f"{day % 28 + 1:02d}/05 {tag}-{day:04d} {rng.choice(subjects)}: {rng.choice(actions)}, "
+        f"{rng.choice(results)}, ticket {rng.randint(1000, 9999)}"
+        for day in range(entries)
+    )
+
+
+def map_calls():
+    return [request for request in server.requests
+            if request['messages'][0]['content'] == ai_handler.CHUNK_PROMPT]
+
+
+def scenario_segment_boundaries():
+    text = ("contexte général\nsuite du contexte\n\n"
+            "2024-05-14 panne du serveur\ndétails\n"
+            "[09:12] redémarrage\n"
+            "lundi contrôle\n"
+            "jour 2 suivi\n"
+            "j3 clôture\n\n\n"
+            "remarque finale")
+    assert split_segments(text) == [
+        "contexte général\nsuite du contexte",
+        "2024-05-14 panne du serveur\ndétails",
+        "[09:12] redémarrage",
+        "lundi contrôle",
+        "jour 2 suivi",
+        "j3 clôture",
+        "remarque finale",
+    ], split_segments(text)
+
+    # un nombre en milieu de ligne ne commence pas une entrée
+    assert split_segments("vu avec AB\n3 postes touchés") == ["vu avec AB\n3 postes touchés"]
+    assert split_segments("vu avec AB\nle 14/05 relance") == ["vu avec AB\nle 14/05 relance"]
+
+
+def scenario_log_blocks_kept_whole():
+    text = f"avant le bloc\n{LOG_BLOCK}\naprès le bloc"
+    segments = split_segments(text)
+    # lignes vides et horodatages du bloc ne le coupent pas
+    assert segments == ["avant le bloc", LOG_BLOCK, "après le bloc"], segments
+
+    # bloc jamais refermé: conservé jusqu'à la fin
+    segments = split_segments("intro\n```\nligne 1\n\nligne 2")
+    assert segments == ["intro", "```\nligne 1\n\nligne 2"], segments
+
+
+def scenario_chunks_bounded_in_order():
+    text = long_notes(300, 'evt')
+    max_tokens = 500
+    chunks = split_notes(text, max_tokens)
+    assert len(chunks) > 1, len(chunks)
+    assert all(len(chunk) <= max_tokens * CHARS_PER_TOKEN for chunk in chunks), \
+        max(len(chunk) for chunk in chunks)
+    # mêmes lignes, dans le même ordre
+    lines = [line for chunk in chunks for line in chunk.split('\n') if line]
+    assert lines == text.split('\n'), 'lignes perdues ou déplacées'
+
+    # segment plus long qu'un morceau: coupé par lignes puis aux espaces
+    word = 'x' * 40
+    oversized = ' '.join([word] * 100) + '\n' + 'y' * 250
+    chunks = split_notes(oversized, 30)
+    assert all(len(chunk) <= 90 for chunk in chunks), [len(chunk) for chunk in chunks]
+    assert ''.join(chunks).replace('\n', '').replace(' ', '') == oversized.replace('\n', '').replace(' ', '')
+
+    assert split_notes('', 100) == []
+    assert split_notes('court', 100) == ['court']
+
+
+def scenario_short_notes_single_call():
+    reset()
+    notes = "intervention courte sur le poste 12, câble réseau remplacé"
+    summary, meta = ai_handler.generate_summary_details(notes)
+    assert summary and len(server.requests) == 1, len(server.requests)
+    assert server.requests[0]['messages'][0]['content'] == ai_handler.SYSTEM_PROMPT
+
+
+def scenario_map_reduce_run():
+    reset()
+    notes = long_notes(400, 'map')
+    assert estimate_tokens(notes) > ai_handler.CHUNK_THRESHOLD_TOKENS, estimate_tokens(notes)
+    expected = split_notes(notes, ai_handler.CHUNK_TOKENS)
+
+    summary, meta = ai_handler.generate_summary_details(notes)
+    assert summary, meta
+    maps = map_calls()
+    assert len(maps) == len(expected) > 1, (len(maps), len(expected))
+    sent = sorted(request['messages'][1]['content'] for request in maps)
+    assert sent == sorted(f"Extrait {index + 1}/{len(expected)} des notes :\n\n{chunk}"
+                          for index, chunk in enumerate(expected))
+    assert all(request['max_tokens'] == ai_handler.CHUNK_MAX_TOKENS for request in maps)
+
+    # un seul appel reduce, après tous les appels map, synthèses dans l'ordre
+    reduce, = [request for request in server.requests if request not in maps]
+    assert reduce['started'] >= max(request['finished'] for request in maps)
+    assert reduce['messages'][0]['content'] == ai_handler.SYSTEM_PROMPT
+    content = reduce['messages'][1]['content']
+    positions = [content.index(f"Partie {index + 1} :") for index in range(len(expected))]
+    assert positions == sorted(positions), positions
+    print(f"        {estimate_tokens(notes)} tokens, {len(maps)} extraits, 1 appel reduce")
+
+
+def scenario_async_map_reduce():
+    reset()
+    notes = long_notes(400, 'async')
+    before = CACHE_LOOKUPS.values()
+    summary, meta = asyncio.run(ai_handler.generate_summary_details_async(notes))
+    assert summary and len(map_calls()) == len(split_notes(notes, ai_handler.CHUNK_TOKENS)), len(map_calls())
+    assert len(server.requests) == len(map_calls()) + 1, len(server.requests)
+    assert meta['compaction'] is not None, meta
+
+    # cache et notes presque identiques consultés une seule fois, même en
+    # passant par l'appel synchrone
+    after = CACHE_LOOKUPS.values()
+    counted = {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+    assert counted == {('summary', 'miss'): 1, ('near_duplicate', 'miss'): 1}, counted
+
+
+def scenario_async_preparation_errors():
+    # erreur de préparation des notes: rapport d'erreur, comme un échec groq
+    reset()
+    prepare_notes = ai_handler.prepare_notes
+
+    def failing_prepare(raw_text):
+        raise RuntimeError('compactage impossible')
+
+    ai_handler.prepare_notes = failing_prepare
+    try:
+        summary, meta = asyncio.run(ai_handler.generate_summary_details_async(long_notes(10, 'erreur')))
+    finally:
+        ai_handler.prepare_notes = prepare_notes
+    assert 'compactage impossible' in summary, summary[:200]
+    assert not server.requests, len(server.requests)
+
+
+def scenario_round_limit():
+    reset()
+    # synthèses d'un morceau entier chacune: le texte ne raccourcit jamais
+    partial = ' '.join(['constat'] * (ai_handler.CHUNK_TOKENS * CHARS_PER_TOKEN // 8 - 20))
+    assert estimate_tokens(partial) < ai_handler.CHUNK_TOKENS
+    server.defaults['content'] = partial
+    try:
+        notes = long_notes(400, 'rounds')
+        summary, meta = ai_handler.generate_summary_details(notes)
+    finally:
+        server.defaults['content'] = DEFAULT_CONTENT
+    assert summary, meta
+
+    maps = map_calls()
+    rounds = sum(1 for request in maps if request['messages'][1]['content'].startswith('Extrait 1/'))
+    assert rounds == ai_handler.CHUNK_ROUNDS, rounds
+    assert len(server.requests) == len(maps) + 1, len(server.requests)
+    # synthèses du dernier tour ramenées au budget de l'appel reduce
+    reduce = server.requests[-1]['messages'][1]['content']
+    assert reduce.startswith("Ces notes techniques"), reduce[:80]
+
+
+SCENARIOS = [
+    scenario_segment_boundaries,
+    scenario_log_blocks_kept_whole,
+    scenario_chunks_bounded_in_order,
+    scenario_short_notes_single_call,
+    scenario_map_reduce_run,
+    scenario_async_map_reduce,
+    scenario_async_preparation_errors,
+    scenario_round_limit,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    server.stop()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+budget de démarrage à froid des points d'entrée de l'api
+chaque mesure importe le point d'entrée dans un nouvel interpréteur
+(comme une instance vercel qui démarre) et chronomètre l'import seul
+
+usage:
+    python benchmarks/check_cold_import.py                 vérifier le budget
+    python benchmarks/check_cold_import.py --report        + millisecondes par module
+    python benchmarks/check_cold_import.py --budget-ms 250 --preload eager
+code de sortie 1 si la médiane dépasse le budget
+(SYNTHESIA_COLD_IMPORT_BUDGET_MS, 400 ms par défaut)
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+
+DEFAULT_BUDGET_MS = float(os.environ.get('SYNTHESIA_COLD_IMPORT_BUDGET_MS', '400'))
+
+# points d'entrée: nom -> instruction d'import exécutée depuis api/
+ENTRY_POINTS = {
+    'index': 'import index',
+    'generate-report': (
+        "import importlib.util; "
+        "spec = importlib.util.spec_from_file_location('generate_report', 'generate-report.py'); "
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))"
+    ),
+}
+
+TIMED_IMPORT = "import time; started = time.perf_counter(); {statement}; print(time.perf_counter() - started)"
+
+
+def child_env(preload):
+    env = dict(os.environ)
+    env['SYNTHESIA_PRELOAD'] = preload
+    env.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+    return env
+
+
+def measure(statement, preload):
+    """
+    durée de l'import dans un interpréteur neuf
+    return: millisecondes
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', TIMED_IMPORT.format(statement=statement)],
+        cwd=API_DIR, env=child_env(preload), capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1]) * 1000
+
+
+def import_report(statement, preload):
+    """
+    temps d'import par module (python -X importtime)
+    le préchargement en thread fausse l'imbrication des imports (niveau
+    global à l'interpréteur): il est remplacé ici par un préchargement
+    synchrone qui importe les mêmes modules
+    return: liste de tuples (module, ms propres, ms cumulées, profondeur)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=API_DIR, env=child_env('eager' if preload == 'thread' else preload),
+        capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        # "import time:  self | cumulative | <2 espaces par niveau>module"
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return modules
+
+
+def print_report(modules, top):
+    """
+    modules de premier niveau par temps cumulé puis modules les plus coûteux
+    """
+    print(f"  {'module (premier niveau)':<40} {'cumul ms':>9}")
+    roots = sorted((m for m in modules if m[3] == 0), key=lambda m: m[2], reverse=True)
+    for name, _, cumulative, _ in roots[:top]:
+        print(f"  {name:<40} {cumulative:>9.1f}")
+    print(f"  {'module (temps propre)':<40} {'propre ms':>9}")
+    for name, own, _, _ in sorted(modules, key=lambda m: m[1], reverse=True)[:top]:
+        print(f"  {name:<40} {own:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help="budget par point d'entrée")
+    parser.add_argument('--runs', type=int, default=5, help="interpréteurs lancés par mesure")
+    parser.add_argument('--preload', default=os.environ.get('SYNTHESIA_PRELOAD', 'thread'),
+                        choices=('thread', 'lazy', 'eager'), help="mode de préchargement mesuré")
+    parser.add_argument('--report', action='store_true', help="afficher le temps d'import par module")
+    parser.add_argument('--top', type=int, default=15, help="modules affichés dans le rapport")
+    args = parser.parse_args()
+
+    over_budget = []
+    print(f"préchargement: {args.preload}, budget: {args.budget_ms:.0f} ms")
+    for name, statement in ENTRY_POINTS.items():
+        timings = [measure(statement, args.preload) for _ in range(args.runs)]
+        median = statistics.median(timings)
+        status = 'ok' if median <= args.budget_ms else 'HORS BUDGET'
+        print(f"{name:<16} médiane {median:>7.1f} ms  (min {min(timings):.1f}, max {max(timings):.1f})  {status}")
+        if median > args.budget_ms:
+            over_budget.append(name)
+        if args.report:
+            print_report(import_report(statement, args.preload), args.top)
+
+    if over_budget:
+        print(f"démarrage à froid hors budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+vérification du compactage des notes (utils.compaction): lignes et blocs
+répétés fusionnés, blocs de données tronqués, texte libre intact, aucune
+ligne retirée par défaut (les journaux de plusieurs jours passent entiers
+par le mode découpé) et budget appliqué seulement en dernier recours
+(résumés servis par le faux serveur groq)
+
+usage: python benchmarks/check_compaction.py
+code de sortie 1 si un scénario échoue
+"""
+import glob
+import os
+import random
+import sys
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_groq import FakeGroq
+
+server = FakeGroq().start()
+os.environ['GROQ_BASE_URL'] = server.url
+os.environ['GROQ_API_KEY'] = 'test'
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+from utils import ai_handler, compaction
+from utils.chunking import estimate_tokens
+from utils.compaction import compact_notes, fit_budget
+
+NOTES = [open(path, encoding='utf-8').read()
+         for path in sorted(glob.glob(os.path.join(BENCH_DIR, 'corpus', 'notes', '*.txt')))]
+
+TRACE = """Traceback (most recent call last):
+  File "sync.py", line 12, in run
+    push()
+ConnectionError: share unreachable"""
+
+
+def outage_log(days=20, events_per_day=100):
+    """
+    journal de panne de plusieurs jours, chaque ligne porte un identifiant
+    unique (evt-N) et un texte différent: rien à fusionner
+    """
+    rng = random.Random(5)
+    subjects = ['serveur de fichiers', 'switch du 2e', 'lien vpn', 'contrôleur de domaine', 'onduleur',
+                'baie de stockage', 'proxy', 'borne wifi', 'passerelle sms', 'sauvegarde nocturne']
+    verbs = ['redémarré', 'contrôlé', 'remplacé', 'reconfiguré', 'surveillé', 'isolé', 'mis à jour']
+    lines = []
+    number = 0
+    for day in range(1, days + 1):
+        lines.append(f"jour {day}")
+        for _ in range(events_per_day):
+            number += 1
+            lines.append(f"evt-{number:04d} {rng.choice(subjects)} {rng.choice(verbs)} par "
+                         f"{rng.choice(['AB', 'CD', 'EF', 'GH'])}, ticket {rng.randint(1000, 9999)}, "
+                         f"{rng.choice(['ok', 'erreur persistante', 'en attente', 'à revoir'])}")
+        lines.append('')
+    return '\n'.join(lines), number
+
+
+def scenario_repeated_lines_collapsed():
+    pings = '\n'.join(f"64 bytes from 10.0.0.1: icmp_seq={n} ttl=64 time=0.{n:03d} ms" for n in range(1, 201))
+    text = f"ping du serveur\n{pings}\nfin du test\nfin du test"
+    compacted, stats = compact_notes(text)
+    lines = compacted.split('\n')
+    assert lines[0] == 'ping du serveur' and len(lines) == 3, lines
+    assert '×200' in lines[1] and 'icmp_seq=200' in lines[1], lines[1]
+    assert lines[2] == 'fin du test ×2', lines[2]
+    assert stats['collapsed_lines'] == 200 and stats['tokens_saved'] > 0, stats
+
+    # deux lignes de même gabarit mais différentes: gardées toutes les deux
+    pair = "disque 1 plein\ndisque 2 plein"
+    assert compact_notes(pair)[0] == pair
+
+
+def scenario_repeated_blocks_and_blobs():
+    text = '\n\n'.join([TRACE] * 3 + [f"empreinte {'ab' * 40}", f"pièce jointe {'QUJD' * 30}"])
+    compacted, stats = compact_notes(text)
+    assert compacted.count('ConnectionError') == 1, compacted
+    assert '(bloc ci-dessus répété ×3)' in compacted, compacted
+    assert 'abababababab…[80 caractères]' in compacted, compacted
+    assert 'QUJDQUJDQUJD…[120 caractères]' in compacted, compacted
+    assert stats['trimmed_blobs'] == 2, stats
+
+
+def scenario_free_text_untouched():
+    for note in NOTES:
+        compacted, stats = compact_notes(note)
+        assert compacted == note, note[:80]
+        assert stats['dropped_lines'] == 0, stats
+
+
+def scenario_no_lines_dropped_by_default():
+    log, events = outage_log()
+    assert estimate_tokens(log) > compaction.BUDGET_TOKENS, estimate_tokens(log)
+    compacted, stats = compact_notes(log)
+    assert stats['dropped_lines'] == 0 and compacted == log, stats
+    notes, stats = ai_handler.prepare_notes(log)
+    assert stats['dropped_lines'] == 0 and notes == ai_handler.normalize_raw_text(log), stats
+
+
+def scenario_long_log_reaches_map_reduce_whole():
+    ai_handler.summary_cache.clear()
+    server.reset()
+    log, events = outage_log()
+    summary, meta = ai_handler.generate_summary_details(log)
+    assert summary and meta['compaction']['dropped_lines'] == 0, meta
+
+    chunks = [request['messages'][1]['content'] for request in server.requests
+              if request['messages'][0]['content'] == ai_handler.CHUNK_PROMPT]
+    assert len(chunks) > 1, len(chunks)
+    sent = '\n'.join(chunks)
+    missing = [number for number in range(1, events + 1) if f"evt-{number:04d}" not in sent]
+    assert not missing, f"{len(missing)} lignes perdues (ex: evt-{missing[0]:04d})"
+    print(f"        {events} évènements, {len(chunks)} extraits, aucune ligne perdue")
+
+
+def scenario_budget_last_resort():
+    lines = [f"ligne ordinaire {n} " + 'x' * 60 for n in range(400)]
+    lines[200] = "ERREUR fatale sur le contrôleur"
+    text = '\n'.join(lines)
+    fitted, dropped = fit_budget(text, 2000)
+    assert dropped and estimate_tokens(fitted) <= 2000 + 50, (dropped, estimate_tokens(fitted))
+    assert 'ERREUR fatale' in fitted and 'ligne ordinaire 0 ' in fitted and 'ligne ordinaire 399 ' in fitted
+    assert 'lignes omises]' in fitted, fitted[:200]
+    assert fit_budget(text, 0) == (text, 0)
+
+    # appliqué au seul appel "reduce", après les tours de découpage
+    budget = compaction.BUDGET_TOKENS
+    compaction.BUDGET_TOKENS = 2000
+    try:
+        messages = ai_handler.build_reduce_messages([text])
+    finally:
+        compaction.BUDGET_TOKENS = budget
+    assert 'lignes omises]' in messages[1]['content'], messages[1]['content'][:200]
+
+
+SCENARIOS = [
+    scenario_repeated_lines_collapsed,
+    scenario_repeated_blocks_and_blobs,
+    scenario_free_text_untouched,
+    scenario_no_lines_dropped_by_default,
+    scenario_long_log_reaches_map_reduce_whole,
+    scenario_budget_last_resort,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    server.stop()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
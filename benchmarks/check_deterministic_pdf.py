@@ -0,0 +1,145 @@
+"""
+vérification du rendu déterministe des pdf (utils.pdf_generator):
+mêmes entrées et même date -> mêmes octets, identifiant /ID propre à
+chaque document, cache des pdf rendus, etag fort et réponses 304 de
+l'api flask et du handler vercel (résumés servis par le faux serveur groq)
+
+usage: python benchmarks/check_deterministic_pdf.py
+code de sortie 1 si un scénario échoue
+"""
+import importlib.util
+import json
+import os
+import re
+import sys
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_groq import FakeGroq
+
+server = FakeGroq().start()
+os.environ['GROQ_BASE_URL'] = server.url
+os.environ['GROQ_API_KEY'] = 'test'
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+from utils import pdf_generator
+from utils.pdf_generator import render_pdf, render_report, parse_generated_at
+
+CONTENT = "CONTEXTE\nImprimante hors ligne.\n\nACTIONS\n- redémarrage du spouleur\n- **pilote** réinstallé"
+GENERATED_AT = '2026-01-02T03:04:05+01:00'
+REPORT = {
+    'title': 'Intervention',
+    'raw_data': 'notes de test pour le rendu deterministe',
+    'author': 'Camille',
+    'role': 'Technicien',
+    'generated_at': GENERATED_AT,
+}
+
+
+def render(content=CONTENT, generated_at=GENERATED_AT):
+    return bytes(render_pdf('Intervention', content, 'Camille', 'Technicien',
+                            generated_at=parse_generated_at(generated_at)))
+
+
+def document_id(pdf):
+    return re.search(rb'/ID\s*\[<([0-9a-f]+)>', pdf).group(1)
+
+
+def scenario_same_inputs_same_bytes():
+    assert render() == render(), "deux rendus identiques diffèrent"
+
+
+def scenario_distinct_document_ids():
+    first, second = render(), render(content=CONTENT + "\n- contrôle final")
+    assert document_id(first) != document_id(second), "même /ID pour deux documents"
+    assert document_id(first) == document_id(render()), "/ID non reproductible"
+
+
+def scenario_dates_from_request():
+    pdf = render(generated_at='2026-01-02T03:04:05+01:00')
+    assert b"(D:20260102030405+01'00')" in pdf, re.findall(rb'CreationDate[^/]*', pdf)
+    assert render(generated_at='2026-01-02T03:04:06+01:00') != pdf, "la date n'entre pas dans le rendu"
+
+
+def scenario_render_cache():
+    pdf_generator.pdf_cache.clear()
+    generated_at = parse_generated_at(GENERATED_AT)
+    first, etag = render_report('Intervention', CONTENT, 'Camille', 'Technicien', generated_at=generated_at)
+    second, same_etag = render_report('Intervention', CONTENT, 'Camille', 'Technicien', generated_at=generated_at)
+    assert etag == same_etag and second is first, "pdf rendu deux fois"
+    assert bytes(first) == render(), "le pdf en cache diffère du rendu direct"
+
+
+def scenario_flask_etag_304():
+    import index
+    client = index.app.test_client()
+    response = client.post('/api/generate-report', json=REPORT)
+    assert response.status_code == 200, response.status_code
+    etag = response.headers.get('ETag')
+    assert etag and not etag.startswith('W/'), etag
+    assert 'immutable' in response.headers.get('Cache-Control', ''), dict(response.headers)
+
+    again = client.post('/api/generate-report', json=REPORT)
+    assert again.data == response.data, "deux réponses identiques diffèrent"
+
+    cached = client.post('/api/generate-report', json=REPORT, headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and not cached.data, cached.status_code
+    assert cached.headers.get('ETag') == etag, dict(cached.headers)
+
+    changed = client.post('/api/generate-report', json={**REPORT, 'title': 'Autre'},
+                          headers={'If-None-Match': etag})
+    assert changed.status_code == 200, changed.status_code
+
+    invalid = client.post('/api/generate-report', json={**REPORT, 'generated_at': 'hier'})
+    assert invalid.status_code == 400, invalid.status_code
+
+
+def scenario_vercel_etag_304():
+    spec = importlib.util.spec_from_file_location('generate_report', os.path.join(API_DIR, 'generate-report.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    request = {'method': 'POST', 'body': json.dumps(REPORT), 'headers': {}}
+
+    response = module.handler(request)
+    assert response['statusCode'] == 200, response['statusCode']
+    etag = response['headers']['ETag']
+
+    cached = module.handler({**request, 'headers': {'If-None-Match': etag}})
+    assert cached['statusCode'] == 304 and not cached['body'], cached['statusCode']
+    assert cached['headers']['ETag'] == etag, cached['headers']
+
+
+SCENARIOS = [
+    scenario_same_inputs_same_bytes,
+    scenario_distinct_document_ids,
+    scenario_dates_from_request,
+    scenario_render_cache,
+    scenario_flask_etag_304,
+    scenario_vercel_etag_304,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+vérification des jobs de génération en tâche de fond (utils.jobs, /api/jobs):
+soumission, suivi, téléchargement du pdf, callbacks de succès et d'échec
+reçus par un serveur http local, urls de callback internes refusées,
+redirections non suivies, expiration et jobs interrompus
+(résumés servis par le faux serveur groq)
+
+usage: python benchmarks/check_jobs.py
+code de sortie 1 si un scénario échoue
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_groq import FakeGroq
+
+WORK_DIR = tempfile.mkdtemp(prefix='synthesia_jobs_')
+server = FakeGroq().start()
+os.environ['GROQ_BASE_URL'] = server.url
+os.environ['GROQ_API_KEY'] = 'test'
+os.environ['SYNTHESIA_JOBS_DB'] = os.path.join(WORK_DIR, 'jobs.sqlite3')
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+import index
+from utils import jobs
+
+# délai maximal d'un job (secondes)
+JOB_TIMEOUT = 30
+
+client = index.app.test_client()
+
+
+class CallbackStub:
+    """
+    serveur http local qui enregistre les callbacks reçus
+    /redirect renvoie une redirection vers /hidden
+    """
+
+    def __init__(self):
+        stub = self
+        self.received = []
+        self.event = threading.Condition()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                with stub.event:
+                    stub.received.append((self.path, json.loads(body or b'null')))
+                    stub.event.notify_all()
+                if self.path == '/redirect':
+                    self.send_response(307)
+                    self.send_header('Location', '/hidden')
+                else:
+                    self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self._server.server_address[1]}{path}"
+
+    def wait(self, count, timeout=JOB_TIMEOUT):
+        with self.event:
+            self.event.wait_for(lambda: len(self.received) >= count, timeout)
+            return list(self.received)
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+stub = CallbackStub()
+
+
+def submit(**fields):
+    body = {'title': 'Job', 'raw_data': f'notes du job {time.time_ns()}', **fields}
+    response = client.post('/api/jobs', json=body)
+    return response
+
+
+def wait_job(job_id):
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while time.monotonic() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'error'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} non terminé")
+
+
+def allow_stub():
+    jobs.CALLBACK_HOSTS = {'127.0.0.1'}
+
+
+def scenario_submit_poll_download():
+    response = submit()
+    assert response.status_code == 202, response.status_code
+    job_id = response.get_json()['id']
+    assert client.get(f'/api/jobs/{job_id}/pdf').status_code in (200, 409)
+
+    job = wait_job(job_id)
+    assert job['status'] == 'done', job
+    assert set(job['progress']) == set(jobs.STAGES), job['progress']
+    pdf = client.get(job['pdf_url'])
+    assert pdf.status_code == 200 and pdf.data.startswith(b'%PDF'), pdf.status_code
+    assert client.get('/api/jobs/inconnu').status_code == 404
+
+
+def scenario_success_callback():
+    allow_stub()
+    stub.received.clear()
+    job_id = submit(callback_url=stub.url('/done')).get_json()['id']
+    (path, job), = stub.wait(1)
+    assert path == '/done' and job['id'] == job_id, (path, job)
+    assert job['status'] == 'done' and job['pdf_url'], job
+
+
+def scenario_failure_callback():
+    allow_stub()
+    stub.received.clear()
+    server.defaults['status'] = 503
+    try:
+        job_id = submit(callback_url=stub.url('/failed')).get_json()['id']
+        (path, job), = stub.wait(1)
+    finally:
+        server.defaults['status'] = 200
+    assert job['id'] == job_id and job['status'] == 'error', job
+    assert 'GroqUnavailable' in job['error'] or 'Circuit' in job['error'], job['error']
+    assert job['pdf_url'] is None, job
+
+
+def scenario_internal_callbacks_rejected():
+    jobs.CALLBACK_HOSTS = set()
+    for url in ('http://127.0.0.1:9/', 'http://localhost/hook', 'http://169.254.169.254/latest/meta-data',
+                'http://10.0.0.5/', 'http://[::1]/', 'ftp://example.com/', 'http:///'):
+        response = submit(callback_url=url)
+        assert response.status_code == 400, (url, response.status_code)
+    assert submit(callback_url=['http://example.com']).status_code == 400
+
+    # hôte hors de la liste autorisée
+    jobs.CALLBACK_HOSTS = {'hooks.example.com'}
+    assert submit(callback_url=stub.url('/done')).status_code == 400
+
+    # une url acceptée à la soumission est vérifiée à nouveau à l'envoi
+    stub.received.clear()
+    jobs.CALLBACK_HOSTS = set()
+    jobs.notify_callback(stub.url('/late'), {'id': 'x'})
+    assert not stub.received, stub.received
+
+
+def scenario_redirect_not_followed():
+    allow_stub()
+    stub.received.clear()
+    jobs.notify_callback(stub.url('/redirect'), {'id': 'x'})
+    time.sleep(0.2)
+    assert [path for path, _ in stub.received] == ['/redirect'], stub.received
+
+
+def scenario_expiry_and_interrupted():
+    finished = wait_job(submit().get_json()['id'])
+    with jobs._db() as connection:
+        # job resté "summarizing" après l'arrêt d'un processus
+        connection.execute(
+            "INSERT INTO jobs (id, status, progress, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            ('interrompu', 'summarizing', '{}', '{}', time.time() - 3600, time.time() - 3600)
+        )
+        expired, interrupted = jobs.cleanup_jobs(connection)
+    assert interrupted == 1 and expired == 0, (expired, interrupted)
+    job = client.get('/api/jobs/interrompu').get_json()
+    assert job['status'] == 'error' and 'Interrupted' in job['error'], job
+
+    with jobs._db() as connection:
+        jobs.cleanup_jobs(connection, now=time.time() + jobs.JOB_TTL + 1)
+    assert client.get(f"/api/jobs/{finished['id']}").status_code == 404
+    assert client.get(f"/api/jobs/{finished['id']}/pdf").status_code == 404
+
+
+SCENARIOS = [
+    scenario_submit_poll_download,
+    scenario_success_callback,
+    scenario_internal_callbacks_rejected,
+    scenario_redirect_not_followed,
+    scenario_expiry_and_interrupted,
+    scenario_failure_callback,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    stub.stop()
+    server.stop()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+vérification de la reprise des rapports de notes presque identiques
+(utils.similarity, utils.ai_handler): voisins trouvés, notes différentes
+ignorées, prompt d'adaptation court même à empreinte identique,
+réutilisation sans appel groq seulement sur option et recherche en moins d'une milliseconde dans un index de 100 000 notes
+(résumés servis par le faux serveur groq)
+
+usage: python benchmarks/check_near_duplicates.py
+code de sortie 1 si un scénario échoue
+"""
+import asyncio
+import glob
+import os
+import random
+import sys
+import time
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_groq import FakeGroq
+
+server = FakeGroq().start()
+os.environ['GROQ_BASE_URL'] = server.url
+os.environ['GROQ_API_KEY'] = 'test'
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+from utils import ai_handler
+from utils.similarity import SimHashIndex, simhash, distance
+
+NOTES = [open(path, encoding='utf-8').read()
+         for path in sorted(glob.glob(os.path.join(BENCH_DIR, 'corpus', 'notes', '*.txt')))]
+PRINTER = NOTES[0]
+# même intervention à un autre étage, pour un autre service
+PRINTER_ELSEWHERE = PRINTER.replace('bat B 2e', 'bat C 4e').replace('compta', 'RH')
+
+# recherche dans un index plein (secondes)
+LOOKUP_BUDGET = 0.001
+
+
+def reset():
+    ai_handler.summary_cache.clear()
+    ai_handler.near_duplicate_index.clear()
+    ai_handler.recent_notes.clear()
+    server.reset()
+
+
+def index_distance():
+    return ai_handler.near_duplicate_index.max_distance
+
+
+def system_prompts():
+    return [request['messages'][0]['content'] for request in server.requests]
+
+
+def scenario_fingerprints():
+    base = simhash(PRINTER)
+    elsewhere = distance(base, simhash(PRINTER_ELSEWHERE))
+    assert elsewhere <= index_distance(), elsewhere
+    for other in NOTES[1:]:
+        assert distance(base, simhash(other)) > 12, distance(base, simhash(other))
+
+
+def scenario_edit_prompt():
+    reset()
+    ai_handler.generate_summary_details(PRINTER)
+    summary, meta = ai_handler.generate_summary_details(PRINTER_ELSEWHERE)
+    assert summary and not meta['cached'], meta
+    assert meta['near_duplicate'] and meta['near_duplicate'] >= ai_handler.NEAR_DUPLICATE_THRESHOLD, meta
+    prompts = system_prompts()
+    assert prompts == [ai_handler.SYSTEM_PROMPT, ai_handler.EDIT_PROMPT], prompts
+
+    # seules les lignes modifiées sont envoyées, avec le rapport existant
+    request = server.requests[1]['messages'][1]['content']
+    assert 'bat C 4e' in request and 'firmware' not in request, request
+    assert len(request) < len(summary) + len(PRINTER), len(request)
+
+
+def scenario_unrelated_notes():
+    reset()
+    ai_handler.generate_summary_details(PRINTER)
+    _, meta = ai_handler.generate_summary_details(NOTES[1])
+    assert meta['near_duplicate'] is None, meta
+    assert system_prompts() == [ai_handler.SYSTEM_PROMPT] * 2, system_prompts()
+
+
+def scenario_same_fingerprint_not_reused():
+    reset()
+    ai_handler.generate_summary_details(PRINTER)
+    # même texte à la casse près: même empreinte, mais pas de reprise par défaut
+    _, meta = ai_handler.generate_summary_details(PRINTER.upper())
+    assert not meta['cached'] and meta['near_duplicate'] == 1.0, meta
+    assert system_prompts() == [ai_handler.SYSTEM_PROMPT, ai_handler.EDIT_PROMPT], system_prompts()
+
+
+def scenario_long_note_one_word_edit():
+    # un seul mot changé dans une longue note: l'empreinte peut ne pas bouger,
+    # le rapport doit pourtant être adapté (nouvel utilisateur)
+    reset()
+    rng = random.Random(3)
+    words = [rng.choice(['poste', 'imprimante', 'pilote', 'reseau', 'service', 'redemarrage', 'badge',
+                         'serveur', 'sauvegarde', 'licence', 'ecran', 'session']) for _ in range(400)]
+    lines = [' '.join(words[start:start + 12]) for start in range(0, len(words), 12)]
+    lines[5] += ' utilisateur jdupont'
+    note = '\n'.join(lines)
+    edited = note.replace('jdupont', 'mmartin')
+
+    ai_handler.generate_summary_details(note)
+    summary, meta = ai_handler.generate_summary_details(edited)
+    assert not meta['cached'], meta
+    assert len(server.requests) == 2, len(server.requests)
+    request = server.requests[1]['messages'][1]['content']
+    assert server.requests[1]['messages'][0]['content'] == ai_handler.EDIT_PROMPT
+    assert 'mmartin' in request and '-' in request, request
+    print(f"        distance des empreintes: {distance(simhash(note), simhash(edited))} bits")
+
+
+def scenario_reuse_opt_in():
+    reset()
+    ai_handler.generate_summary_details(PRINTER)
+    threshold = ai_handler.NEAR_DUPLICATE_REUSE_THRESHOLD
+    ai_handler.NEAR_DUPLICATE_REUSE_THRESHOLD = 1.0
+    try:
+        summary, meta = ai_handler.generate_summary_details(PRINTER.upper())
+    finally:
+        ai_handler.NEAR_DUPLICATE_REUSE_THRESHOLD = threshold
+    assert meta['cached'] and meta['near_duplicate'] == 1.0, meta
+    assert len(server.requests) == 1, len(server.requests)
+    # le résumé repris est en cache sous la nouvelle clé
+    assert ai_handler.summary_cache.get(ai_handler.summary_cache_key(PRINTER.upper())) == summary
+
+
+def scenario_async_edit_prompt():
+    reset()
+    asyncio.run(ai_handler.generate_summary_details_async(PRINTER))
+    _, meta = asyncio.run(ai_handler.generate_summary_details_async(PRINTER_ELSEWHERE))
+    assert meta['near_duplicate'], meta
+    assert system_prompts() == [ai_handler.SYSTEM_PROMPT, ai_handler.EDIT_PROMPT], system_prompts()
+
+
+def scenario_evicted_summary_ignored():
+    reset()
+    ai_handler.generate_summary_details(PRINTER)
+    ai_handler.summary_cache.clear()
+    _, meta = ai_handler.generate_summary_details(PRINTER_ELSEWHERE)
+    assert meta['near_duplicate'] is None, meta
+
+
+def scenario_lookup_100k():
+    rng = random.Random(7)
+    index = SimHashIndex(max_size=100000, max_distance=index_distance())
+    fingerprints = [rng.getrandbits(64) for _ in range(100000)]
+    for position, fingerprint in enumerate(fingerprints):
+        index.add(fingerprint, position)
+
+    durations = []
+    for _ in range(2000):
+        target = rng.choice(fingerprints)
+        query = target
+        for bit in rng.sample(range(64), rng.randint(1, index_distance())):
+            query ^= 1 << bit
+        started = time.perf_counter()
+        match = index.nearest(query)
+        durations.append(time.perf_counter() - started)
+        assert match is not None and distance(match[0], query) <= distance(target, query), "voisin manqué"
+
+    durations.sort()
+    p99 = durations[int(len(durations) * 0.99)]
+    assert p99 < LOOKUP_BUDGET, f"p99 {p99 * 1e6:.0f} µs"
+    print(f"        recherche p50 {durations[len(durations) // 2] * 1e6:.0f} µs, p99 {p99 * 1e6:.0f} µs")
+
+
+SCENARIOS = [
+    scenario_fingerprints,
+    scenario_edit_prompt,
+    scenario_unrelated_notes,
+    scenario_same_fingerprint_not_reused,
+    scenario_long_note_one_word_edit,
+    scenario_reuse_opt_in,
+    scenario_async_edit_prompt,
+    scenario_evicted_summary_ignored,
+    scenario_lookup_100k,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    server.stop()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+taille des pdf produits par profil de sortie (utils.pdf_generator.PROFILES),
+comparée à des références enregistrées (benchmarks/pdf_sizes.json)
+
+les rapports de 1, 5 et 50 pages du benchmark (bench_pipeline) sont rendus
+avec une date fixe: leur taille est reproductible à versions de reportlab,
+pillow et zlib égales. le logo du dépôt étant vide, un logo de test
+(1200x1200 px, transparence) est généré pour mesurer son intégration
+
+usage:
+    python benchmarks/check_pdf_size.py              comparer aux références
+    python benchmarks/check_pdf_size.py --update     enregistrer les références
+code de sortie 1 si un pdf dépasse sa référence de plus de la tolérance
+(SYNTHESIA_PDF_SIZE_TOLERANCE, 2 % par défaut), si le profil compact
+n'est pas plus petit que le profil standard ou si l'encodage ascii85 du
+profil compact déborde sur le profil standard ou sur reportlab
+"""
+import argparse
+import base64
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from bench_pipeline import PAGE_SIZES, count_pages, load_corpus, report_content
+
+import PIL
+import reportlab
+import zlib
+
+from utils import pdf_generator
+from reportlab import rl_config
+from utils.pdf_generator import PROFILES, get_logo, parse_generated_at, render_pdf
+
+SIZES_PATH = os.path.join(BENCH_DIR, 'pdf_sizes.json')
+DEFAULT_TOLERANCE = float(os.environ.get('SYNTHESIA_PDF_SIZE_TOLERANCE', '0.02'))
+GENERATED_AT = '2026-01-02T03:04:05+01:00'
+
+IMAGE_WIDTH_PATTERN = re.compile(rb'/Subtype /Image.*?/Width (\d+)', re.S)
+
+
+def versions():
+    return {
+        'reportlab': reportlab.Version,
+        'pillow': PIL.__version__,
+        'zlib': zlib.ZLIB_RUNTIME_VERSION,
+    }
+
+
+def write_test_logo(path):
+    """
+    logo de test déterministe: dégradé, formes et transparence
+    """
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(42)
+    image = Image.new('RGBA', (1200, 1200), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for step in range(0, 600, 4):
+        draw.ellipse([step, step, 1200 - step, 1200 - step],
+                     fill=(20 + step // 4, 60, 200 - step // 4, 255))
+    for _ in range(200):
+        x, y = rng.randrange(1200), rng.randrange(1200)
+        draw.line([x, y, x + rng.randrange(-80, 80), y + rng.randrange(-80, 80)],
+                  fill=(255, 255, 255, rng.randrange(64, 255)), width=3)
+    image.save(path)
+
+
+@contextlib.contextmanager
+def test_logo():
+    """
+    le générateur utilise le logo de test le temps des mesures
+    """
+    original = pdf_generator.LOGO_CANDIDATES
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'logo.png')
+        write_test_logo(path)
+        pdf_generator.LOGO_CANDIDATES = (path,)
+        get_logo.cache_clear()
+        try:
+            yield
+        finally:
+            pdf_generator.LOGO_CANDIDATES = original
+            get_logo.cache_clear()
+
+
+def measure_sizes(corpus):
+    """
+    return: dictionnaire cas -> {bytes, base64_bytes, pages, logo_width}
+    """
+    generated_at = parse_generated_at(GENERATED_AT)
+    results = {}
+    for profile in PROFILES:
+        for pages, lines in PAGE_SIZES.items():
+            pdf = bytes(render_pdf('Rapport', report_content(corpus, lines), 'A', 'B',
+                                   generated_at=generated_at, profile=profile))
+            widths = [int(width) for width in IMAGE_WIDTH_PATTERN.findall(pdf)]
+            results[f'{profile}_{pages}p'] = {
+                'bytes': len(pdf),
+                'base64_bytes': len(base64.b64encode(pdf)),
+                'pages': count_pages(pdf),
+                'logo_width': max(widths, default=0),
+                'ascii85': b'/ASCII85Decode' in pdf,
+            }
+    return results
+
+
+def load_references(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--update', action='store_true', help="enregistrer les tailles comme références")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="augmentation tolérée (0.02 = 2 %%)")
+    parser.add_argument('--sizes', default=SIZES_PATH, help="fichier des références")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    ascii85_default = rl_config.useA85
+    references = load_references(args.sizes)
+    reference = (references or {}).get('cases', {})
+    if references and references.get('versions') != versions() and not args.update:
+        print(f"attention: références mesurées avec d'autres versions ({references.get('versions')})")
+
+    # les utilitaires écrivent leurs logs sur stdout: ignorés pendant les rendus
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), test_logo():
+        results = measure_sizes(corpus)
+
+    failures = []
+    # réglage ascii85 propre au rendu compact: reportlab garde le sien
+    if rl_config.useA85 != ascii85_default:
+        failures.append('rl_config.useA85 modifié')
+    print(f"{'cas':<16} {'référence ko':>13} {'taille ko':>10} {'base64 ko':>10} {'logo px':>8} {'écart':>8}")
+    for name, result in results.items():
+        size = result['bytes']
+        baseline = reference.get(name, {}).get('bytes')
+        if baseline is None:
+            change, status = '', '  nouveau'
+        else:
+            change = f"{size / baseline - 1:>+8.1%}"
+            status = ''
+            if size > baseline * (1 + args.tolerance):
+                failures.append(name)
+                status = '  RÉGRESSION'
+        print(f"{name:<16} {(baseline or 0) / 1024:>13.1f} {size / 1024:>10.1f} "
+              f"{result['base64_bytes'] / 1024:>10.1f} {result['logo_width']:>8} {change:>8}{status}")
+
+    for pages in PAGE_SIZES:
+        compact, standard = results[f'compact_{pages}p'], results[f'standard_{pages}p']
+        if compact['bytes'] >= standard['bytes']:
+            failures.append(f'compact_{pages}p >= standard_{pages}p')
+        if compact['ascii85']:
+            failures.append(f'compact_{pages}p ascii85')
+        if standard['ascii85'] != bool(ascii85_default):
+            failures.append(f'standard_{pages}p ascii85')
+        if compact['pages'] != pages:
+            print(f"attention: le rapport compact de {pages} pages en fait {compact['pages']}")
+
+    if args.update:
+        with open(args.sizes, 'w', encoding='utf-8') as f:
+            json.dump({'versions': versions(), 'cases': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"références enregistrées: {args.sizes}")
+        return 0
+
+    if failures:
+        print(f"ÉCHEC   {len(failures)} écart(s): {', '.join(failures)}")
+        return 1
+    print(f"ok      tailles dans la tolérance de {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+vérification du limiteur de débit groq (utils.rate_limiter): seaux
+requêtes/minute et tokens/minute, attente bornée, partage de l'état entre
+processus, retry-after et concurrence adaptative (aimd), puis de bout en
+bout avec la politique d'appel contre le faux serveur groq
+
+usage: python benchmarks/check_rate_limiter.py
+code de sortie 1 si un scénario échoue
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from utils.rate_limiter import RateLimiter, RateLimitTimeout
+
+WORK_DIR = tempfile.mkdtemp(prefix='synthesia_ratelimit_')
+
+
+def new_limiter(name, rpm=600, tpm=1_000_000, concurrency=8):
+    return RateLimiter(os.path.join(WORK_DIR, f'{name}.sqlite3'), rpm, tpm, concurrency)
+
+
+def scenario_requests_per_minute():
+    # 60 req/min: seau de 60, puis une requête par seconde
+    limiter = new_limiter('rpm', rpm=60)
+    for _ in range(60):
+        limiter.release(limiter.acquire(1, max_wait=0))
+    started = time.monotonic()
+    limiter.release(limiter.acquire(1, max_wait=2))
+    waited = time.monotonic() - started
+    assert 0.5 < waited < 1.2, f"attente {waited:.2f}s au lieu de ~1s"
+
+
+def scenario_tokens_per_minute():
+    # 6000 tokens/min: 100 tokens/s
+    limiter = new_limiter('tpm', tpm=6000)
+    limiter.release(limiter.acquire(6000, max_wait=0))
+    started = time.monotonic()
+    limiter.release(limiter.acquire(50, max_wait=2))
+    waited = time.monotonic() - started
+    assert 0.3 < waited < 1.0, f"attente {waited:.2f}s au lieu de ~0.5s"
+
+
+def scenario_actual_usage_refunds_tokens():
+    limiter = new_limiter('usage', tpm=6000)
+    # estimation pessimiste rendue par la consommation réelle
+    limiter.release(limiter.acquire(6000, max_wait=0), used_tokens=100)
+    limiter.release(limiter.acquire(5000, max_wait=0))
+
+
+def scenario_bounded_wait():
+    limiter = new_limiter('bounded', rpm=60)
+    for _ in range(60):
+        limiter.release(limiter.acquire(1, max_wait=0))
+    started = time.monotonic()
+    try:
+        limiter.acquire(1, max_wait=0.2)
+        raise AssertionError("RateLimitTimeout attendu")
+    except RateLimitTimeout as e:
+        assert e.retry_after > 0
+    assert time.monotonic() - started < 0.3, "l'attente doit rester bornée"
+
+
+def scenario_concurrency_limit():
+    limiter = new_limiter('concurrency', concurrency=2)
+    leases = [limiter.acquire(1, max_wait=0), limiter.acquire(1, max_wait=0)]
+    try:
+        limiter.acquire(1, max_wait=0.1)
+        raise AssertionError("la troisième place ne doit pas être accordée")
+    except RateLimitTimeout:
+        pass
+    limiter.release(leases.pop())
+    leases.append(limiter.acquire(1, max_wait=0.1))
+    for lease in leases:
+        limiter.release(lease)
+
+
+def scenario_retry_after_and_aimd():
+    limiter = new_limiter('aimd', concurrency=8)
+    limiter.release(limiter.acquire(1, max_wait=0), success=False, rate_limited=True, retry_after=0.5)
+    snapshot = limiter.snapshot()
+    assert snapshot['concurrency'] == 4, snapshot
+    assert snapshot['blocked_for'] > 0.3, snapshot
+
+    started = time.monotonic()
+    lease = limiter.acquire(1, max_wait=2)
+    waited = time.monotonic() - started
+    assert waited >= 0.4, f"retry-after ignoré ({waited:.2f}s)"
+
+    # augmentation additive (+1/concurrence par succès): 5 succès -> 5
+    limiter.release(lease)
+    for _ in range(4):
+        limiter.release(limiter.acquire(1, max_wait=0))
+    assert limiter.snapshot()['concurrency'] == 5, limiter.snapshot()
+
+
+def _worker(path, count, results):
+    limiter = RateLimiter(path, 10, 1_000_000, 8)
+    granted = 0
+    for _ in range(count):
+        try:
+            limiter.release(limiter.acquire(1, max_wait=0))
+            granted += 1
+        except RateLimitTimeout:
+            pass
+    results.put(granted)
+
+
+def scenario_shared_between_processes():
+    # 10 req/min partagées par 4 processus qui en demandent 8 chacun
+    path = os.path.join(WORK_DIR, 'shared.sqlite3')
+    new_limiter('shared', rpm=10)._connect().close()
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_worker, args=(path, 8, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    granted = sum(results.get() for _ in workers)
+    assert granted == 10, f"{granted} requêtes accordées au lieu de 10"
+
+
+def scenario_policy_with_fake_groq():
+    from fake_groq import FakeGroq
+
+    server = FakeGroq().start()
+    os.environ['GROQ_BASE_URL'] = server.url
+    try:
+        from utils import call_policy, rate_limiter
+        from utils.groq_client import get_client, reset_client
+
+        reset_client()
+        call_policy.reset_policy()
+        call_policy.BACKOFF_BASE = 0.01
+        rate_limiter.ENABLED = True
+        rate_limiter.DB_PATH = os.path.join(WORK_DIR, 'policy.sqlite3')
+        rate_limiter._limiter = None
+
+        # 429 avec retry-after: le limiteur bloque les appels suivants
+        server.script([{'status': 429, 'retry_after': 1}])
+        started = time.monotonic()
+        call_policy.create_completion(get_client('test'), 'llama-3.3-70b-versatile',
+                                      messages=[{'role': 'user', 'content': 'notes'}], max_tokens=10)
+        assert time.monotonic() - started >= 1.0
+        assert rate_limiter.get_limiter().snapshot()['concurrency'] < rate_limiter.MAX_CONCURRENCY
+
+        # quota épuisé: échec après l'attente bornée, sans requête envoyée
+        rate_limiter._limiter = RateLimiter(os.path.join(WORK_DIR, 'policy_empty.sqlite3'), 1, 1_000_000, 8)
+        call_policy.create_completion(get_client('test'), 'llama-3.3-70b-versatile',
+                                      messages=[{'role': 'user', 'content': 'notes'}], max_tokens=10)
+        sent = len(server.requests)
+        call_policy.MAX_QUEUE_WAIT = 0.2
+        try:
+            call_policy.create_completion(get_client('test'), 'llama-3.3-70b-versatile',
+                                          messages=[{'role': 'user', 'content': 'notes'}], max_tokens=10)
+            raise AssertionError("QuotaExhaustedError attendu")
+        except call_policy.QuotaExhaustedError:
+            pass
+        assert len(server.requests) == sent, "aucune requête ne doit partir au-delà du quota"
+    finally:
+        server.stop()
+
+
+SCENARIOS = [
+    scenario_requests_per_minute,
+    scenario_tokens_per_minute,
+    scenario_actual_usage_refunds_tokens,
+    scenario_bounded_wait,
+    scenario_concurrency_limit,
+    scenario_retry_after_and_aimd,
+    scenario_shared_between_processes,
+    scenario_policy_with_fake_groq,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+vérification du pool de rendu (utils.render_pool): pdf identique au rendu
+dans le processus, reprise après l'arrêt brutal d'un worker, délai par
+rendu, file bornée et réponse 503 de l'api
+
+usage: python benchmarks/check_render_pool.py
+code de sortie 1 si un scénario échoue
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ['SYNTHESIA_RENDER_WORKERS'] = '2'
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+from utils import render_pool
+from utils.metrics import RENDER_POOL_EVENTS
+from utils.pdf_generator import render_pdf, parse_generated_at
+from utils.render_pool import RenderUnavailableError
+
+GENERATED_AT = parse_generated_at('2026-01-02T03:04:05+01:00')
+CONTENT = "CONTEXTE\nPoste lent au démarrage.\n\nACTIONS\n- nettoyage du démarrage\n- mise à jour du pilote"
+
+# réglages de référence, restaurés avant chaque scénario
+BASELINE = {
+    'QUEUE_SIZE': 8,
+    'QUEUE_TIMEOUT': 5.0,
+    'RENDER_TIMEOUT': 60.0,
+}
+
+
+def setup(**overrides):
+    for name, value in {**BASELINE, **overrides}.items():
+        setattr(render_pool, name, value)
+
+
+def long_content(lines):
+    return '\n'.join(f"- ligne {index} du rapport de test, assez longue pour remplir la page" for index in range(lines))
+
+
+def render(content=CONTENT):
+    return render_pool.render('Rapport', content, 'A', 'B', generated_at=GENERATED_AT)
+
+
+def events(event):
+    return RENDER_POOL_EVENTS.values().get((event,), 0)
+
+
+def scenario_same_bytes_as_inline():
+    setup()
+    pooled = render()
+    inline = render_pdf('Rapport', CONTENT, 'A', 'B', generated_at=GENERATED_AT)
+    assert pooled.tobytes() == inline.tobytes(), "le pool produit un autre pdf"
+
+
+def scenario_worker_crash_recovered():
+    setup()
+    crashes, restarts = events('crash'), events('restart')
+    render()
+    # arrêt brutal d'un worker: le pool est cassé pour les rendus suivants
+    render_pool._get_pool().submit(os._exit, 1)
+    time.sleep(0.5)
+    assert render().nbytes > 0, "pdf vide après reprise"
+    assert events('crash') == crashes + 1, RENDER_POOL_EVENTS.values()
+    assert events('restart') == restarts + 1, RENDER_POOL_EVENTS.values()
+
+
+def scenario_render_timeout():
+    setup(RENDER_TIMEOUT=0.2)
+    started = time.monotonic()
+    try:
+        render(long_content(6000))
+    except RenderUnavailableError as e:
+        assert 'exceeded' in str(e), str(e)
+    else:
+        raise AssertionError("rendu hors délai accepté")
+    assert time.monotonic() - started < 5, "délai non appliqué"
+
+    # le pool est recréé: les rendus suivants fonctionnent
+    setup()
+    assert render().nbytes > 0, "pdf vide après le délai dépassé"
+
+
+def scenario_bounded_queue():
+    setup(QUEUE_SIZE=1, QUEUE_TIMEOUT=0.1)
+    results = []
+
+    def worker():
+        try:
+            render(long_content(1500))
+            results.append('ok')
+        except RenderUnavailableError as e:
+            results.append(e.retry_after)
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count('ok') >= render_pool.WORKERS, results
+    assert 1 in results, f"aucun rendu refusé: {results}"
+
+
+def scenario_api_503():
+    setup(QUEUE_SIZE=0)
+    import index
+    # toutes les places occupées, aucune attente autorisée
+    running = render_pool._running
+    held = [running.acquire(blocking=False) for _ in range(render_pool.WORKERS)]
+    try:
+        from utils import ai_handler
+        original = ai_handler.generate_summary_details
+        ai_handler.generate_summary_details = lambda raw_text: (CONTENT, {'cached': False})
+        try:
+            response = index.app.test_client().post('/api/generate-report', json={
+                'title': 'Test', 'raw_data': f'notes {time.time()}'
+            })
+        finally:
+            ai_handler.generate_summary_details = original
+    finally:
+        for acquired in held:
+            if acquired:
+                running.release()
+    assert response.status_code == 503, response.status_code
+    assert response.headers.get('Retry-After') == '1', dict(response.headers)
+
+
+SCENARIOS = [
+    scenario_same_bytes_as_inline,
+    scenario_worker_crash_recovered,
+    scenario_render_timeout,
+    scenario_bounded_queue,
+    scenario_api_503,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    render_pool.reset_pool()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
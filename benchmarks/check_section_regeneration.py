@@ -0,0 +1,221 @@
+"""
+vérification de la régénération d'une seule section d'un rapport
+(utils.sections, ai_handler.regenerate_section, POST /api/reports/<id>/sections):
+seule la section demandée est réécrite, les autres sont reprises telles
+quelles, le pdf est rendu à nouveau et la réponse de l'ia est bien plus
+courte qu'un rapport complet, rapports retrouvés quel que soit le point
+d'entrée ou le processus qui les a créés (résumés servis par le faux
+serveur groq)
+
+usage: python benchmarks/check_section_regeneration.py
+code de sortie 1 si un scénario échoue
+"""
+import asyncio
+import glob
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_groq import FakeGroq, DEFAULT_CONTENT
+
+server = FakeGroq().start()
+os.environ['GROQ_BASE_URL'] = server.url
+os.environ['GROQ_API_KEY'] = 'test'
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+# copie des rapports sur disque, partagée avec l'autre processus du scénario
+os.environ['SYNTHESIA_REPORT_STORE_DISK'] = '1'
+os.environ['SYNTHESIA_REPORT_STORE_DIR'] = tempfile.mkdtemp(prefix='synthesia_reports_')
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+import asgi
+import httpx
+import index
+from utils import ai_handler
+from utils import report_store
+from utils.report_store import get_report
+from utils.sections import split_sections, join_sections, find_section
+
+NEW_RECOMMENDATIONS = "- Remplacer le pilote par la version certifiée\n- Former le service aux mises à jour"
+LLM_OUTPUTS = sorted(glob.glob(os.path.join(BENCH_DIR, 'corpus', 'llm_outputs', '*.md')))
+
+client = index.app.test_client()
+
+
+def create_report():
+    response = client.post('/api/generate-report', json={
+        'title': 'Intervention', 'raw_data': f'notes de test {time.time_ns()}'
+    })
+    assert response.status_code == 200, response.status_code
+    return response.headers['X-Report-ID']
+
+
+def regenerate(report_id, section='recommandations', instructions='Plus concret, deux actions maximum'):
+    return client.post(f'/api/reports/{report_id}/sections', json={
+        'section': section, 'instructions': instructions
+    })
+
+
+def bodies(text):
+    return {section.title: section.body.strip() for section in split_sections(text)}
+
+
+def scenario_sections_of_corpus():
+    for path in LLM_OUTPUTS:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        sections = split_sections(text)
+        assert find_section(sections, 'recommandations') is not None, path
+        # le découpage ne perd aucun titre ni contenu
+        again = split_sections(join_sections(sections))
+        assert [item.title for item in again] == [item.title for item in sections], path
+        assert bodies(join_sections(sections)) == bodies(text), path
+
+
+def scenario_only_target_section_rewritten():
+    report_id = create_report()
+    server.reset()
+    server.script([{'content': NEW_RECOMMENDATIONS}])
+    response = regenerate(report_id)
+    assert response.status_code == 200, (response.status_code, response.data[:200])
+    assert response.data.startswith(b'%PDF') and response.headers.get('ETag'), dict(response.headers)
+
+    new_id = response.headers['X-Report-ID']
+    assert new_id != report_id, "nouvelle version sous le même identifiant"
+    before, after = bodies(get_report(report_id)['summary']), bodies(get_report(new_id)['summary'])
+    assert after['RECOMMANDATIONS'] == NEW_RECOMMENDATIONS, after
+    assert {k: v for k, v in after.items() if k != 'RECOMMANDATIONS'} == \
+        {k: v for k, v in before.items() if k != 'RECOMMANDATIONS'}, "autres sections modifiées"
+
+    # un seul appel, court, avec les autres sections en contexte
+    (call,) = server.requests
+    assert call['max_tokens'] == ai_handler.SECTION_MAX_TOKENS, call['max_tokens']
+    assert call['messages'][0]['content'] == ai_handler.SECTION_PROMPT
+    assert 'CONTEXTE' in call['messages'][1]['content'], call['messages'][1]['content']
+    ratio = len(DEFAULT_CONTENT) / len(NEW_RECOMMENDATIONS)
+    print(f"        réponse de l'ia {ratio:.1f}x plus courte qu'un rapport complet")
+
+
+def scenario_repeated_title_stripped():
+    report_id = create_report()
+    server.script([{'content': f"**RECOMMANDATIONS**\n{NEW_RECOMMENDATIONS}"}])
+    response = regenerate(report_id)
+    assert response.status_code == 200, response.status_code
+    summary = get_report(response.headers['X-Report-ID'])['summary']
+    assert summary.count('RECOMMANDATIONS') == 1, summary
+
+
+def scenario_errors():
+    report_id = create_report()
+    unknown = regenerate(report_id, section='annexes')
+    assert unknown.status_code == 400, unknown.status_code
+    assert 'RECOMMANDATIONS' in unknown.get_json()['sections'], unknown.get_json()
+
+    missing = client.post(f'/api/reports/{report_id}/sections', json={'section': 'recommandations'})
+    assert missing.status_code == 400, missing.status_code
+
+    assert regenerate('inconnu').status_code == 404
+
+
+def scenario_report_id_from_every_entry_point():
+    body = {'title': 'Intervention', 'raw_data': f'notes de test {time.time_ns()}'}
+
+    async def post_asgi():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://asgi') as http:
+            return await http.post('/api/generate-report', json=body)
+
+    response = asyncio.run(post_asgi())
+    assert response.status_code == 200, response.status_code
+    assert 'X-Report-ID' in response.headers['Access-Control-Expose-Headers']
+    report_ids = [response.headers['X-Report-ID']]
+
+    # handler vercel (nom de fichier avec tiret: chargé par son chemin)
+    spec = importlib.util.spec_from_file_location('generate_report', os.path.join(API_DIR, 'generate-report.py'))
+    vercel = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(vercel)
+    response = vercel.handler({'method': 'POST', 'body': json.dumps({**body, 'raw_data': f'autres notes {time.time_ns()}'})})
+    assert response['statusCode'] == 200, response['statusCode']
+    assert 'X-Report-ID' in response['headers']['Access-Control-Expose-Headers']
+    report_ids.append(response['headers']['X-Report-ID'])
+
+    for report_id in report_ids:
+        assert get_report(report_id)['pdf'], report_id
+        assert client.get(f'/api/reports/{report_id}/pdf').status_code == 200, report_id
+        server.script([{'content': NEW_RECOMMENDATIONS}])
+        assert regenerate(report_id).status_code == 200, report_id
+
+
+def scenario_report_from_another_process():
+    # rapport enregistré par un autre processus de la machine (autre worker)
+    code = (f"import sys; sys.path.insert(0, {API_DIR!r})\n"
+            "from utils.report_store import save_report\n"
+            "from utils.pdf_generator import render_pdf\n"
+            "summary = open(sys.argv[1], encoding='utf-8').read()\n"
+            "pdf = render_pdf('Autre worker', summary, 'Auteur', 'Poste')\n"
+            "print(save_report('Autre worker', summary, 'Auteur', 'Poste', pdf, 'etag-autre'))")
+    result = subprocess.run([sys.executable, '-c', code, LLM_OUTPUTS[0]], cwd=API_DIR, env=dict(os.environ),
+                            capture_output=True, text=True, check=True)
+    report_id = result.stdout.strip().splitlines()[-1]
+    assert report_store._reports.get(report_id) is None, 'rapport déjà en mémoire'
+
+    response = client.get(f'/api/reports/{report_id}/pdf')
+    assert response.status_code == 200 and response.data.startswith(b'%PDF'), response.status_code
+    server.script([{'content': NEW_RECOMMENDATIONS}])
+    assert regenerate(report_id).status_code == 200
+
+    # identifiant inconnu (expiré, autre instance): message explicite
+    for unknown in ('0' * 32, '..', 'inconnu'):
+        response = client.get(f'/api/reports/{unknown}/pdf')
+        assert response.status_code == 404, (unknown, response.status_code)
+        assert response.get_json()['error'] == report_store.NOT_FOUND_MESSAGE, response.get_json()
+
+
+def scenario_groq_unavailable():
+    report_id = create_report()
+    server.script([{'status': 503}] * 10)
+    response = regenerate(report_id)
+    server.reset()
+    assert response.status_code == 503, response.status_code
+
+
+SCENARIOS = [
+    scenario_sections_of_corpus,
+    scenario_only_target_section_rewritten,
+    scenario_repeated_title_stripped,
+    scenario_errors,
+    scenario_report_id_from_every_entry_point,
+    scenario_report_from_another_process,
+    scenario_groq_unavailable,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    server.stop()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+vérification de la construction du pdf en flux (pdf_generator.FlowableStream,
+PageCompressingCanvas): mêmes octets que la construction classique, story
+jamais construite en entier et rapport de 500 pages rendu sous un plafond
+de mémoire fixe
+
+chaque mesure de mémoire est faite dans un interpréteur neuf: hausse du pic
+de rss (ru_maxrss) pendant le seul rendu, après un premier rendu de
+chauffe (imports, polices, logo)
+
+usage: python benchmarks/check_streaming_pdf.py
+code de sortie 1 si un scénario échoue
+(plafond: SYNTHESIA_PDF_MEMORY_CEILING_MB, 12 Mo par défaut)
+"""
+import json
+import os
+import subprocess
+import sys
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+from bench_pipeline import PAGE_SIZES, load_corpus, report_content
+from utils import pdf_generator
+from utils.pdf_generator import FlowableStream, render_pdf, parse_generated_at
+
+MEMORY_CEILING_MB = float(os.environ.get('SYNTHESIA_PDF_MEMORY_CEILING_MB', '12'))
+PAGES = 500
+LINES_PER_PAGE = (PAGE_SIZES[50] - PAGE_SIZES[5]) / 45
+GENERATED_AT = '2026-01-02T03:04:05+01:00'
+
+# rendu mesuré dans l'interpréteur enfant: affiche pages et hausse du pic (Ko)
+MEASURE = """
+import json, resource, sys
+sys.path[:0] = [{api!r}, {bench!r}]
+from bench_pipeline import load_corpus, report_content
+from utils.pdf_generator import render_pdf, count_pages
+content = report_content(load_corpus(), {lines})
+render_pdf('chauffe', content[:2000], 'Auteur', 'Poste', streaming={streaming})
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+pdf = render_pdf('Journal de panne', content, 'Auteur', 'Poste', streaming={streaming})
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'pages': count_pages(pdf), 'peak_kb': after - before}}))
+"""
+
+
+def lines_for(pages):
+    # marge de 2%: la densité des pages varie avec le corpus
+    return int((PAGE_SIZES[5] + LINES_PER_PAGE * (pages - 5)) * 1.02)
+
+
+def measure(pages, streaming):
+    """
+    rendu d'un rapport de `pages` pages dans un interpréteur neuf
+    return: tuple (pages rendues, hausse du pic de rss en Mo)
+    """
+    code = MEASURE.format(api=API_DIR, bench=BENCH_DIR, lines=lines_for(pages), streaming=streaming)
+    result = subprocess.run([sys.executable, '-c', code], cwd=API_DIR, env=dict(os.environ),
+                            capture_output=True, text=True, check=True)
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data['pages'], data['peak_kb'] / 1024
+
+
+def scenario_same_bytes():
+    content = report_content(load_corpus(), lines_for(20))
+    generated_at = parse_generated_at(GENERATED_AT)
+    for profile in pdf_generator.PROFILES:
+        built = bytes(render_pdf('Rapport', content, 'Auteur', 'Poste', generated_at=generated_at,
+                                 profile=profile, streaming=False))
+        streamed = bytes(render_pdf('Rapport', content, 'Auteur', 'Poste', generated_at=generated_at,
+                                    profile=profile, streaming=True))
+        assert streamed == built, f"profil {profile}: octets différents"
+
+
+def scenario_bounded_lookahead():
+    # consommation comme doc.build: longueur relue, premier élément retiré
+    produced = []
+    story = FlowableStream((produced.append(number) or number for number in range(1000)), lookahead=8)
+    consumed = 0
+    while len(story):
+        assert len(produced) - consumed <= 8, (len(produced), consumed)
+        assert story[0] == consumed, story[0]
+        del story[0]
+        consumed += 1
+    assert consumed == 1000, consumed
+
+
+def scenario_memory_500_pages():
+    pages, streamed = measure(PAGES, True)
+    assert pages >= PAGES, pages
+    _, built = measure(PAGES, False)
+    print(f"        {pages} pages: pic +{streamed:.1f} Mo en flux, +{built:.1f} Mo avec la story complète")
+    assert streamed < MEMORY_CEILING_MB, f"pic +{streamed:.1f} Mo (plafond {MEMORY_CEILING_MB:.0f} Mo)"
+    assert streamed < built / 2, (streamed, built)
+
+
+SCENARIOS = [
+    scenario_same_bytes,
+    scenario_bounded_lookahead,
+    scenario_memory_500_pages,
+]
+
+
+def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        name = scenario.__name__.replace('scenario_', '')
+        try:
+            scenario()
+            print(f"ok      {name}")
+        except Exception:
+            failures += 1
+            print(f"ÉCHEC   {name}")
+            traceback.print_exc()
+    print(f"{len(SCENARIOS) - failures}/{len(SCENARIOS)} scénarios réussis")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+faux serveur groq local (api chat completions compatible openai)
+permet d'éprouver la politique d'appel et de tester la charge sans réseau
+ni quota: latence (fixe ou tirée d'une loi), débit de tokens, erreurs 429 /
+5xx, retry-after et streaming sont réglables globalement, par modèle, ou
+requête par requête via un script
+
+lois de latence (voir parse_latency):
+    0.3                  fixe (secondes)
+    uniform:0.1,0.5      uniforme entre deux bornes
+    normal:0.3,0.1       normale (moyenne, écart type), tronquée à 0
+    lognormal:0.3,0.6    log-normale (médiane, sigma): longue traîne
+    exp:0.3              exponentielle (moyenne)
+
+usage autonome:
+    python benchmarks/fake_groq.py --port 8765 --delay 0.3 --error-rate 0.1
+    python benchmarks/fake_groq.py --delay lognormal:0.4,0.5 --tokens-per-second 500 \
+        --rate-limit-rate 0.02 --server-error-rate 0.01 --retry-after 1
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=test python api/index.py
+
+usage en python:
+    server = FakeGroq(delay=0.1).start()
+    server.script([{'status': 500}, {'status': 200}])
+    os.environ['GROQ_BASE_URL'] = server.url
+    ...
+    server.stop()
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = '/openai/v1/chat/completions'
+
+DEFAULT_CONTENT = """CONTEXTE DE L'INTERVENTION
+Intervention sur le poste de travail signalé par l'utilisateur.
+
+PROBLEMATIQUE IDENTIFIEE
+- Le service ne démarrait plus après la mise à jour.
+
+ACTIONS TECHNIQUES REALISEES
+- Redémarrage du service et réinstallation du pilote.
+
+RESULTATS OBTENUS
+Le service est de nouveau fonctionnel.
+
+RECOMMANDATIONS
+- Planifier les mises à jour en dehors des heures ouvrées."""
+
+
+# lois de latence: nom -> nombre de paramètres
+LATENCY_LAWS = {'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}
+
+
+@lru_cache(maxsize=64)
+def parse_latency(spec):
+    """
+    lit une loi de latence
+    param spec: secondes (nombre ou texte) ou "loi:p1,p2" (voir LATENCY_LAWS)
+    return: tuple (loi, paramètres), loi None pour une latence fixe
+    lève ValueError si la loi est inconnue ou mal écrite
+    """
+    if isinstance(spec, (int, float)):
+        return None, (float(spec),)
+    law, _, params = str(spec).partition(':')
+    if not params:
+        return None, (float(law),)
+    if law not in LATENCY_LAWS:
+        raise ValueError(f"loi de latence inconnue: {law} (disponibles: {', '.join(LATENCY_LAWS)})")
+    values = tuple(float(value) for value in params.split(','))
+    if len(values) != LATENCY_LAWS[law]:
+        raise ValueError(f"{law}: {LATENCY_LAWS[law]} paramètre(s) attendu(s), reçu {params}")
+    return law, values
+
+
+def sample_latency(spec, rng):
+    """
+    tire une latence selon sa loi
+    param spec: voir parse_latency
+    param rng: random.Random
+    return: secondes (jamais négatives)
+    """
+    law, values = parse_latency(spec)
+    if law is None:
+        seconds = values[0]
+    elif law == 'uniform':
+        seconds = rng.uniform(*values)
+    elif law == 'normal':
+        seconds = rng.gauss(*values)
+    elif law == 'lognormal':
+        median, sigma = values
+        seconds = median * rng.lognormvariate(0.0, sigma)
+    else:
+        seconds = rng.expovariate(1.0 / values[0]) if values[0] else 0.0
+    return max(0.0, seconds)
+
+
+def count_tokens(text):
+    # approximation grossière (4 caractères par token), comme l'usage renvoyé
+    return len(text) // 4
+
+
+class FakeGroq:
+    """
+    serveur http dans un thread
+    comportement d'une requête (dictionnaire, toutes les clés optionnelles):
+    - status: code http (200 par défaut)
+    - delay: latence avant le premier octet, secondes ou loi (voir parse_latency)
+    - tokens_per_second: débit de génération (None = réponse instantanée):
+      la réponse dure tokens / débit, étalée sur les morceaux en streaming
+    - retry_after: valeur de l'en-tête retry-after (réponses d'erreur)
+    - content: texte renvoyé
+    - chunk_delay: secondes entre deux morceaux en streaming
+    priorité: script (requête par requête), puis réglages du modèle, puis défaut
+    erreurs injectées au hasard hors script: rate_limit_rate (429 avec le
+    retry_after du serveur), server_error_rate (500/502/503), error_rate
+    (429/500/503, sans retry-after)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, error_rate=0.0,
+                 content=DEFAULT_CONTENT, models=None, seed=None, backlog=128,
+                 tokens_per_second=None, rate_limit_rate=0.0, server_error_rate=0.0,
+                 retry_after=None):
+        parse_latency(delay)
+        self.defaults = {'status': 200, 'delay': delay, 'content': content, 'chunk_delay': 0.0,
+                         'tokens_per_second': tokens_per_second}
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.models = dict(models or {})
+        self._script = deque()
+        self._requests = []
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+        # file d'attente des connexions: le défaut (5) refuse les rafales
+        # des tests de charge
+        self._server = ThreadingHTTPServer((host, port), _Handler, bind_and_activate=False)
+        self._server.request_queue_size = backlog
+        try:
+            self._server.server_bind()
+            self._server.server_activate()
+        except Exception:
+            self._server.server_close()
+            raise
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-groq', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def script(self, behaviors):
+        """
+        comportements des prochaines requêtes, dans l'ordre
+        """
+        with self._lock:
+            self._script.extend(behaviors)
+
+    def set_model(self, model, **behavior):
+        """
+        comportement par défaut des requêtes pour un modèle
+        """
+        with self._lock:
+            self.models[model] = behavior
+
+    @property
+    def requests(self):
+        """
+        requêtes reçues: liste de dictionnaires (model, stream, status, messages,
+        max_tokens, delay, started, finished)
+        """
+        with self._lock:
+            return list(self._requests)
+
+    def reset(self):
+        with self._lock:
+            self._script.clear()
+            self._requests.clear()
+
+    def _behavior(self, model):
+        with self._lock:
+            behavior = dict(self.defaults)
+            behavior.update(self.models.get(model, {}))
+            if self._script:
+                behavior.update(self._script.popleft())
+            else:
+                self._inject_error(behavior)
+            behavior['delay'] = sample_latency(behavior['delay'], self._random)
+        return behavior
+
+    def _inject_error(self, behavior):
+        draw = self._random.random()
+        if draw < self.rate_limit_rate:
+            behavior['status'] = 429
+            behavior.setdefault('retry_after', self.retry_after)
+            return
+        draw -= self.rate_limit_rate
+        if draw < self.server_error_rate:
+            behavior['status'] = self._random.choice((500, 502, 503))
+            return
+        if self.error_rate and self._random.random() < self.error_rate:
+            behavior['status'] = self._random.choice((429, 500, 503))
+
+    def _record(self, entry):
+        with self._lock:
+            self._requests.append(entry)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'invalid json'}})
+            return
+
+        if self.path.rstrip('/') != COMPLETIONS_PATH:
+            self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+            return
+
+        model = request.get('model', '')
+        stream = bool(request.get('stream'))
+        behavior = fake._behavior(model)
+        started = time.monotonic()
+        entry = {'model': model, 'stream': stream, 'status': behavior['status'],
+                 'messages': request.get('messages', []), 'max_tokens': request.get('max_tokens'),
+                 'delay': behavior['delay'], 'started': started, 'finished': None}
+
+        try:
+            if behavior['delay']:
+                time.sleep(behavior['delay'])
+
+            if behavior['status'] != 200:
+                headers = {}
+                if behavior.get('retry_after') is not None:
+                    headers['retry-after'] = str(behavior['retry_after'])
+                self._send_json(behavior['status'], {
+                    'error': {'message': f"fake groq error {behavior['status']}", 'type': 'fake_error'}
+                }, headers)
+                return
+
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+            content = behavior['content']
+            rate = behavior.get('tokens_per_second')
+
+            if not stream:
+                if rate:
+                    time.sleep(count_tokens(content) / rate)
+                prompt_tokens = sum(count_tokens(m.get('content', '')) for m in request.get('messages', []))
+                self._send_json(200, {
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': created,
+                    'model': model,
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': content},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': {
+                        'prompt_tokens': prompt_tokens,
+                        'completion_tokens': count_tokens(content),
+                        'total_tokens': prompt_tokens + count_tokens(content)
+                    }
+                })
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            words = content.split(' ')
+            for index, word in enumerate(words):
+                piece = word if index == len(words) - 1 else word + ' '
+                self._write_chunk(completion_id, created, model, {'content': piece}, None)
+                pause = behavior['chunk_delay'] + (len(piece) / 4 / rate if rate else 0.0)
+                if pause:
+                    time.sleep(pause)
+            self._write_chunk(completion_id, created, model, {}, 'stop')
+            self._write_raw(b'data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+
+        except (BrokenPipeError, ConnectionResetError):
+            # client parti (délai dépassé côté client): rien à envoyer
+            entry['status'] = 'disconnected'
+        finally:
+            entry['finished'] = time.monotonic()
+            fake._record(entry)
+
+    def _write_raw(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _write_chunk(self, completion_id, created, model, delta, finish_reason):
+        payload = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': created,
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+        }
+        self._write_raw(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', default='0', help="latence avant la réponse: secondes ou loi (ex: lognormal:0.4,0.5)")
+    parser.add_argument('--tokens-per-second', type=float, default=None, help="débit de génération des réponses")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="part de réponses 429/500/503")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="part de réponses 429")
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help="part de réponses 500/502/503")
+    parser.add_argument('--retry-after', type=float, default=None, help="retry-after des 429 injectés (s)")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        parse_latency(args.delay)
+    except ValueError as e:
+        parser.error(str(e))
+    server = FakeGroq(args.host, args.port, delay=args.delay, error_rate=args.error_rate, seed=args.seed,
+                      tokens_per_second=args.tokens_per_second, rate_limit_rate=args.rate_limit_rate,
+                      server_error_rate=args.server_error_rate, retry_after=args.retry_after)
+    print(f"faux serveur groq sur {server.url} (GROQ_BASE_URL={server.url})")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+référence figée de l'ancien traitement du texte de l'ia
+(clean_markdown_formatting + detect_section_title + boucle de create_pdf)
+sert de vérité pour comparer utils.markdown_parser: ne pas modifier
+"""
+import re
+
+KEYWORDS = [
+    'CONTEXTE', 'PROBLEME', 'DIAGNOSTIC', 'ACTIONS', 'RESULTATS',
+    'RECOMMANDATIONS', 'SUIVI', 'PHASE', 'ETAPE', 'CONFIGURATION',
+    'TEST', 'VALIDATION', 'BILAN', 'INVENTAIRE', 'PREPARATION',
+    'MAINTENANCE', 'LIVRABLE', 'SATISFACTION', 'METRICS', 'IMPACT'
+]
+
+
+def clean_markdown_formatting(text):
+    text = re.sub(r'#{1,6}\s*', '', text)
+    text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
+    text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', text)
+
+    emoji_pattern = re.compile(
+        "["
+        "\U0001F600-\U0001F64F"
+        "\U0001F300-\U0001F5FF"
+        "\U0001F680-\U0001F6FF"
+        "\U0001F1E0-\U0001F1FF"
+        "\U00002702-\U000027B0"
+        "\U000024C2-\U0001F251"
+        "]+",
+        flags=re.UNICODE
+    )
+    text = emoji_pattern.sub('', text)
+
+    text = re.sub(r'={3,}', '', text)
+    text = re.sub(r'-{3,}', '', text)
+
+    text = text.replace('■', '-')
+    text = text.replace('●', '-')
+    text = text.replace('•', '-')
+    text = text.replace('◆', '-')
+    text = text.replace('▸', '-')
+
+    text = re.sub(r'^\s*[-*+]\s+', '- ', text, flags=re.MULTILINE)
+
+    return text
+
+
+def detect_section_title(line):
+    line_upper = line.upper().strip()
+
+    if line.isupper() and len(line) < 100:
+        for keyword in KEYWORDS:
+            if keyword in line_upper:
+                return True
+
+    return False
+
+
+def legacy_blocks(text):
+    """
+    blocs produits par l'ancien code
+    return: liste de tuples (type, texte) comparables à markdown_parser.Block
+    """
+    blocks = []
+    for line in clean_markdown_formatting(text).split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        if detect_section_title(line):
+            blocks.append(('section', line))
+        elif line.startswith('-') or line.startswith('•'):
+            blocks.append(('bullet', re.sub(r'^[-•]\s*', '', line)))
+        else:
+            blocks.append(('paragraph', line))
+
+    return blocks
@@ -0,0 +1,134 @@
+"""
+test de charge: requêtes /api/generate-report simultanées servies par
+l'application flask (index.py) et par la variante asgi (asgi.py), résumés
+servis par le faux serveur groq avec une latence fixe
+
+- flask: un thread par requête en cours, au plus --flask-threads threads
+  (comme un serveur wsgi threadé), via le client de test flask
+- asgi: toutes les requêtes sur une boucle d'événements, via
+  httpx.ASGITransport (sans réseau entre le client et l'application)
+chaque requête a des notes et un titre uniques: ni cache de résumé ni
+cache de pdf
+
+usage:
+    python benchmarks/load_asgi_vs_flask.py
+    python benchmarks/load_asgi_vs_flask.py --concurrency 50,200,500 --delay 0.5 --flask-threads 32
+le débit de flask plafonne à flask-threads / délai groq; celui de l'asgi
+croît avec la concurrence jusqu'à la limite du rendu pdf (cpu)
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'api')
+for path in (API_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_groq import FakeGroq
+
+server = FakeGroq(backlog=1024).start()
+os.environ['GROQ_BASE_URL'] = server.url
+os.environ['GROQ_API_KEY'] = 'test'
+os.environ['SYNTHESIA_SUMMARY_CACHE_DISK'] = '0'
+os.environ['SYNTHESIA_RATE_LIMIT'] = '0'
+os.environ.setdefault('SYNTHESIA_RENDER_WORKERS', '0')
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+# le client groq synchrone ne doit pas être la limite de flask
+os.environ.setdefault('GROQ_POOL_SIZE', '1000')
+os.environ.setdefault('GROQ_ASYNC_POOL_SIZE', '1000')
+
+import httpx
+
+import asgi
+import index
+
+
+def payload(label, number):
+    return {
+        'title': f'Charge {label} {number}',
+        'raw_data': f'notes de charge {label} {number} {time.time_ns()}',
+        'author': 'A',
+        'role': 'B',
+    }
+
+
+def run_flask(concurrency, threads):
+    """
+    return: (durée totale, latences, statuts)
+    """
+    client = index.app.test_client()
+    started = time.perf_counter()
+
+    def one(number):
+        # toutes les requêtes arrivent ensemble: la latence compte l'attente d'un thread libre
+        response = client.post('/api/generate-report', json=payload(f'flask-{concurrency}', number))
+        return time.perf_counter() - started, response.status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(one, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return elapsed, [latency for latency, _ in results], [status for _, status in results]
+
+
+async def run_asgi(concurrency):
+    """
+    return: (durée totale, latences, statuts)
+    """
+    transport = httpx.ASGITransport(app=asgi.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://asgi', timeout=None) as client:
+        async def one(number):
+            started = time.perf_counter()
+            response = await client.post('/api/generate-report', json=payload(f'asgi-{concurrency}', number))
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one(number) for number in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    from utils.groq_client import close_async_client
+    await close_async_client()
+    return elapsed, [latency for latency, _ in results], [status for _, status in results]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(name, concurrency, elapsed, latencies, statuses):
+    errors = sum(1 for status in statuses if status != 200)
+    print(f"{name:>6} {concurrency:>12} {concurrency / elapsed:>11.1f} {statistics.median(latencies) * 1e3:>9.0f} "
+          f"{percentile(latencies, 0.95) * 1e3:>9.0f} {errors:>8}")
+    return concurrency / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='20,100,300', help="requêtes simultanées testées")
+    parser.add_argument('--delay', type=float, default=0.5, help="latence du faux groq (secondes)")
+    parser.add_argument('--flask-threads', type=int, default=16, help="threads du serveur flask")
+    args = parser.parse_args()
+
+    server.defaults['delay'] = args.delay
+    # préchauffage: imports, thèmes, clients groq
+    index.app.test_client().post('/api/generate-report', json=payload('warm', 0))
+    asyncio.run(run_asgi(1))
+
+    print(f"faux groq: {args.delay * 1e3:.0f} ms, flask: {args.flask_threads} threads, cœurs: {os.cpu_count()}")
+    print(f"{'app':>6} {'concurrence':>12} {'rapports/s':>11} {'p50 ms':>9} {'p95 ms':>9} {'erreurs':>8}")
+    for concurrency in [int(value) for value in args.concurrency.split(',')]:
+        flask_rate = report('flask', concurrency, *run_flask(concurrency, args.flask_threads))
+        asgi_rate = report('asgi', concurrency, *asyncio.run(run_asgi(concurrency)))
+        print(f"{'':>6} {'':>12} {asgi_rate / flask_rate:>10.2f}x")
+    server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""
+test de charge local de /api/generate-report, résumés servis par le faux
+serveur groq (aucun quota consommé): requêtes envoyées à un débit cible
+(boucle ouverte, les arrivées ne dépendent pas des réponses), puis débit
+obtenu, taux d'erreur et latences p50/p95/p99 par étape
+
+cibles:
+- index: api/index.py (application flask actuelle)
+- backend: backend/app.py (ancienne application)
+les deux sont servies par werkzeug (un thread par requête) dans un
+processus séparé, avec GROQ_BASE_URL pointant vers le faux serveur
+- --url: serveur déjà lancé (GROQ_BASE_URL à régler soi-même, par exemple
+  vers `python benchmarks/fake_groq.py`); le faux serveur local n'est alors
+  pas utilisé
+
+étapes: `client` est la latence vue du client, mesurée depuis l'heure
+d'envoi prévue (une file côté client compte dans la latence); les autres
+viennent de l'en-tête server-timing (groq, markdown, pdf, total...)
+
+usage:
+    python benchmarks/load_test.py --app index --rps 10 --duration 30
+    python benchmarks/load_test.py --app backend --rps 5 --delay lognormal:0.4,0.5 \\
+        --tokens-per-second 800 --rate-limit-rate 0.02 --server-error-rate 0.01
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --rps 20 --json resultat.json
+    python benchmarks/load_test.py --app index --rps 10 --max-p99-ms 2000 --max-error-rate 0.01
+code de sortie 1 si un budget (--max-p99-ms, --max-error-rate) est dépassé
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+import httpx
+
+from fake_groq import FakeGroq, parse_latency
+
+# application servie dans le processus cible: (répertoire, module)
+APPS = {
+    'index': (os.path.join(ROOT_DIR, 'api'), 'index'),
+    'backend': (os.path.join(ROOT_DIR, 'backend'), 'app'),
+}
+
+# serveur werkzeug threadé; le port choisi est écrit sur la sortie standard
+SERVE = (
+    "import logging, sys; sys.path.insert(0, '.'); "
+    "logging.getLogger('werkzeug').setLevel(logging.WARNING); "
+    "from werkzeug.serving import make_server; "
+    "import {module} as target; "
+    "server = make_server('127.0.0.1', 0, target.app, threaded=True); "
+    "print(server.port, flush=True); "
+    "server.serve_forever()"
+)
+
+NOTES = [open(path, encoding='utf-8').read()
+         for path in sorted(glob.glob(os.path.join(BENCH_DIR, 'corpus', 'notes', '*.txt')))]
+
+
+def start_app(name, groq_url, env_overrides):
+    """
+    lance l'application cible dans un processus séparé
+    return: tuple (processus, url de base)
+    lève RuntimeError si le serveur ne démarre pas
+    """
+    directory, module = APPS[name]
+    env = dict(os.environ)
+    env.update({'GROQ_BASE_URL': groq_url, 'GROQ_API_KEY': 'test'})
+    # cache disque et limiteur partagé faussent une mesure répétée; les
+    # notes uniques du test restent presque identiques, leur reprise
+    # éviterait groq (--env SYNTHESIA_NEAR_DUPLICATES=1 pour la mesurer)
+    env.setdefault('SYNTHESIA_SUMMARY_CACHE_DISK', '0')
+    env.setdefault('SYNTHESIA_RATE_LIMIT', '0')
+    env.setdefault('SYNTHESIA_NEAR_DUPLICATES', '0')
+    env.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+    env.update(env_overrides)
+    process = subprocess.Popen([sys.executable, '-c', SERVE.format(module=module)], cwd=directory,
+                               env=env, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline().strip()
+    if not line.isdigit():
+        process.kill()
+        raise RuntimeError(f"l'application {name} n'a pas démarré")
+    url = f"http://127.0.0.1:{line}"
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/api/health", timeout=2).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"l'application {name} ne répond pas sur {url}")
+
+
+def parse_server_timing(value):
+    """
+    durées de l'en-tête server-timing
+    return: dictionnaire étape -> secondes
+    """
+    stages = {}
+    for part in (value or '').split(','):
+        name, _, params = part.strip().partition(';')
+        for param in params.split(';'):
+            key, _, duration = param.strip().partition('=')
+            if key == 'dur' and name:
+                try:
+                    stages[name] = stages.get(name, 0.0) + float(duration) / 1000
+                except ValueError:
+                    pass
+    return stages
+
+
+def payload(number, repeat):
+    """
+    corps d'une requête: notes du corpus, rendues uniques sauf avec --repeat
+    (le cache de résumé et de pdf sert alors les réponses)
+    """
+    notes = NOTES[number % len(NOTES)]
+    if not repeat:
+        notes = f"{notes}\nref {uuid.uuid4().hex}"
+    return {'title': f'Charge {number}', 'raw_data': notes, 'author': 'Charge', 'role': 'Test'}
+
+
+def arrivals(rps, duration, poisson, rng):
+    """
+    instants d'envoi (secondes depuis le début), débit constant ou poisson
+    """
+    times = []
+    moment = 0.0
+    while True:
+        moment += rng.expovariate(rps) if poisson else 1.0 / rps
+        if moment >= duration:
+            return times
+        times.append(moment)
+
+
+async def run_load(url, schedule, timeout, repeat, max_in_flight):
+    """
+    envoie les requêtes aux instants prévus
+    return: liste de résultats (latence client, statut, étapes serveur)
+    """
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+
+        async def one(number, moment):
+            delay = started + moment - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                response = await client.post('/api/generate-report', json=payload(number, repeat))
+                await response.aread()
+                status = response.status_code
+                stages = parse_server_timing(response.headers.get('server-timing'))
+            except httpx.HTTPError as e:
+                status, stages = type(e).__name__, {}
+            # depuis l'heure prévue: un envoi retardé par le client compte
+            return time.perf_counter() - started - moment, status, stages
+
+        results = await asyncio.gather(*(one(number, moment) for number, moment in enumerate(schedule)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(results, elapsed, target_rps, groq_requests=None):
+    """
+    return: dictionnaire du résultat (débit, erreurs, latences par étape en ms)
+    """
+    statuses = Counter(str(status) for _, status, _ in results)
+    ok = statuses.get('200', 0)
+    stages = defaultdict(list)
+    for latency, status, server_stages in results:
+        if status != 200:
+            continue
+        stages['client'].append(latency)
+        for name, seconds in server_stages.items():
+            stages[name].append(seconds)
+
+    summary = {
+        'target_rps': target_rps,
+        'sent': len(results),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(ok / elapsed, 2) if elapsed else 0.0,
+        'statuses': dict(statuses),
+        'error_rate': round(1 - ok / len(results), 4) if results else 0.0,
+        'stages': {
+            name: {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+            }
+            for name, values in stages.items()
+        },
+    }
+    if groq_requests is not None:
+        summary['groq'] = dict(Counter(str(request['status']) for request in groq_requests))
+    return summary
+
+
+def print_summary(summary):
+    print(f"cible {summary['target_rps']:g} req/s, {summary['sent']} requêtes en {summary['elapsed_s']:.1f} s, "
+          f"débit {summary['throughput_rps']:.1f} réponses 200/s")
+    errors = {status: count for status, count in summary['statuses'].items() if status != '200'}
+    details = ', '.join(f"{status}: {count}" for status, count in sorted(errors.items()))
+    print(f"erreurs: {summary['error_rate'] * 100:.1f}%" + (f" ({details})" if details else ''))
+    if 'groq' in summary:
+        print("faux groq: " + ', '.join(f"{status}: {count}" for status, count in sorted(summary['groq'].items())))
+    print(f"{'étape':<12} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    order = ['client'] + sorted(name for name in summary['stages'] if name not in ('client', 'total')) + ['total']
+    for name in order:
+        if name in summary['stages']:
+            stage = summary['stages'][name]
+            print(f"{name:<12} {stage['count']:>6} {stage['p50_ms']:>9.1f} {stage['p95_ms']:>9.1f} {stage['p99_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--app', choices=sorted(APPS), default='index', help="application lancée localement")
+    target.add_argument('--url', help="serveur déjà lancé (ex: http://127.0.0.1:5000)")
+    parser.add_argument('--rps', type=float, default=5.0, help="débit cible (requêtes/s)")
+    parser.add_argument('--duration', type=float, default=20.0, help="durée de l'envoi (s)")
+    parser.add_argument('--poisson', action='store_true', help="arrivées de poisson au lieu d'un débit constant")
+    parser.add_argument('--repeat', action='store_true', help="mêmes notes à chaque requête (caches chauds)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="délai maximal d'une requête (s)")
+    parser.add_argument('--max-in-flight', type=int, default=500, help="connexions simultanées du client")
+    parser.add_argument('--seed', type=int, default=1)
+    # faux groq
+    parser.add_argument('--delay', default='lognormal:0.4,0.4', help="latence de groq: secondes ou loi")
+    parser.add_argument('--tokens-per-second', type=float, default=None, help="débit de génération de groq")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="part de 429 injectés")
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help="part de 500/502/503 injectés")
+    parser.add_argument('--retry-after', type=float, default=None, help="retry-after des 429 injectés (s)")
+    parser.add_argument('--env', action='append', default=[], metavar='NOM=VALEUR',
+                        help="variable d'environnement de l'application (répétable)")
+    # résultat
+    parser.add_argument('--json', help="écrit le résultat dans ce fichier")
+    parser.add_argument('--max-p99-ms', type=float, default=None, help="budget de latence client p99")
+    parser.add_argument('--max-error-rate', type=float, default=None, help="budget de taux d'erreur")
+    args = parser.parse_args()
+
+    try:
+        parse_latency(args.delay)
+    except ValueError as e:
+        parser.error(str(e))
+    env_overrides = dict(item.split('=', 1) for item in args.env)
+
+    server = process = None
+    url = args.url
+    if url is None:
+        server = FakeGroq(delay=args.delay, tokens_per_second=args.tokens_per_second,
+                          rate_limit_rate=args.rate_limit_rate, server_error_rate=args.server_error_rate,
+                          retry_after=args.retry_after, seed=args.seed, backlog=1024).start()
+        process, url = start_app(args.app, server.url, env_overrides)
+
+    try:
+        # préchauffage hors mesure: imports, thèmes, clients groq
+        httpx.post(f"{url}/api/generate-report", json=payload(0, False), timeout=args.timeout)
+        if server is not None:
+            server.reset()
+
+        schedule = arrivals(args.rps, args.duration, args.poisson, random.Random(args.seed))
+        results, elapsed = asyncio.run(run_load(url, schedule, args.timeout, args.repeat, args.max_in_flight))
+        summary = summarize(results, elapsed, args.rps, server.requests if server else None)
+        summary['target'] = args.url or args.app
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if server is not None:
+            server.stop()
+
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    failed = False
+    client = summary['stages'].get('client')
+    if args.max_p99_ms is not None and (client is None or client['p99_ms'] > args.max_p99_ms):
+        print(f"ÉCHEC   p99 client au-delà de {args.max_p99_ms:g} ms")
+        failed = True
+    if args.max_error_rate is not None and summary['error_rate'] > args.max_error_rate:
+        print(f"ÉCHEC   taux d'erreur au-delà de {args.max_error_rate * 100:g}%")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
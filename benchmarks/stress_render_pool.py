@@ -0,0 +1,140 @@
+"""
+test de charge du rendu pdf: débit selon le nombre de workers du pool
+(utils.render_pool) comparé au rendu dans les threads du processus
+
+pour chaque configuration, --clients threads rendent en boucle des
+rapports de --pages pages pendant --seconds secondes pendant qu'un client
+mesure la latence de /api/health (une requête sans rendu: ralentie par le
+gil quand les pdf sont rendus dans les threads du serveur)
+
+usage:
+    python benchmarks/stress_render_pool.py
+    python benchmarks/stress_render_pool.py --workers 1,2,4 --clients 8 --pages 30
+le débit doit croître avec le nombre de workers jusqu'au nombre de cœurs;
+le rendu dans les threads reste plafonné à un cœur (gil)
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+os.environ.setdefault('SYNTHESIA_LOG_LEVEL', 'WARNING')
+
+from bench_pipeline import PAGE_SIZES, load_corpus, report_content
+
+from utils import render_pool
+from utils.pdf_generator import render_pdf
+
+# lignes de contenu par page (d'après les rapports de 5 et 50 pages du benchmark)
+LINES_PER_PAGE = (PAGE_SIZES[50] - PAGE_SIZES[5]) / 45
+
+
+def default_workers():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return [0] + counts
+
+
+def configure(workers):
+    """
+    0: rendu dans les threads du processus, sinon pool de `workers` processus
+    """
+    render_pool.WORKERS = workers
+    render_pool.QUEUE_SIZE = 1000
+    render_pool.QUEUE_TIMEOUT = 600
+    render_pool.reset_pool()
+    if workers:
+        render_pool.start_pool()
+
+
+def render(title, content):
+    if render_pool.WORKERS <= 0:
+        return render_pdf(title, content, 'A', 'B')
+    return render_pool.render(title, content, 'A', 'B')
+
+
+def run(workers, clients, content, seconds):
+    """
+    return: (rapports par seconde, latences de /api/health en secondes)
+    """
+    import index
+
+    health = index.app.test_client()
+    configure(workers)
+    stop = threading.Event()
+    completed = []
+    probes = []
+
+    def client(number):
+        count = 0
+        while not stop.is_set():
+            render(f'Rapport {number}-{count}', content)
+            count += 1
+        completed.append(count)
+
+    def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            health.get('/api/health')
+            probes.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    threads.append(threading.Thread(target=probe))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return sum(completed) / elapsed, probes
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default=','.join(map(str, default_workers())),
+                        help="nombres de workers testés (0 = threads du processus)")
+    parser.add_argument('--clients', type=int, default=0,
+                        help="clients simultanés (2 par worker par défaut)")
+    parser.add_argument('--pages', type=int, default=10, help="pages des rapports longs")
+    parser.add_argument('--seconds', type=float, default=5.0, help="durée de chaque mesure")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    content = report_content(corpus, int(PAGE_SIZES[5] + LINES_PER_PAGE * (args.pages - 5)))
+    counts = [int(value) for value in args.workers.split(',')]
+
+    print(f"cœurs: {os.cpu_count()}, rapports de {args.pages} pages, {args.seconds:.0f} s par mesure")
+    print(f"{'workers':>8} {'clients':>8} {'rapports/s':>11} {'accél.':>7} {'health p50 ms':>14} {'health p95 ms':>14}")
+    reference = None
+    for workers in counts:
+        clients = args.clients or 2 * max(workers, 1)
+        throughput, probes = run(workers, clients, content, args.seconds)
+        reference = reference or throughput
+        label = workers if workers else 'threads'
+        print(f"{label:>8} {clients:>8} {throughput:>11.2f} {throughput / reference:>6.2f}x "
+              f"{statistics.median(probes) * 1e3:>14.1f} {percentile(probes, 0.95) * 1e3:>14.1f}")
+
+    render_pool.reset_pool()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())